@@ -0,0 +1,231 @@
+"""Re-extract every stored model response in one run.
+
+Reads the consolidated test-results/raw-responses/<model>/raw-responses.json
+files (and the per-task .txt directories used by the ChatGPT collectors), or
+a packed corpus (see packed_corpus.py) given as --corpus path.pack,
+runs the regex extractors over every (model, task) pair on a process pool,
+and writes one combined table to results/batch_extraction.json.
+
+Work is dispatched as (model, source, [task ids]) chunks. Workers load each
+model's responses themselves and keep them for later chunks, so response
+texts are never pickled between processes.
+
+A content-hash manifest (see manifest.py) makes reruns incremental: only
+pairs whose response, task entry or extractor version changed are
+re-extracted; the rest keep their previous rows. --full disables it.
+
+Usage: python batch_extract.py [--workers N] [--chunk-size N] [--models a,b]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import extract_values
+import smart_extract
+import smart_extract2
+from manifest import Manifest, hash_text
+from packed_corpus import open_pack
+from task_index import load_index
+
+TASKS_FILE = 'all_tasks.json'
+CORPUS_DIR = 'test-results/raw-responses'
+OUTPUT_FILE = 'results/batch_extraction.json'
+MANIFEST_FILE = 'results/batch_extraction.manifest.json'
+
+def run_extract_values(text, spec):
+    value, _ = extract_values.extract_typed(text, spec.kind, spec.expected)
+    return value, spec.expected, spec.tol
+
+def run_smart_extract(text, spec):
+    if spec.field is None:
+        return None, None, None
+    value = smart_extract.extract_value(text, spec.field, spec.kind == 'per_group', spec.kind == 'power',
+                                        spec.kind == 'effect', spec.expected)
+    return value, spec.expected, spec.tol
+
+def run_smart_extract2(text, spec):
+    if spec.field is None:
+        return None, None, None
+    value = smart_extract2.extract_value(text, spec.kind, spec.expected)
+    return value, spec.expected, spec.tol
+
+EXTRACTORS = {
+    'extract_values': run_extract_values,
+    'smart_extract': run_smart_extract,
+    'smart_extract2': run_smart_extract2,
+}
+MODULES = {'extract_values': extract_values, 'smart_extract': smart_extract, 'smart_extract2': smart_extract2}
+
+def load_indexes(tasks_file, extractor_names):
+    """One TaskIndex per extractor, each resolved by that extractor's own rules."""
+    return {name: load_index(tasks_file, name, MODULES[name].resolve_task)
+            for name in extractor_names}
+
+def find_sources(corpus_dir=CORPUS_DIR, models=None):
+    """Map model name -> raw-responses.json path, directory of <tid>.txt files or
+    (packed corpus path, model) when corpus_dir is a .pack file."""
+    if corpus_dir.endswith('.pack'):
+        return {model: (corpus_dir, model) for model in open_pack(corpus_dir).models()
+                if not models or model in models}
+    sources = {}
+    for model in sorted(os.listdir(corpus_dir)):
+        path = os.path.join(corpus_dir, model)
+        if not os.path.isdir(path) or (models and model not in models):
+            continue
+        consolidated = os.path.join(path, 'raw-responses.json')
+        sources[model] = consolidated if os.path.exists(consolidated) else path
+    return sources
+
+def load_responses(source):
+    """All response texts for one model, keyed by task id (a lazy view for a packed corpus)."""
+    if isinstance(source, tuple):
+        return open_pack(source[0]).responses(source[1])
+    if source.endswith('.json'):
+        with open(source) as f:
+            return {tid: e.get('response_text') or '' for tid, e in json.load(f).items()}
+    responses = {}
+    for name in os.listdir(source):
+        if name.endswith('.txt') and name != 'README.txt':
+            with open(os.path.join(source, name)) as f:
+                responses[name[:-4]] = f.read()
+    return responses
+
+# Per-worker state, filled by _init_worker
+_extractors = None
+_responses = {}
+
+def _init_worker(tasks_file, extractor_names):
+    # The parent has already built the indexes, so this reads the disk cache
+    global _extractors
+    indexes = load_indexes(tasks_file, extractor_names)
+    _extractors = [(name, EXTRACTORS[name], indexes[name]) for name in extractor_names]
+    # A serial run shares this process with earlier runs, whose texts may be stale
+    _responses.clear()
+
+def _extract_chunk(chunk):
+    """Returns (model, task id, response hash, row) per response; row is None when
+    the response hash matches the one the parent already holds a row for."""
+    model, source, tids, known = chunk
+    responses = _responses.get(source)
+    if responses is None:
+        responses = _responses[source] = load_responses(source)
+    out = []
+    for tid in tids:
+        text = responses.get(tid)
+        if text is None:
+            continue
+        text_hash = hash_text(text)
+        if known.get(tid) == text_hash:
+            out.append((model, tid, text_hash, None))
+            continue
+        row = {'model': model, 'task_id': tid, 'tier': _extractors[0][2][tid].tier}
+        for name, run, index in _extractors:
+            value, expected, tol = run(text, index[tid])
+            passed = value is not None and expected is not None and abs(value - expected) <= tol
+            row[name] = {'value': value, 'expected': expected, 'tol': tol, 'pass': passed}
+        out.append((model, tid, text_hash, row))
+    return out
+
+def make_chunks(sources, tids, chunk_size, known=None):
+    """Split the work into (model, source, task ids, {task id: known response hash}) chunks."""
+    known = known or {}
+    chunks = []
+    for model, source in sources.items():
+        for i in range(0, len(tids), chunk_size):
+            part = tids[i:i + chunk_size]
+            hashes = {tid: known[f'{model}/{tid}'] for tid in part if f'{model}/{tid}' in known}
+            chunks.append((model, source, part, hashes))
+    return chunks
+
+def extractor_version(extractor_names):
+    return ','.join(f'{n}={MODULES[n].EXTRACTOR_VERSION}' for n in extractor_names)
+
+def run_batch(sources, workers=None, chunk_size=16, extractor_names=None, tasks_file=TASKS_FILE, manifest=None):
+    """Extract every (model, task) pair. Returns rows sorted by model, task id.
+
+    With a manifest, pairs whose response, task entry and extractor versions
+    are unchanged keep their stored row and are not re-extracted.
+    """
+    extractor_names = list(extractor_names or EXTRACTORS)
+    index = load_indexes(tasks_file, extractor_names)[extractor_names[0]]
+    task_hashes = {spec.id: spec.task_hash for spec in index}
+    tids = index.ids()
+
+    known = {}
+    if manifest is not None:
+        for key, entry in manifest.entries.items():
+            tid = key.split('/', 1)[1]
+            if entry['extractor'] == manifest.version and entry['task'] == task_hashes.get(tid):
+                known[key] = entry['response']
+    chunks = make_chunks(sources, tids, chunk_size, known)
+
+    results = []
+    if workers == 1:
+        _init_worker(tasks_file, extractor_names)
+        for chunk in chunks:
+            results.extend(_extract_chunk(chunk))
+    else:
+        with Pool(workers, initializer=_init_worker, initargs=(tasks_file, extractor_names)) as pool:
+            for part in pool.imap_unordered(_extract_chunk, chunks):
+                results.extend(part)
+
+    rows = []
+    for model, tid, text_hash, row in results:
+        key = f'{model}/{tid}'
+        if row is None:
+            row = manifest.lookup(key, text_hash, task_hashes[tid])
+        elif manifest is not None:
+            manifest.store(key, text_hash, task_hashes[tid], row)
+        rows.append(row)
+    rows.sort(key=lambda r: (r['model'], r['task_id']))
+    return rows
+
+def print_summary(rows, extractor_names):
+    models = sorted({r['model'] for r in rows})
+    width = max([len(m) for m in models] + [5])
+    print(f'\n=== BATCH EXTRACTION ({len(rows)} responses, {len(models)} models) ===')
+    print('model'.ljust(width) + ''.join(f'  {n:>15}' for n in extractor_names))
+    for model in models:
+        mine = [r for r in rows if r['model'] == model]
+        cells = [f'{sum(r[n]["pass"] for r in mine)}/{len(mine)}' for n in extractor_names]
+        print(model.ljust(width) + ''.join(f'  {c:>15}' for c in cells))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--workers', type=int, default=None, help='process count (default: all cores; 1 = serial)')
+    parser.add_argument('--chunk-size', type=int, default=16, help='tasks per dispatched chunk')
+    parser.add_argument('--models', help='comma-separated model names (default: all)')
+    parser.add_argument('--extractors', help=f'comma-separated subset of {",".join(EXTRACTORS)}')
+    parser.add_argument('--corpus', default=CORPUS_DIR)
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--manifest', default=MANIFEST_FILE)
+    parser.add_argument('--full', action='store_true', help='ignore the manifest and re-extract everything')
+    args = parser.parse_args()
+
+    models = set(args.models.split(',')) if args.models else None
+    extractor_names = args.extractors.split(',') if args.extractors else list(EXTRACTORS)
+    unknown = [n for n in extractor_names if n not in EXTRACTORS]
+    if unknown:
+        sys.exit(f'Unknown extractor(s): {", ".join(unknown)}')
+
+    sources = find_sources(args.corpus, models)
+    start = time.perf_counter()
+    manifest = Manifest(args.manifest, extractor_version(extractor_names), reset=args.full)
+    rows = run_batch(sources, args.workers, args.chunk_size, extractor_names, manifest=manifest)
+    elapsed = time.perf_counter() - start
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump({'extractors': extractor_names, 'rows': rows}, f, indent=2)
+    manifest.save()
+
+    print_summary(rows, extractor_names)
+    print(f'\n{len(rows)} responses in {elapsed:.2f}s ({len(rows) / elapsed:.0f}/s)')
+    print(f'Results written to {args.output}')
+    print(manifest.summary())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""Speed and accuracy benchmark for the extractors over the stored corpora.
+
+Replays every response in test-results/raw-responses/* through each
+extractor and reports, per extractor:
+
+- throughput (responses/s) and p50/p95/p99 per-response latency, from the
+  fastest of --repeat timing passes;
+- peak traced memory (tracemalloc) of one further pass;
+- pass rate against the task ground truth;
+- agreement with the stored LLM-judge evaluations: of the responses whose
+  evaluation extracted the same field, how many values are within the
+  task's tolerance of the judge's.
+
+--save-baseline writes the numbers to results/extractor_baseline.json. Later
+runs compare against that baseline and flag regressions: throughput, p95
+latency or peak memory worse by more than --tolerance (relative), or a
+lower pass rate or agreement. The baseline records its corpus selection
+(--corpus or --synthetic, --models, --limit); a run on a different selection
+is not compared. The exit status is 1 when anything regressed or the
+selection differs.
+
+--synthetic replays a synth_corpus.py corpus instead of the stored
+responses; it is streamed up to --limit, so the limit bounds memory.
+
+llm_extract is only run when listed in --extractors. It calls the messages
+API serially (use --standin to start mock_messages_api in-process) and gets
+no memory pass.
+
+    python bench_extractors.py --repeat 3 --save-baseline
+    python bench_extractors.py --extractors smart_extract2 --models gpt-5.2
+    python bench_extractors.py --synthetic results/synthetic_corpus.jsonl --limit 200000 --no-memory
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import llm_extract
+from batch_extract import CORPUS_DIR, EXTRACTORS, TASKS_FILE, find_sources, load_indexes, load_responses
+from llm_client import percentile
+from mock_messages_api import add_config_args, config_from_args, start_server
+from results_store import load_evaluations
+from synth_corpus import iter_corpus
+
+BASELINE_FILE = 'results/extractor_baseline.json'
+DEFAULT_TOLERANCE = 0.2
+
+def load_corpus(corpus_dir=CORPUS_DIR, models=None):
+    """[(model, task id, response text)] in model, task id order."""
+    items = []
+    for model, source in find_sources(corpus_dir, models).items():
+        responses = load_responses(source)
+        items.extend((model, tid, responses[tid]) for tid in sorted(responses))
+    return items
+
+def make_llm_runner(limiter, max_retries, cache):
+    def run_llm_extract(text, spec):
+        try:
+            value, _ = llm_extract.extract_response(text, spec, limiter, max_retries, cache)
+        except llm_extract.APIError:
+            value = None
+        return value, spec.expected, spec.tol
+    return run_llm_extract
+
+def measure(run, work, judged, repeat=1, memory=True):
+    """Benchmark one extractor over work = [(model, tid, text, spec)]."""
+    best = None
+    for _ in range(max(1, repeat)):
+        latencies = []
+        outcomes = []
+        start = time.perf_counter()
+        for model, tid, text, spec in work:
+            t0 = time.perf_counter()
+            outcomes.append(run(text, spec))
+            latencies.append(time.perf_counter() - t0)
+        wall = time.perf_counter() - start
+        if best is None or wall < best[0]:
+            best = (wall, latencies, outcomes)
+    wall, latencies, outcomes = best
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        for model, tid, text, spec in work:
+            run(text, spec)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    scored = passed = compared = agreed = 0
+    for (model, tid, text, spec), (value, expected, tol) in zip(work, outcomes):
+        if expected is None:
+            continue
+        scored += 1
+        passed += value is not None and abs(value - expected) <= tol
+        judge = judged.get((model, tid), {}).get(spec.field)
+        if isinstance(judge, (int, float)) and not isinstance(judge, bool):
+            compared += 1
+            agreed += value is not None and abs(value - judge) <= tol
+    return {
+        'responses': len(work),
+        'wall_s': round(wall, 4),
+        'resp_per_s': round(len(work) / wall, 1) if wall else None,
+        'p50_ms': round(1000 * percentile(latencies, 50), 3) if latencies else None,
+        'p95_ms': round(1000 * percentile(latencies, 95), 3) if latencies else None,
+        'p99_ms': round(1000 * percentile(latencies, 99), 3) if latencies else None,
+        'peak_kib': round(peak / 1024, 1) if peak is not None else None,
+        'scored': scored,
+        'passed': passed,
+        'pass_rate': round(passed / scored, 4) if scored else None,
+        'compared': compared,
+        'agreed': agreed,
+        'agreement': round(agreed / compared, 4) if compared else None,
+    }
+
+def find_regressions(rows, baseline, tolerance):
+    """Human-readable regressions of rows against the baseline's rows."""
+    flags = []
+    for name, row in rows.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+
+        def worse(metric, higher_is_better, relative=True):
+            a, b = old.get(metric), row.get(metric)
+            if a is None or b is None:
+                return
+            slack = abs(a) * tolerance if relative else 1e-9
+            if (b < a - slack) if higher_is_better else (b > a + slack):
+                flags.append(f'{name}: {metric} {a} -> {b}')
+
+        worse('resp_per_s', True)
+        worse('p95_ms', False)
+        worse('peak_kib', False)
+        worse('pass_rate', True, relative=False)
+        worse('agreement', True, relative=False)
+    return flags
+
+def print_table(rows):
+    width = max([len(n) for n in rows] + [9])
+    print(f'{"extractor":<{width}} {"resp/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"peak KiB":>9} '
+          f'{"pass":>11} {"agree w/ eval":>15}')
+    for name, r in rows.items():
+        peak = f'{r["peak_kib"]:.0f}' if r['peak_kib'] is not None else '-'
+        agree = f'{r["agreed"]}/{r["compared"]}' if r['compared'] else '-'
+        print(f'{name:<{width}} {r["resp_per_s"]:>8.0f} {r["p50_ms"]:>8.2f} {r["p95_ms"]:>8.2f} {r["p99_ms"]:>8.2f} '
+              f'{peak:>9} {r["passed"]:>5}/{r["scored"]:<5} {agree:>15}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--extractors', default=','.join(EXTRACTORS),
+                        help=f'comma-separated subset of {",".join(EXTRACTORS)},llm_extract')
+    parser.add_argument('--models', help='comma-separated model names (default: all)')
+    parser.add_argument('--corpus', default=CORPUS_DIR)
+    parser.add_argument('--synthetic', default=None, help='replay this synthetic corpus (JSONL) instead')
+    parser.add_argument('--limit', type=int, default=None, help='only the first N responses')
+    parser.add_argument('--repeat', type=int, default=1, help='timing passes per extractor; the fastest is kept')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help='write this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='relative slack on speed and memory before flagging a regression')
+    parser.add_argument('--output', default=None, help='also write the results as JSON')
+    parser.add_argument('--standin', action='store_true', help='serve llm_extract from an in-process stand-in')
+    llm_extract.add_llm_args(parser)
+    add_config_args(parser)
+    args = parser.parse_args()
+
+    names = args.extractors.split(',')
+    unknown = [n for n in names if n not in EXTRACTORS and n != 'llm_extract']
+    if unknown:
+        sys.exit(f'Unknown extractor(s): {", ".join(unknown)}')
+
+    models = set(args.models.split(',')) if args.models else None
+    if args.synthetic:
+        records = (r for r in iter_corpus(args.synthetic) if not models or r['model'] in models)
+        items = [(r['model'], r['task_id'], r['text']) for r in itertools.islice(records, args.limit)]
+    else:
+        items = load_corpus(args.corpus, models)
+        items = items[:args.limit] if args.limit else items
+    judged = load_evaluations(sorted({model for model, _, _ in items}))
+
+    regex_names = [n for n in names if n in EXTRACTORS]
+    indexes = load_indexes(TASKS_FILE, regex_names)
+    runners = {n: EXTRACTORS[n] for n in regex_names}
+    cache = None
+    if 'llm_extract' in names:
+        if args.standin:
+            server, args.base_url = start_server(config_from_args(args, llm_extract.PROMPT_VERSION))
+        limiter, cache = llm_extract.configure(args)
+        indexes['llm_extract'] = llm_extract.load_task_index()
+        runners['llm_extract'] = make_llm_runner(limiter, args.max_retries, cache)
+
+    rows = {}
+    for name in names:
+        index = indexes[name]
+        work = [(model, tid, text, index[tid]) for model, tid, text in items if tid in index]
+        rows[name] = measure(runners[name], work, judged, args.repeat,
+                             memory=not args.no_memory and name != 'llm_extract')
+    if cache is not None:
+        llm_extract.close_cache(cache, args)
+
+    selection = {'source': args.synthetic or args.corpus, 'synthetic': bool(args.synthetic),
+                 'models': sorted(models) if models else None, 'limit': args.limit, 'responses': len(items)}
+    evaluated = sum((model, tid) in judged for model, tid, _ in items)
+    print(f'\n=== EXTRACTOR BENCHMARK ({len(items)} responses, {evaluated} with evaluations) ===')
+    print_table(rows)
+
+    status = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('corpus') != selection:
+            # Different responses give different speeds and pass rates: comparing would flag noise
+            print(f'\nBASELINE MISMATCH: {args.baseline} ({baseline["created"]}) was measured on '
+                  f'{baseline.get("corpus", "an unrecorded corpus selection")}, this run on {selection}; '
+                  f'not compared (rerun with the same selection, or --save-baseline)')
+            status = 1
+        else:
+            flags = find_regressions(rows, baseline['extractors'], args.tolerance)
+            print(f'\nBaseline {args.baseline} ({baseline["created"]}): '
+                  + (f'{len(flags)} regression(s)' if flags else 'no regressions'))
+            for line in flags:
+                print(f'  REGRESSION {line}')
+            status = 1 if flags else 0
+
+    report = {'created': datetime.datetime.now().isoformat(timespec='seconds'),
+              'responses': len(items), 'corpus': selection, 'extractors': rows}
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nBaseline written to {args.baseline}')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    sys.exit(status)
+
+if __name__ == '__main__':
+    main()
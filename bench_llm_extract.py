@@ -0,0 +1,98 @@
+"""Throughput benchmark for the LLM extraction pipeline, fully offline.
+
+Starts the mock_messages_api stand-in in-process (or uses --base-url), then
+pushes one model's stored responses through llm_extract.extract_response at
+each requested concurrency level and reports requests/sec and p50/p95
+per-task latency, together with how many 429s/errors the stand-in injected.
+
+    python bench_llm_extract.py --concurrency 1,4,8,16 --latency-ms 400 \\
+        --burst-every 40 --burst-length 4 --rpm 0 --tpm 0
+    python bench_llm_extract.py --concurrency 4 --pack 10      # packed prompts
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import llm_extract
+from batch_extract import CORPUS_DIR, find_sources, load_responses
+from llm_client import percentile
+from mock_messages_api import add_config_args, config_from_args, start_server
+
+def run_level(items, concurrency, args):
+    limiter = llm_extract.RateLimiter(args.rpm or None, args.tpm or None)
+
+    def timed(group):
+        start = time.perf_counter()
+        outcomes, _, _ = llm_extract.extract_packed(group, limiter, args.max_retries)
+        # Every task in a packed request waits for the whole request
+        return [(time.perf_counter() - start, value is not None) for value, _ in outcomes]
+
+    size = max(1, args.pack)
+    groups = [items[i:i + size] for i in range(0, len(items), size)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = [o for part in pool.map(timed, groups) for o in part]
+    wall = time.perf_counter() - start
+    latencies = [lat for lat, _ in outcomes]
+    return {
+        'concurrency': concurrency,
+        'tasks': len(items),
+        'extracted': sum(ok for _, ok in outcomes),
+        'wall_s': wall,
+        'req_per_s': len(items) / wall,
+        'p50_ms': 1000 * percentile(latencies, 50),
+        'p95_ms': 1000 * percentile(latencies, 95),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark llm_extract against a local messages API stand-in.')
+    parser.add_argument('--model', default='gpt-5.2', help=f'model directory under {CORPUS_DIR}')
+    parser.add_argument('--limit', type=int, default=None, help='only the first N tasks')
+    parser.add_argument('--concurrency', default='1,4,8,16', help='comma-separated concurrency levels')
+    parser.add_argument('--rpm', type=int, default=0, help='client requests/min limit (0 = unlimited)')
+    parser.add_argument('--tpm', type=int, default=0, help='client tokens/min limit (0 = unlimited)')
+    parser.add_argument('--max-retries', type=int, default=5)
+    parser.add_argument('--pack', type=int, default=1, help='responses per request (llm_extract --pack)')
+    parser.add_argument('--base-url', default=None, help='use an already running stand-in instead of starting one')
+    parser.add_argument('--output', default=None, help='also write the results table as JSON')
+    add_config_args(parser)
+    args = parser.parse_args()
+
+    index = llm_extract.load_task_index()
+    source = find_sources(CORPUS_DIR, {args.model})[args.model]
+    responses = load_responses(source)
+    items = [(responses[tid], index[tid]) for tid in sorted(responses) if tid in index]
+    items = items[:args.limit] if args.limit else items
+
+    config = None
+    if args.base_url:
+        llm_extract.BASE_URL = args.base_url
+    else:
+        config = config_from_args(args, llm_extract.PROMPT_VERSION)
+        server, llm_extract.BASE_URL = start_server(config)
+
+    levels = [int(c) for c in args.concurrency.split(',')]
+    llm_extract.CLIENT_OPTIONS['size'] = max(levels)
+    rows = []
+    print(f'{"conc":>5} {"tasks":>6} {"ok":>5} {"wall s":>8} {"task/s":>7} {"p50 ms":>8} {"p95 ms":>8} {"429s":>5} '
+          f'{"errors":>6} {"requests":>8}')
+    for level in levels:
+        before = dict(config.counts) if config else {}
+        row = run_level(items, level, args)
+        if config:
+            row['served_429'] = config.counts['429'] - before['429']
+            row['served_errors'] = config.counts['error'] - before['error']
+            row['served_requests'] = config.counts['requests'] - before['requests']
+        rows.append(row)
+        print(f'{level:>5} {row["tasks"]:>6} {row["extracted"]:>5} {row["wall_s"]:>8.2f} {row["req_per_s"]:>7.1f} '
+              f'{row["p50_ms"]:>8.0f} {row["p95_ms"]:>8.0f} {row.get("served_429", "-"):>5} {row.get("served_errors", "-"):>6} '
+              f'{row.get("served_requests", "-"):>8}')
+    print(llm_extract.api_summary())
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == '__main__':
+    main()
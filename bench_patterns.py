@@ -0,0 +1,145 @@
+"""Fuzz benchmark: regex time must grow linearly with response length.
+
+Builds adversarial responses that push backtracking regexes super-linear:
+
+- long digit, digit-comma and decimal runs, whitespace and "n" runs;
+- unclosed **bold** and \\boxed{ openers, '*' runs, '=' runs;
+- each pattern's keywords (its needles) repeated with no number or
+  terminator after them, alone and between filler words;
+
+at lengths --size x 1, 2, 4, 8. Every pattern in scanner.PATTERNS is timed
+on every family (best of --repeat finditer passes), then every extractor end
+to end with one task per answer kind, which also exercises the lexer and the
+Scan character budget. A pattern or extractor passes when its worst family
+grows at most GROWTH_LIMIT times from 1x to 8x length (linear growth is 8x,
+quadratic 64x); times under FLOOR_SECONDS count as FLOOR_SECONDS, so timer
+noise on trivial runs cannot fail a check. A run over MAX_SECONDS stops that
+family at once and fails it.
+
+    python bench_patterns.py
+    python bench_patterns.py --size 20000 --patterns ev_,s2_ --no-extractors
+"""
+import argparse
+import gc
+import sys
+import time
+
+from batch_extract import EXTRACTORS, TASKS_FILE, load_indexes
+from scanner import PATTERNS
+
+SIZE = 5000
+SCALES = (1, 2, 4, 8)
+GROWTH_LIMIT = 16.0
+FLOOR_SECONDS = 50e-6
+MAX_SECONDS = 2.0
+
+FAMILIES = {
+    'digits': '1',
+    'digit_commas': '1,',
+    'decimals': '1.',
+    'spaces': ' ',
+    'n_run': 'n',
+    'stars': '*',
+    'equals': '=',
+    'unclosed_bold': '**1',
+    'unclosed_boxed': '\\boxed{1 ',
+}
+
+def fill(unit, length):
+    return (unit * (length // len(unit) + 1))[:length]
+
+def families(needles=()):
+    """{family name: repeating unit}, with keyword families for the given needles."""
+    units = dict(FAMILIES)
+    for needle in needles:
+        units[f'kw:{needle}'] = needle + ' '
+        units[f'kw:{needle}+words'] = needle + ' and the '
+    return units
+
+def best_time(fn, text, repeat):
+    best = float('inf')
+    gc.disable()  # as timeit does: a collection inside one run is not the pattern's cost
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(text)
+            best = min(best, time.perf_counter() - start)
+            if best > MAX_SECONDS:
+                break
+    finally:
+        gc.enable()
+    return best
+
+def growth(fn, unit, size, repeat, lower=False):
+    """(times at each of SCALES, growth from the first to the last); growth is inf past MAX_SECONDS."""
+    times = []
+    for scale in SCALES:
+        text = fill(unit, size * scale)
+        t = best_time(fn, text.lower() if lower else text, repeat)
+        times.append(t)
+        if t > MAX_SECONDS:
+            return times, float('inf')
+    return times, max(times[-1], FLOOR_SECONDS) / max(times[0], FLOOR_SECONDS)
+
+def check(label, fn, units, size, repeat, lower=False):
+    """Row for the worst family of one pattern or extractor."""
+    worst = None
+    for family, unit in units.items():
+        times, g = growth(fn, unit, size, repeat, lower)
+        if worst is None or g > worst['growth']:
+            worst = {'name': label, 'family': family, 'growth': g, 'seconds': times[-1]}
+    worst['pass'] = worst['growth'] <= GROWTH_LIMIT
+    return worst
+
+def pattern_rows(size, repeat, prefixes=None):
+    rows = []
+    for name, pat in PATTERNS.items():
+        if prefixes and not name.startswith(prefixes):
+            continue
+        rows.append(check(name, lambda text, r=pat.regex: list(r.finditer(text)), families(pat.needles),
+                          size, repeat, pat.lower))
+    return rows
+
+def extractor_rows(size, repeat):
+    indexes = load_indexes(TASKS_FILE, list(EXTRACTORS))
+    needles = sorted({n for pat in PATTERNS.values() for n in pat.needles if n.isalpha()})
+    units = families(needles)
+    rows = []
+    for name, run in EXTRACTORS.items():
+        specs = {}
+        for spec in indexes[name]:
+            if spec.field is not None and spec.expected is not None:
+                specs.setdefault(spec.kind, spec)
+        for kind, spec in sorted(specs.items()):
+            rows.append(check(f'{name}[{kind}]', lambda text, run=run, spec=spec: run(text, spec), units,
+                              size, repeat))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--size', type=int, default=SIZE, help='characters at 1x length')
+    parser.add_argument('--repeat', type=int, default=3, help='timing passes per input (fastest counts)')
+    parser.add_argument('--patterns', default=None, help='comma-separated pattern name prefixes (default: all)')
+    parser.add_argument('--no-extractors', action='store_true', help='time the patterns only')
+    args = parser.parse_args()
+
+    prefixes = tuple(args.patterns.split(',')) if args.patterns else None
+    start = time.perf_counter()
+    rows = pattern_rows(args.size, args.repeat, prefixes)
+    if not args.no_extractors:
+        rows += extractor_rows(args.size, args.repeat)
+    elapsed = time.perf_counter() - start
+
+    bad = [r for r in rows if not r['pass']]
+    for r in bad:
+        print(f'  FAIL {r["name"]}: {r["growth"]:.1f}x time for {SCALES[-1]}x length on {r["family"]} '
+              f'({1000 * r["seconds"]:.1f} ms at {SCALES[-1] * args.size} chars)')
+    worst = max(rows, key=lambda r: r['growth'])
+    print(f'\n=== LINEARITY CHECK ({len(rows)} patterns/extractors, {args.size}-{SCALES[-1] * args.size} chars, '
+          f'limit {GROWTH_LIMIT:g}x) ===')
+    print(f'Linear: {len(rows) - len(bad)} | Super-linear: {len(bad)} | '
+          f'Worst: {worst["name"]} {worst["growth"]:.1f}x on {worst["family"]} | {elapsed:.1f}s')
+    sys.exit(1 if bad else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Regex-first extraction cascade: ask the LLM only when the regex is unsure.
+
+Every response first goes through smart_extract2.extract_value with
+with_confidence=True. Answers scoring at least --threshold are kept as-is;
+the rest (and responses where no regex matched) are sent to Claude via
+llm_extract, concurrently and rate-limited like llm_extract.main. If Claude
+gives no usable number or the API call fails, the regex answer is kept.
+
+Reads results/raw/<tid>.txt, or a stored model's responses with --model.
+Writes results/agent_results.json like the other extractors.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import llm_extract
+import smart_extract2
+from batch_extract import CORPUS_DIR, find_sources, load_responses
+from result_log import write_json
+
+RAW_DIR = 'results/raw'
+OUTPUT_FILE = 'results/agent_results.json'
+DEFAULT_THRESHOLD = 0.7
+
+def load_raw_responses(tids):
+    responses = {}
+    for tid in tids:
+        raw_file = os.path.join(RAW_DIR, f'{tid}.txt')
+        if os.path.exists(raw_file):
+            with open(raw_file) as f:
+                responses[tid] = f.read()
+    return responses
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='minimum regex confidence to skip the LLM')
+    parser.add_argument('--model', default=None, help=f'read responses from {CORPUS_DIR}/<model> instead of {RAW_DIR}')
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    llm_extract.add_llm_args(parser)
+    args = parser.parse_args()
+
+    index = smart_extract2.load_task_index()
+    if args.model:
+        responses = load_responses(find_sources(CORPUS_DIR, {args.model})[args.model])
+    else:
+        responses = load_raw_responses(index.ids())
+
+    start = time.perf_counter()
+    rows = []
+    uncertain = []
+    for spec in index:
+        if spec.id not in responses or spec.field is None:
+            continue
+        value, confidence = smart_extract2.extract_value(responses[spec.id], spec.kind, spec.expected, with_confidence=True)
+        row = {'tid': spec.id, 'field': spec.field, 'kind': spec.kind, 'expected': spec.expected, 'value': value,
+               'tol': spec.tol, 'source': 'regex', 'confidence': confidence}
+        rows.append(row)
+        if confidence['score'] < args.threshold:
+            uncertain.append(row)
+    regex_time = time.perf_counter() - start
+
+    if uncertain:
+        limiter, cache = llm_extract.configure(args)
+
+        def ask(row):
+            """(LLM value or None, API error or None)."""
+            try:
+                value, _ = llm_extract.extract_field(responses[row['tid']], row['field'], limiter, args.max_retries,
+                                                     cache)
+                return value, None
+            except llm_extract.APIError as e:
+                return None, str(e)
+
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+            replies = list(pool.map(ask, uncertain))
+        for row, (value, error) in zip(uncertain, replies):
+            if value is not None:
+                row['value'] = value
+                row['source'] = 'llm'
+            else:
+                # No usable number, or the call failed: the regex answer stands
+                row['source'] = 'regex_fallback'
+                row['llm_error'] = error
+    else:
+        cache = None
+    elapsed = time.perf_counter() - start
+
+    results = {r['tid']: r['value'] for r in rows if r['value'] is not None}
+    write_json(args.output, results)
+
+    passed = 0
+    fail_log = []
+    for r in rows:
+        tol = r['tol']
+        if r['value'] is not None and abs(r['value'] - r['expected']) <= tol:
+            passed += 1
+        else:
+            fail_log.append(f'  {r["tid"]}: got={r["value"]}, want={r["expected"]}, tol=±{tol}, '
+                            f'source={r["source"]}, score={r["confidence"]["score"]}')
+
+    by_source = {s: sum(1 for r in rows if r['source'] == s) for s in ('regex', 'llm', 'regex_fallback')}
+    api_errors = sum(1 for r in rows if r.get('llm_error'))
+    print(f'\n=== CASCADE EXTRACTION (threshold {args.threshold}) ===')
+    print(f'Tasks: {len(rows)} | Regex accepted: {by_source["regex"]} | Sent to LLM: {len(uncertain)} '
+          f'({by_source["llm"]} answered, {by_source["regex_fallback"]} kept regex value, {api_errors} API errors)')
+    print(f'Passed: {passed}/{len(rows)}')
+    print(f'Time: {elapsed:.1f}s (regex stage {regex_time:.2f}s)')
+    if uncertain:
+        print(llm_extract.api_summary())
+    if cache is not None:
+        llm_extract.close_cache(cache, args)
+    print(f'Results written to {args.output}')
+
+    if fail_log:
+        print(f'\n=== NON-PASS ({len(fail_log)}) ===')
+        for line in fail_log:
+            print(line)
+
+if __name__ == '__main__':
+    main()
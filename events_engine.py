@@ -0,0 +1,376 @@
+"""Vectorised event-driven survival and count-data sample sizes.
+
+Survival (log-rank / Cox):
+
+- schoenfeld_events / freedman_events: events needed for a hazard ratio
+- event_probability: chance a patient's event is observed under exponential
+  survival, uniform accrual over `accrual`, further `followup`, and
+  competing or dropout hazards that censor it
+- patients: events -> patients per arm from the two arms' event probabilities
+
+Counts (Poisson / negative binomial / zero-inflated Poisson, Wald test on
+the log rate ratio):
+
+- count_n / count_power: control-group size or power for expected counts
+  per subject (rate x exposure), NB size k (var = mu + mu^2 / k), a
+  zero-inflation probability, a design effect for clustering and unequal
+  allocation
+- poisreg_n / poisreg_power: the slope of a Poisson regression on a normal
+  or Bernoulli covariate (pwrss.z.poisreg, powerMediation's sizePoisson)
+- integrated_rate: expected events per subject under a linearly growing rate
+
+Every function broadcasts over NumPy arrays, so a whole grid of designs is
+one call:
+
+    events_engine.schoenfeld_events(np.array([0.6, 0.7, 0.8])[:, None], power=np.array([0.8, 0.9]))
+
+    python events_engine.py                    # validate against all_tasks.json
+    python events_engine.py --tasks v2.2/tier2/tasks.json --verbose
+    python events_engine.py --table --accrual 2 --followup 1
+"""
+import argparse
+import re
+import sys
+import time
+
+import numpy as np
+from scipy import stats
+
+from riley_engine import R_ARG
+from task_index import iter_tasks
+
+TASKS_FILE = 'all_tasks.json'
+TEMPLATES = ('survival_analysis', 'poisson_regression')
+
+def z_sum(alpha=0.05, power=0.8, sides=2):
+    return stats.norm.isf(np.asarray(alpha) / sides) + stats.norm.ppf(power)
+
+def _ceil(x):
+    # Guard against float noise pushing an exact integer up by one
+    return np.ceil(np.asarray(x) - 1e-9)
+
+# --- survival ---
+
+def hazard_from_median(median):
+    return np.log(2) / np.asarray(median, dtype=float)
+
+def hazard_from_survival(survival, at):
+    """Exponential hazard with S(at) = survival (equally: event probability 1 - survival by `at`)."""
+    return -np.log(np.asarray(survival, dtype=float)) / np.asarray(at, dtype=float)
+
+def schoenfeld_events(hr, alpha=0.05, power=0.8, sides=2, allocation=0.5, x_var=None):
+    """Events for a Cox / log-rank test of hazard ratio hr.
+
+    x_var is the covariate variance: allocation (1 - allocation) for two
+    arms (the default), 1 for a standardised continuous predictor.
+    """
+    if x_var is None:
+        x_var = np.asarray(allocation) * (1 - np.asarray(allocation))
+    return z_sum(alpha, power, sides) ** 2 / (x_var * np.log(hr) ** 2)
+
+def freedman_events(hr, alpha=0.05, power=0.8, sides=2):
+    """Events for a 1:1 log-rank test of hazard ratio hr (Freedman)."""
+    hr = np.asarray(hr, dtype=float)
+    return z_sum(alpha, power, sides) ** 2 * (1 + hr) ** 2 / (1 - hr) ** 2
+
+def logrank_power(events, hr, alpha=0.05, sides=2, allocation=0.5, x_var=None):
+    """Power of the Schoenfeld test with this many events."""
+    if x_var is None:
+        x_var = np.asarray(allocation) * (1 - np.asarray(allocation))
+    return stats.norm.cdf(np.sqrt(np.asarray(events) * x_var) * np.abs(np.log(hr))
+                          - stats.norm.isf(np.asarray(alpha) / sides))
+
+def event_probability(hazard, followup, accrual=0.0, competing=0.0):
+    """P(the event is observed) for exponential event and competing hazards.
+
+    Patients enter uniformly over [0, accrual] and are followed until
+    accrual + followup; a competing (or dropout) event censors them first.
+    """
+    hazard, competing = np.asarray(hazard, dtype=float), np.asarray(competing, dtype=float)
+    followup, accrual = np.asarray(followup, dtype=float), np.asarray(accrual, dtype=float)
+    total = hazard + competing
+    with np.errstate(invalid='ignore', divide='ignore'):
+        spread = (np.exp(-total * followup) - np.exp(-total * (accrual + followup))) / (total * accrual)
+    unobserved = np.where(accrual > 0, spread, np.exp(-total * followup))
+    return hazard / total * (1 - unobserved)
+
+def patients(events, p_control, p_treatment, allocation=0.5, dropout=0.0):
+    """(per control arm, per treatment arm, total) patients for `events` observed events.
+
+    A dropout fraction inflates the arms afterwards, as n / (1 - dropout).
+    """
+    total = np.asarray(events) / (allocation * p_treatment + (1 - allocation) * p_control)
+    control = _ceil(_ceil(total * (1 - allocation)) / (1 - np.asarray(dropout)))
+    treatment = _ceil(_ceil(total * allocation) / (1 - np.asarray(dropout)))
+    return control, treatment, control + treatment
+
+# --- counts ---
+
+def integrated_rate(rate, years, growth=0.0):
+    """Expected events per subject over `years` for a rate growing linearly by `growth` x rate per year."""
+    years = np.asarray(years, dtype=float)
+    return np.asarray(rate) * (years + np.asarray(growth) * years ** 2 / 2)
+
+def _count_var(mu, k, zero_inflation):
+    """Var(count) / mean^2 of one subject; mu is the mean of the non-zero-inflated part."""
+    pi = np.asarray(zero_inflation, dtype=float)
+    mean = (1 - pi) * mu
+    return (1 + pi * mu) / mean + 1 / np.asarray(k, dtype=float)
+
+def _count_spread(mu0, mu1, k, zero_inflation, ratio, null_var):
+    """(null, alternative) variance of log(mu1 / mu0) x control-group n.
+
+    null_var=False is the Wald test (both at the alternative); True puts the
+    null at the pooled mean, as MKpower's power.nb.test (approach 3) does.
+    """
+    mu0, mu1, ratio = np.asarray(mu0, dtype=float), np.asarray(mu1, dtype=float), np.asarray(ratio, dtype=float)
+    alt = _count_var(mu0, k, zero_inflation) + _count_var(mu1, k, zero_inflation) / ratio
+    pooled = (mu0 + ratio * mu1) / (1 + ratio)
+    null = _count_var(pooled, k, zero_inflation) * (1 + 1 / ratio)
+    return np.where(null_var, null, alt), alt
+
+def count_n(mu0, mu1, alpha=0.05, power=0.8, sides=2, k=np.inf, zero_inflation=0.0, design_effect=1.0,
+            ratio=1.0, null_var=False):
+    """Control-group size (unrounded; treatment is ratio x it) to detect mean count mu0 vs mu1."""
+    null, alt = _count_spread(mu0, mu1, k, zero_inflation, ratio, null_var)
+    z = stats.norm.isf(np.asarray(alpha) / sides) * np.sqrt(null) + stats.norm.ppf(power) * np.sqrt(alt)
+    return z ** 2 / np.log(np.asarray(mu1) / mu0) ** 2 * design_effect
+
+def count_power(n, mu0, mu1, alpha=0.05, sides=2, k=np.inf, zero_inflation=0.0, design_effect=1.0,
+                ratio=1.0, null_var=False):
+    """Power with n control subjects."""
+    null, alt = _count_spread(mu0, mu1, k, zero_inflation, ratio, null_var)
+    shift = np.abs(np.log(np.asarray(mu1) / mu0)) * np.sqrt(np.asarray(n) / design_effect)
+    return stats.norm.cdf((shift - stats.norm.isf(np.asarray(alpha) / sides) * np.sqrt(null)) / np.sqrt(alt))
+
+def _poisreg_spread(beta0, beta1, x_mean, x_var, distribution, null_var):
+    """(null, alternative) variance of the slope estimate x n for log E[y] = beta0 + beta1 x."""
+    beta0, beta1 = np.asarray(beta0, dtype=float), np.asarray(beta1, dtype=float)
+    x_mean, x_var = np.asarray(x_mean, dtype=float), np.asarray(x_var, dtype=float)
+    if distribution == 'bernoulli':
+        alt = 1 / (x_mean * np.exp(beta0 + beta1)) + 1 / ((1 - x_mean) * np.exp(beta0))
+        null = 1 / (np.exp(beta0) * x_mean * (1 - x_mean))
+    else:
+        alt = np.exp(-beta0 - beta1 * x_mean - beta1 ** 2 * x_var / 2) / x_var
+        null = np.exp(-beta0) / x_var
+    return np.where(null_var, null, alt), alt
+
+def poisreg_n(beta0, beta1, alpha=0.05, power=0.8, sides=2, x_mean=0.0, x_var=1.0, distribution='normal',
+              exposure=1.0, null_var=False):
+    """Total n (unrounded) for the slope of a Poisson regression on one covariate.
+
+    null_var=False is pwrss.z.poisreg's Wald test (method "demidenko");
+    True is Signorini's, as powerMediation's sizePoisson uses.
+    """
+    null, alt = _poisreg_spread(beta0, beta1, x_mean, x_var, distribution, null_var)
+    z = stats.norm.isf(np.asarray(alpha) / sides) * np.sqrt(null) + stats.norm.ppf(power) * np.sqrt(alt)
+    return z ** 2 / (np.asarray(exposure) * np.asarray(beta1) ** 2)
+
+def poisreg_power(n, beta0, beta1, alpha=0.05, sides=2, x_mean=0.0, x_var=1.0, distribution='normal',
+                  exposure=1.0, null_var=False):
+    null, alt = _poisreg_spread(beta0, beta1, x_mean, x_var, distribution, null_var)
+    shift = np.abs(beta1) * np.sqrt(np.asarray(n) * exposure)
+    return stats.norm.cdf((shift - stats.norm.isf(np.asarray(alpha) / sides) * np.sqrt(null)) / np.sqrt(alt))
+
+# --- tasks ---
+
+R_CALL = re.compile(r'\b(power\.nb\.test|sizePoisson|powerPoisson|pwrss\.z\.poisreg)\s*\(((?:[^()]|\([^()]*\))*)\)')
+R_FUNC = re.compile(r'^(log|exp|sqrt)\((.*)\)$')
+SURVIVAL_AT = re.compile(r'^control_(\d+)(yr|mo)_survival$')
+
+def _r_value(text):
+    text = text.strip()
+    if text[:1] in '\'"':
+        return text[1:-1]
+    m = R_FUNC.match(text)
+    if m:
+        return float(getattr(np, m.group(1))(_r_value(m.group(2))))
+    return float(text)
+
+def parse_call(code):
+    """(function, {argument: value}) of the first count-data sample-size call in R code, else None."""
+    m = R_CALL.search(code or '')
+    if m is None:
+        return None
+    return m.group(1), {k: _r_value(v) for k, v in R_ARG.findall(m.group(2))}
+
+def call_task(function, args):
+    """{field: value} for a power.nb.test / sizePoisson / powerPoisson / pwrss.z.poisreg call."""
+    alpha = args.get('sig.level', args.get('alpha', 0.05))
+    if function == 'power.nb.test':
+        duration = args.get('duration', 1.0)
+        mu0 = args['mu0'] * duration
+        mu1 = args['mu1'] * duration if 'mu1' in args else mu0 * args['RR']
+        kw = {'k': args['theta'], 'ratio': args.get('ssize.ratio', 1.0), 'null_var': True}
+        if 'n' in args:
+            return {'power': count_power(args['n'], mu0, mu1, alpha, **kw)}
+        n = count_n(mu0, mu1, alpha, args['power'], **kw)
+        return {'sample_size': _ceil(n), 'n1': _ceil(n * kw['ratio'])}
+    if function in ('sizePoisson', 'powerPoisson'):
+        kw = {'x_mean': args.get('mu.x1', 0.0), 'x_var': args.get('sigma2.x1', 1.0), 'null_var': True}
+        if function == 'powerPoisson':
+            return {'power': poisreg_power(args['N'], args['beta0'], args['beta1'], alpha, **kw)}
+        return {'sample_size': _ceil(poisreg_n(args['beta0'], args['beta1'], alpha, args['power'], **kw))}
+    distribution = args.get('distribution', 'normal')
+    kw = {'distribution': distribution, 'x_mean': 0.5 if distribution == 'bernoulli' else 0.0,
+          'x_var': 0.25 if distribution == 'bernoulli' else 1.0, 'exposure': args.get('mean.exposure', 1.0)}
+    beta0, beta1 = np.log(args['exp.beta0']), np.log(args['exp.beta1'])
+    n = args['n'] if 'n' in args else _ceil(poisreg_n(beta0, beta1, alpha, args['power'], **kw))
+    return {'n': n, 'power': poisreg_power(n, beta0, beta1, alpha, **kw)}
+
+def _years(gt, name):
+    """gt[name_years] or gt[name_months] / 12, else None."""
+    if gt.get(f'{name}_years') is not None:
+        return gt[f'{name}_years']
+    if gt.get(f'{name}_months') is not None:
+        return gt[f'{name}_months'] / 12
+    return None
+
+def survival_task(gt):
+    """{field: value} the engine derives for a survival_analysis ground truth, or None."""
+    alpha, power, hr = gt.get('alpha', 0.05), gt.get('power'), gt.get('hazard_ratio')
+    if hr is None or power is None:
+        return None
+    events = _ceil(schoenfeld_events(hr, alpha, power, x_var=1.0 if 'sample_size' in gt else None))
+    if 'sample_size' in gt:
+        # Continuous predictor: event_rate is the overall event probability
+        return {'events_needed': events, 'sample_size': _ceil(events / gt['event_rate'])}
+    if gt.get('competing_event_rate') is not None:
+        # Cause-specific hazards over a unit horizon, competing hazard unaffected by treatment
+        cumulative = -np.log(1 - gt['control_event_rate'] - gt['competing_event_rate'])
+        share = gt['control_event_rate'] / (gt['control_event_rate'] + gt['competing_event_rate'])
+        lam, gamma = cumulative * share, cumulative * (1 - share)
+        pc, pt = event_probability(lam, 1.0, 0, gamma), event_probability(hr * lam, 1.0, 0, gamma)
+    elif gt.get('control_event_rate') is not None:
+        # The pooled event probability over the study, as the stratified reference uses it
+        pc = pt = gt['control_event_rate']
+    else:
+        follow = _years(gt, 'followup') or _years(gt, 'study_duration')
+        accrual = _years(gt, 'accrual') or 0.0
+        median = gt.get('control_median_survival')
+        if median is None and gt.get('control_median_months') is not None:
+            median = gt['control_median_months'] / 12
+        if median is not None:
+            lam = hazard_from_median(median)
+        else:
+            found = [(k, m) for k in gt for m in [SURVIVAL_AT.match(k)] if m]
+            if not found or follow is None:
+                return None
+            key, m = found[0]
+            lam = hazard_from_survival(gt[key], int(m.group(1)) / (12 if m.group(2) == 'mo' else 1))
+        if follow is None:
+            return None
+        pc, pt = event_probability(lam, follow, accrual), event_probability(hr * lam, follow, accrual)
+    control, treatment, total = patients(events, pc, pt, dropout=gt.get('dropout_rate', 0.0))
+    return {'events_needed': events, 'subjects_per_arm': np.maximum(control, treatment), 'total_subjects': total}
+
+def count_task(gt, code=''):
+    """{field: value} the engine derives for a poisson_regression task, or None."""
+    parsed = parse_call(code)
+    if parsed:
+        return call_task(*parsed)
+    alpha, power = gt.get('alpha', 0.05), gt.get('power')
+    exposure = gt.get('mean_exposure', 1.0)
+    if gt.get('zero_inflation') is not None:
+        mu0, mu1 = gt['control_mean_nonzero'], gt['treatment_mean_nonzero']
+    elif gt.get('control_mean') is not None:
+        mu0, mu1 = gt['control_mean'], gt['treatment_mean']
+    elif gt.get('rate_increase_per_year') is not None:
+        mu0 = integrated_rate(gt['baseline_rate'], gt['study_years'], gt['rate_increase_per_year'])
+        mu1 = mu0 * gt['rate_ratio']
+    elif gt.get('control_rate') is not None and gt.get('treatment_rate') is not None:
+        # Rates per month over the follow-up
+        months = gt.get('followup_months') or 12 * gt.get('followup_years', 1)
+        mu0, mu1 = gt['control_rate'] * months, gt['treatment_rate'] * months
+    else:
+        base = gt.get('baseline_rate', gt.get('control_rate'))
+        if base is None or gt.get('rate_ratio') is None:
+            return None
+        mu0 = base * exposure * gt.get('followup_years', 1)
+        mu1 = mu0 * gt['rate_ratio']
+    kw = {'k': gt.get('dispersion_k', np.inf), 'zero_inflation': gt.get('zero_inflation', 0.0)}
+    if gt.get('given_clusters_per_arm') is not None:
+        m = gt['given_subjects_per_cluster']
+        design_effect = 1 + (m - 1) * gt.get('icc', 0)
+        return {'power': count_power(gt['given_clusters_per_arm'] * m, mu0, mu1, alpha,
+                                     design_effect=design_effect, **kw)}
+    n = count_n(mu0, mu1, alpha, power, **kw)
+    return {'subjects_per_group': _ceil(n), 'total_subjects': _ceil(2 * n)}
+
+def validate(tasks):
+    rows = []
+    for task in tasks:
+        template = task.get('template')
+        if template not in TEMPLATES:
+            continue
+        gt, tol = task['ground_truth'], task.get('tolerance', {})
+        if template == 'survival_analysis':
+            derived = survival_task(gt)
+        else:
+            derived = count_task(gt, task.get('reference_code') or '')
+        if derived is None:
+            rows.append({'id': task['id'], 'covered': False, 'pass': True, 'checks': []})
+            continue
+        checks = []
+        for field, value in derived.items():
+            if gt.get(field) is None:
+                continue
+            value = np.asarray(value).item()
+            limit = tol.get('power', 0) if field == 'power' else tol.get(field, tol.get('sample_size', 0))
+            if field == 'events_needed':
+                limit = tol.get(field, 2)
+            checks.append((field, round(value, 4), gt[field], limit, abs(value - gt[field]) <= limit))
+        rows.append({'id': task['id'], 'covered': True, 'checks': checks, 'pass': all(c[-1] for c in checks)})
+    return rows
+
+def print_table(hrs, medians, accrual, followup, alpha, power):
+    """Schoenfeld events and patients per arm over a hazard ratio x control median grid."""
+    hr, median = np.asarray(hrs)[:, None], np.asarray(medians)[None, :]
+    events = _ceil(schoenfeld_events(hr, alpha, power))
+    lam = hazard_from_median(median)
+    control, treatment, _ = patients(events, event_probability(lam, followup, accrual),
+                                     event_probability(hr * lam, followup, accrual))
+    print(f'\n=== EVENTS / PATIENTS PER ARM (accrual {accrual}, follow-up {followup}, alpha {alpha}, '
+          f'power {power}) ===')
+    print(f'{"HR":>6} {"events":>7}' + ''.join(f' {f"median {m}":>12}' for m in medians))
+    for i, h in enumerate(hrs):
+        print(f'{h:>6} {int(events[i, 0]):>7}' + ''.join(f' {int(max(control[i, j], treatment[i, j])):>12}'
+                                                        for j in range(len(medians))))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--tasks', default=TASKS_FILE, help='task file (JSON array, tier file or JSONL)')
+    parser.add_argument('--verbose', action='store_true', help='print every task, not just mismatches')
+    parser.add_argument('--table', action='store_true', help='print a survival sensitivity table instead')
+    parser.add_argument('--hrs', default='0.5,0.6,0.65,0.7,0.75,0.8')
+    parser.add_argument('--medians', default='1,2,3,5', help='control median survival (same unit as accrual)')
+    parser.add_argument('--accrual', type=float, default=2.0)
+    parser.add_argument('--followup', type=float, default=1.0)
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--power', type=float, default=0.8)
+    args = parser.parse_args()
+
+    if args.table:
+        print_table([float(x) for x in args.hrs.split(',')], [float(x) for x in args.medians.split(',')],
+                    args.accrual, args.followup, args.alpha, args.power)
+        return
+
+    tasks = list(iter_tasks(args.tasks))
+    start = time.perf_counter()
+    rows = validate(tasks)
+    elapsed = time.perf_counter() - start
+    covered = [r for r in rows if r['covered']]
+    bad = [r for r in covered if not r['pass']]
+    for r in rows if args.verbose else bad:
+        if not r['covered']:
+            print(f'  skip {r["id"]}')
+            continue
+        detail = ' '.join(f'{f}={v:g} (stored {s} ±{t})' for f, v, s, t, _ in r['checks'])
+        print(f'  {"ok  " if r["pass"] else "FAIL"} {r["id"]:<16} {detail}')
+    print(f'\n=== GROUND TRUTH CHECK ({args.tasks}) ===')
+    print(f'Covered tasks: {len(covered)}/{len(rows)} | Reproduced: {len(covered) - len(bad)} | '
+          f'Mismatched: {len(bad)} | {1000 * elapsed:.0f} ms')
+    sys.exit(1 if bad else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""Long-running extraction service with warm state.
+
+Loads the task indexes and the regex extractors (whose patterns compile at
+import) once, then serves extraction over local HTTP or a Unix socket, so a
+caller pays no per-call interpreter start, task-file parse or regex compile.
+
+    POST /extract  {"task_id": ..., "text": ..., "extractors": [...]}    one response
+                   {"requests": [{"task_id": ..., "text": ...}, ...]}     a batch
+    -> {"task_id", "results": {extractor: {"value", "expected", "tol", "pass"}}, "ms"}
+       (a batch returns {"results": [...], "ms"}; an unknown task id or a malformed item gives
+       an "error" entry; a body that is not a JSON object gets 400)
+    GET  /health   task count, extractors, requests served
+    POST /reload   re-read the task file (after all_tasks.json changes)
+
+"extractors" defaults to every extractor the server was started with.
+ExtractClient keeps one connection open and speaks either transport.
+
+    python extract_server.py --port 8770
+    python extract_server.py --socket /tmp/extract.sock --extractors smart_extract2
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from batch_extract import EXTRACTORS, TASKS_FILE, load_indexes
+
+DEFAULT_PORT = 8770
+
+class ExtractionService:
+    """Warm extractor state: one task index per extractor, swapped atomically on reload."""
+
+    def __init__(self, tasks_file=TASKS_FILE, extractor_names=None):
+        self.tasks_file = tasks_file
+        self.extractor_names = list(extractor_names or EXTRACTORS)
+        self.served = 0
+        self.lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        self.indexes = load_indexes(self.tasks_file, self.extractor_names)
+        return len(self.indexes[self.extractor_names[0]])
+
+    def extract(self, request):
+        if not isinstance(request, dict):
+            return {'error': 'request must be a JSON object'}
+        tid, text = request.get('task_id'), request.get('text')
+        if not isinstance(tid, str):
+            return {'task_id': tid, 'error': 'task_id must be a string'}
+        if not isinstance(text, str):
+            return {'task_id': tid, 'error': 'text must be a string'}
+        names = request.get('extractors') or self.extractor_names
+        if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+            return {'task_id': tid, 'error': 'extractors must be a list of names'}
+        unknown = [n for n in names if n not in self.indexes]
+        if unknown:
+            return {'task_id': tid, 'error': f'extractor(s) not loaded: {", ".join(unknown)}'}
+        indexes = self.indexes
+        if tid not in indexes[names[0]]:
+            return {'task_id': tid, 'error': 'unknown task id'}
+        results = {}
+        for name in names:
+            value, expected, tol = EXTRACTORS[name](text, indexes[name][tid])
+            passed = value is not None and expected is not None and abs(value - expected) <= tol
+            results[name] = {'value': value, 'expected': expected, 'tol': tol, 'pass': passed}
+        with self.lock:
+            self.served += 1
+        return {'task_id': tid, 'results': results}
+
+    def health(self):
+        return {'status': 'ok', 'tasks_file': self.tasks_file, 'tasks': len(self.indexes[self.extractor_names[0]]),
+                'extractors': self.extractor_names, 'served': self.served}
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out as two writes; with Nagle on, keep-alive calls stall ~40 ms on delayed ACKs
+        disable_nagle_algorithm = True
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/health':
+                self._send(200, service.health())
+            else:
+                self._send(404, {'error': f'no route {self.path}'})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                request = json.loads(self.rfile.read(length) or b'{}')
+            except json.JSONDecodeError as e:
+                self._send(400, {'error': f'bad JSON: {e}'})
+                return
+            if not isinstance(request, dict):
+                self._send(400, {'error': 'body must be a JSON object'})
+                return
+            route = self.path.rstrip('/')
+            start = time.perf_counter()
+            if route == '/extract' and isinstance(request.get('requests'), list):
+                payload = {'results': [service.extract(r) for r in request['requests']]}
+            elif route == '/extract':
+                payload = service.extract(request)
+            elif route == '/reload':
+                payload = {'tasks': service.reload()}
+            else:
+                self._send(404, {'error': f'no route {self.path}'})
+                return
+            payload['ms'] = round(1000 * (time.perf_counter() - start), 3)
+            self._send(200, payload)
+
+    return Handler
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        # HTTPServer.server_bind expects a (host, port) address
+        socketserver.TCPServer.server_bind(self)
+        self.server_name, self.server_port = 'localhost', 0
+
+def make_server(service, host='127.0.0.1', port=DEFAULT_PORT, socket_path=None):
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, make_handler(service))
+    else:
+        server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+def start_server(service, host='127.0.0.1', port=0, socket_path=None):
+    """Serve on a background thread. Returns (server, address) for ExtractClient."""
+    server = make_server(service, host, port, socket_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, socket_path or f'http://{host}:{server.server_address[1]}'
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=30):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+class ExtractClient:
+    """Keep-alive client; address is http://host:port or a Unix socket path."""
+
+    def __init__(self, address, timeout=30):
+        if address.startswith('http://'):
+            host, _, port = address[len('http://'):].rstrip('/').partition(':')
+            self.conn = http.client.HTTPConnection(host, int(port or 80), timeout=timeout)
+        else:
+            self.conn = _UnixConnection(address, timeout)
+
+    def _call(self, method, path, payload=None):
+        body = None if payload is None else json.dumps(payload).encode()
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        self.conn.request(method, path, body, headers)
+        return json.loads(self.conn.getresponse().read())
+
+    def extract(self, task_id, text, extractors=None):
+        return self._call('POST', '/extract', {'task_id': task_id, 'text': text, 'extractors': extractors})
+
+    def extract_batch(self, items, extractors=None):
+        """items: [(task id, text)]"""
+        requests = [{'task_id': tid, 'text': text, 'extractors': extractors} for tid, text in items]
+        return self._call('POST', '/extract', {'requests': requests})['results']
+
+    def health(self):
+        return self._call('GET', '/health')
+
+    def close(self):
+        self.conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--socket', default=None, help='serve on this Unix socket instead of TCP')
+    parser.add_argument('--tasks', default=TASKS_FILE)
+    parser.add_argument('--extractors', help=f'comma-separated subset of {",".join(EXTRACTORS)}')
+    args = parser.parse_args()
+
+    names = args.extractors.split(',') if args.extractors else list(EXTRACTORS)
+    unknown = [n for n in names if n not in EXTRACTORS]
+    if unknown:
+        parser.error(f'Unknown extractor(s): {", ".join(unknown)}')
+    service = ExtractionService(args.tasks, names)
+    server = make_server(service, args.host, args.port, args.socket)
+    where = args.socket or f'http://{args.host}:{args.port}'
+    print(f'Serving {", ".join(names)} for {service.health()["tasks"]} tasks on {where}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    print(f'\n{service.served} responses served')
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,23 @@
-import json
-import re
 import os
 import sys
 
+from manifest import Manifest, hash_text
+from result_log import ResultLog, compact
+from scanner import Scan, EV_SAMPLE_SIZE
+from task_index import load_index
+
 TASKS_FILE = 'all_tasks.json'
 RAW_DIR = 'results/raw'
 OUTPUT_FILE = 'results/extracted_values.json'
+MANIFEST_FILE = 'results/extract_values.manifest.json'
+LOG_FILE = 'results/extract_values.log.jsonl'
 
-def load_tasks():
-    with open(TASKS_FILE) as f:
-        return {t['id']: t for t in json.load(f)}
+# Bump when extract_value changes so the manifest re-extracts every task
+EXTRACTOR_VERSION = 1
 
-def extract_value(text, task):
-    """Extract the primary numerical answer from ChatGPT response."""
-    gt = task.get('ground_truth', {})
+def get_value_type(gt):
+    """(ground-truth field, value type, expected value) of the primary answer."""
+    field = None
     expected = None
     value_type = 'sample_size'
     
@@ -24,6 +28,7 @@ def extract_value(text, task):
     
     for f in ss_fields:
         if f in gt and gt[f] is not None:
+            field = f
             expected = gt[f]
             if 'per_group' in f or 'per_arm' in f or 'per_cell' in f:
                 value_type = 'per_group'
@@ -37,29 +42,39 @@ def extract_value(text, task):
     
     if expected is None:
         if 'power' in gt:
+            field = 'power'
             value_type = 'power'
             expected = gt['power']
         elif 'detectable_effect_d' in gt:
+            field = 'detectable_effect_d'
             value_type = 'effect_size'
             expected = gt['detectable_effect_d']
-    
+    return field, value_type, expected
+
+def extract_value(text, task):
+    """Extract the primary numerical answer from ChatGPT response."""
+    _, value_type, expected = get_value_type(task.get('ground_truth', {}))
+    return extract_typed(text, value_type, expected)
+
+def extract_typed(text, value_type, expected):
+    """extract_value for an already resolved value type and expected value."""
     if expected is None:
         return None, 'no_expected_value'
     
-    text_lower = text.lower()
+    scan = Scan(text)
     
     # Strategy: try multiple extraction patterns
     candidates = []
     
     if value_type == 'power':
         # Look for power values (0.XX or XX%)
-        for m in re.finditer(r'power[^.]*?[=:≈]\s*([0-9]*\.?[0-9]+)', text_lower):
+        for m in scan.all('ev_power_eq'):
             v = float(m.group(1))
             if v > 1: v = v / 100  # percentage
             if 0.5 <= v <= 1.0:
                 candidates.append(v)
         if not candidates:
-            for m in re.finditer(r'([0-9]*\.?[0-9]+)\s*%?\s*power', text_lower):
+            for m in scan.all('ev_power_pct'):
                 v = float(m.group(1))
                 if v > 1: v = v / 100
                 if 0.5 <= v <= 1.0:
@@ -69,10 +84,10 @@ def extract_value(text, task):
             return min(candidates, key=lambda x: abs(x - expected)), 'power_match'
     
     elif value_type == 'effect_size':
-        for m in re.finditer(r'detectable[^.]*?[=:≈]\s*([0-9]*\.?[0-9]+)', text_lower):
+        for m in scan.all('ev_detectable'):
             candidates.append(float(m.group(1)))
         if not candidates:
-            for m in re.finditer(r'd\s*[=:≈]\s*([0-9]*\.?[0-9]+)', text_lower):
+            for m in scan.all('ev_d_eq'):
                 v = float(m.group(1))
                 if 0.01 <= v <= 5.0:
                     candidates.append(v)
@@ -80,48 +95,18 @@ def extract_value(text, task):
             return min(candidates, key=lambda x: abs(x - expected)), 'effect_match'
     
     else:
-        # Sample size extraction - most common case
+        # Sample size extraction - most common case. Every category
+        # (per group, "n =", counts, totals, bold, need, clusters, per cell,
+        # events) is collected from the one Scan.
         nums = []
-        
-        # Pattern 1: "n = XX per group" or "XX per group"
-        for m in re.finditer(r'[n=:≈\s]*(\d+)\s*(?:per\s*group|per\s*arm|subjects?\s*per\s*group|participants?\s*per\s*group)', text_lower):
-            nums.append(('per_group', int(m.group(1))))
-        
-        # Pattern 2: "n = XX" or "sample size = XX"
-        for m in re.finditer(r'(?:sample\s*size|n|subjects?)\s*[=:≈]\s*(\d+)', text_lower):
-            nums.append(('generic', int(m.group(1))))
-        
-        # Pattern 3: "XX participants" or "XX subjects" or "XX patients"
-        for m in re.finditer(r'(\d+)\s*(?:participants?|subjects?|patients?|observations?|individuals?)', text_lower):
-            nums.append(('count', int(m.group(1))))
-        
-        # Pattern 4: "total of XX" or "total sample size of XX" 
-        for m in re.finditer(r'total[^.]*?(\d+)', text_lower):
-            nums.append(('total', int(m.group(1))))
-        
-        # Pattern 5: Bold/emphasized numbers (** XX **)
-        for m in re.finditer(r'\*\*(\d+)\*\*', text):
-            nums.append(('bold', int(m.group(1))))
-        
-        # Pattern 6: "need XX" or "require XX" 
-        for m in re.finditer(r'(?:need|require|approximately|about|roughly|at\s*least|minimum\s*of)\s*(\d+)', text_lower):
-            nums.append(('need', int(m.group(1))))
-        
-        # Pattern 7: clusters per arm
-        for m in re.finditer(r'(\d+)\s*(?:clusters?\s*per\s*arm|clusters?\s*per\s*group)', text_lower):
-            nums.append(('clusters', int(m.group(1))))
-        
-        # Pattern 8: per cell
-        for m in re.finditer(r'(\d+)\s*(?:per\s*cell|observations?\s*per\s*cell)', text_lower):
-            nums.append(('per_cell', int(m.group(1))))
-        
-        # Pattern 9: events needed
-        for m in re.finditer(r'(\d+)\s*(?:events?|event\s*count)', text_lower):
-            nums.append(('events', int(m.group(1))))
+        hits = scan.collect(name for _, name in EV_SAMPLE_SIZE)
+        for category, name in EV_SAMPLE_SIZE:
+            for m in hits[name]:
+                nums.append((category, int(m.group(1))))
         
         if not nums:
             # Last resort: all numbers in reasonable range
-            for m in re.finditer(r'\b(\d+)\b', text):
+            for m in scan.all('ev_any'):
                 v = int(m.group(1))
                 if 5 <= v <= 50000 and v != 80 and v != 95 and v != 5:  # exclude common non-answer numbers
                     nums.append(('any', v))
@@ -134,12 +119,43 @@ def extract_value(text, task):
     
     return None, 'no_match'
 
+def get_expected_and_tolerance(task):
+    """Expected value and tolerance used to score extract_value's answer."""
+    gt = task.get('ground_truth', {})
+    ss_fields = ['sample_size_per_group', 'subjects_per_group', 'subjects_per_arm',
+                 'sample_size', 'subjects', 'per_cell', 'subjects_per_cluster',
+                 'patients_per_cluster', 'total_sample_size', 'total_subjects']
+    expected = None
+    for fld in ss_fields:
+        if fld in gt and gt[fld] is not None:
+            expected = gt[fld]
+            break
+    if expected is None:
+        expected = gt.get('power', gt.get('detectable_effect_d'))
+    
+    tol_dict = task.get('tolerance', {})
+    tol = tol_dict.get('sample_size', tol_dict.get('power', tol_dict.get('effect_size', 10)))
+    return expected, tol
+
+def resolve_task(task):
+    """(field, expected, kind, tol) for the task index; kind is the value type."""
+    field, value_type, expected = get_value_type(task.get('ground_truth', {}))
+    _, tol = get_expected_and_tolerance(task)
+    return field, expected, value_type, tol
+
+def load_task_index():
+    return load_index(TASKS_FILE, 'extract_values', resolve_task)
+
 def main():
-    tasks = load_tasks()
+    index = load_task_index()
+    manifest = Manifest(MANIFEST_FILE, EXTRACTOR_VERSION, reset='--full' in sys.argv)
+    # Every result is appended to LOG_FILE as it is found; --resume keeps a killed run's entries
+    result_log = ResultLog(LOG_FILE, resume='--resume' in sys.argv)
     results = {}
     extraction_log = []
     
-    for tid, task in sorted(tasks.items()):
+    for spec in index:
+        tid = spec.id
         raw_file = os.path.join(RAW_DIR, f'{tid}.txt')
         if not os.path.exists(raw_file):
             extraction_log.append(f'{tid}: MISSING raw file')
@@ -148,23 +164,19 @@ def main():
         with open(raw_file) as f:
             text = f.read()
         
-        value, method = extract_value(text, task)
-        
-        gt = task.get('ground_truth', {})
-        # Get expected value
-        ss_fields = ['sample_size_per_group', 'subjects_per_group', 'subjects_per_arm',
-                     'sample_size', 'subjects', 'per_cell', 'subjects_per_cluster',
-                     'patients_per_cluster', 'total_sample_size', 'total_subjects']
-        expected = None
-        for fld in ss_fields:
-            if fld in gt and gt[fld] is not None:
-                expected = gt[fld]
-                break
-        if expected is None:
-            expected = gt.get('power', gt.get('detectable_effect_d'))
+        if tid in result_log:
+            value, method = result_log.get(tid)['value'], result_log.get(tid)['method']
+        else:
+            text_hash = hash_text(text)
+            stored = manifest.lookup(tid, text_hash, spec.task_hash)
+            if stored is not None:
+                value, method = stored
+            else:
+                value, method = extract_typed(text, spec.kind, spec.expected)
+                manifest.store(tid, text_hash, spec.task_hash, [value, method])
+            result_log.append(tid, value, method=method)
         
-        tol_dict = task.get('tolerance', {})
-        tol = tol_dict.get('sample_size', tol_dict.get('power', tol_dict.get('effect_size', 10)))
+        expected, tol = spec.expected, spec.tol
         
         if value is not None:
             diff = abs(value - expected) if expected else '?'
@@ -176,8 +188,9 @@ def main():
             results[tid] = None
             extraction_log.append(f'{tid}: FAILED extraction ({method}), expected={expected}')
     
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump(results, f, indent=2)
+    result_log.close()
+    compact(LOG_FILE, OUTPUT_FILE)
+    manifest.save()
     
     # Print summary
     extracted = sum(1 for v in results.values() if v is not None)
@@ -187,6 +200,8 @@ def main():
     print(f'Failed extraction: {failed_extract}')
     print(f'Passed tolerance: {passed}/{len(results)}')
     print(f'\nResults written to {OUTPUT_FILE}')
+    print(manifest.summary())
+    print(result_log.summary())
     
     # Print failures
     failures = [l for l in extraction_log if 'FAIL' in l]
@@ -0,0 +1,237 @@
+"""Confidence intervals for leaderboard pass rates.
+
+A pass rate on 21 tier-4 tasks moves by 4.8 points per task, so close
+rankings say little without their uncertainty. This builds the (model x
+task) pass matrix of the whole leaderboard:
+
+- every model with a stored LLM-judge evaluation (test-results/), from the
+  judge's per-task pass flags;
+- every leaderboard/results.json submission without one, from its
+  failedTasks list when that accounts for all its failures, otherwise from
+  its per-tier counts alone;
+
+and reports, per tier and overall, Wilson score intervals and tier-stratified
+bootstrap intervals, plus bootstrap intervals for the difference in overall
+pass rate between every pair of models.
+
+The bootstrap resamples tasks with replacement within each tier, with the
+same draws for every model, so differences are paired (the two models are
+compared on the same resampled tasks). One replicate is a vector of per-task
+draw counts; all replicates for all models are one matrix product per tier.
+A count-only row's replicates are binomial draws (the same distribution for
+a 0/1 vector resampled within tiers), independent of the other rows, so its
+differences are unpaired.
+
+    python leaderboard_stats.py
+    python leaderboard_stats.py --replicates 20000 --confidence 0.9 --output results/leaderboard_intervals.json
+"""
+import argparse
+import json
+import os
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+from batch_extract import TASKS_FILE, load_indexes
+from results_store import evaluated_models, evaluation_file
+
+LEADERBOARD_FILE = 'leaderboard/results.json'
+OUTPUT_FILE = 'results/leaderboard_intervals.json'
+REPLICATES = 10000
+CONFIDENCE = 0.95
+SEED = 20260208
+
+def load_judged(models):
+    """[(display name, {task id: passed})] from the stored LLM-judge evaluations."""
+    rows = []
+    for model in models:
+        path = evaluation_file(model)
+        if path:
+            with open(path) as f:
+                evaluation = json.load(f)
+            rows.append((evaluation.get('model') or model,
+                         {r['task_id']: bool(r.get('pass')) for r in evaluation.get('detailed_results', [])}))
+    return rows
+
+def load_submissions(path, task_ids):
+    """[(agent name, {task id: passed} or None, {tier label: (passed, tasks)})] from a leaderboard file."""
+    with open(path) as f:
+        submissions = json.load(f)['submissions']
+    rows = []
+    for sub in submissions:
+        results = sub['results']
+        counts = {label: (r['passed'], r['tasks']) for label, r in results.items() if label != 'overall'}
+        failed = {t['id'] for t in sub.get('failedTasks', [])}
+        overall = results['overall']
+        passes = None
+        if 'failedTasks' in sub and overall['passed'] + len(failed) == overall['tasks'] == len(task_ids):
+            passes = {tid: tid not in failed for tid in task_ids}
+        rows.append((sub['agentName'], passes, counts))
+    return rows
+
+class PassTable:
+    """Pass matrix of the leaderboard rows; rows without task-level results carry per-tier counts only.
+
+    passed is (models, tasks) bool, paired (models,) marks rows with task-level
+    results, counts is (models, tiers) and totals (tiers,).
+    """
+
+    def __init__(self, names, tiers, task_tier, passed, paired, counts):
+        self.names = list(names)
+        self.tiers = list(tiers)
+        self.task_tier = np.asarray(task_tier)
+        self.passed = np.asarray(passed, dtype=bool)
+        self.paired = np.asarray(paired, dtype=bool)
+        self.counts = np.asarray(counts, dtype=float)
+        self.totals = np.bincount(self.task_tier, minlength=len(self.tiers)).astype(float)
+
+    @classmethod
+    def build(cls, index, judged, submissions):
+        """judged: load_judged() rows; submissions: load_submissions() rows (a judged name wins)."""
+        specs = list(index)
+        tiers = sorted({f'tier{s.tier}' for s in specs})
+        task_tier = [tiers.index(f'tier{s.tier}') for s in specs]
+        names, passed, paired, counts = [], [], [], []
+        seen = set()
+        for name, passes, tier_counts in [(n, p, None) for n, p in judged] + submissions:
+            if name in seen:
+                continue
+            seen.add(name)
+            row = np.array([bool(passes.get(s.id)) for s in specs]) if passes is not None else np.zeros(len(specs), bool)
+            if passes is not None:
+                count = np.bincount(task_tier, weights=row, minlength=len(tiers))
+            else:
+                count = np.array([tier_counts.get(t, (0, 0))[0] for t in tiers], dtype=float)
+            names.append(name)
+            passed.append(row)
+            paired.append(passes is not None)
+            counts.append(count)
+        return cls(names, tiers, task_tier, passed, paired, counts)
+
+    def ranking(self):
+        """Row indices by overall pass rate (best first), ties by name."""
+        return np.lexsort((np.array(self.names), -self.counts.sum(axis=1)))
+
+def wilson(passed, n, confidence=CONFIDENCE):
+    """(low, high) Wilson score interval for passed successes out of n, elementwise."""
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    passed, n = np.asarray(passed, dtype=float), np.asarray(n, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = passed / n
+        denom = 1 + z ** 2 / n
+        centre = (p + z ** 2 / (2 * n)) / denom
+        half = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denom
+    return centre - half, centre + half
+
+def bootstrap(table, replicates=REPLICATES, seed=SEED):
+    """(replicates, models, tiers) pass counts of the tier-stratified task bootstrap."""
+    rng = np.random.default_rng(seed)
+    out = np.empty((replicates, len(table.names), len(table.tiers)))
+    rows = np.flatnonzero(table.paired)
+    for g in range(len(table.tiers)):
+        cols = np.flatnonzero(table.task_tier == g)
+        # How often each task of the tier is drawn, in every replicate; shared by all models
+        draws = rng.multinomial(len(cols), np.full(len(cols), 1 / len(cols)), size=replicates)
+        out[:, rows, g] = draws @ table.passed[np.ix_(rows, cols)].T.astype(float)
+    alone = np.flatnonzero(~table.paired)
+    if len(alone):
+        out[:, alone, :] = rng.binomial(table.totals.astype(int), table.counts[alone] / table.totals,
+                                        size=(replicates, len(alone), len(table.tiers)))
+    return out
+
+def interval(samples, confidence=CONFIDENCE):
+    """(low, high) percentile interval over the first axis."""
+    low, high = np.quantile(samples, [(1 - confidence) / 2, (1 + confidence) / 2], axis=0)
+    return low, high
+
+def summarize(table, replicates=REPLICATES, confidence=CONFIDENCE, seed=SEED):
+    """Point rates, Wilson and bootstrap intervals per tier and overall, and pairwise overall differences.
+
+    Returns a dict of arrays: rate, wilson_low/high, boot_low/high are (models,
+    tiers + 1) with overall last; diff, diff_low/high are (models, models), row
+    minus column.
+    """
+    counts = bootstrap(table, replicates, seed)
+    counts = np.concatenate([counts, counts.sum(axis=2, keepdims=True)], axis=2)
+    totals = np.append(table.totals, table.totals.sum())
+    passed = np.concatenate([table.counts, table.counts.sum(axis=1, keepdims=True)], axis=1)
+    rates = counts / totals
+    boot_low, boot_high = interval(rates, confidence)
+    wilson_low, wilson_high = wilson(passed, totals, confidence)
+    overall = rates[:, :, -1]
+    diffs = overall[:, :, None] - overall[:, None, :]
+    diff_low, diff_high = interval(diffs, confidence)
+    point = passed[:, -1] / totals[-1]
+    return {'passed': passed, 'totals': totals, 'rate': passed / totals,
+            'wilson_low': wilson_low, 'wilson_high': wilson_high, 'boot_low': boot_low, 'boot_high': boot_high,
+            'diff': point[:, None] - point[None, :], 'diff_low': diff_low, 'diff_high': diff_high}
+
+def to_json(table, stats, replicates, confidence, seed):
+    labels = table.tiers + ['overall']
+    order = table.ranking()
+    r = lambda x: round(float(x), 4)
+    models = []
+    for rank, i in enumerate(order, 1):
+        models.append({'rank': rank, 'name': table.names[i], 'taskLevel': bool(table.paired[i]),
+                       'results': {label: {'tasks': int(stats['totals'][k]), 'passed': int(stats['passed'][i, k]),
+                                           'passRate': r(stats['rate'][i, k]),
+                                           'wilson': [r(stats['wilson_low'][i, k]), r(stats['wilson_high'][i, k])],
+                                           'bootstrap': [r(stats['boot_low'][i, k]), r(stats['boot_high'][i, k])]}
+                                   for k, label in enumerate(labels)}})
+    differences = [{'a': table.names[i], 'b': table.names[j], 'diff': r(stats['diff'][i, j]),
+                    'bootstrap': [r(stats['diff_low'][i, j]), r(stats['diff_high'][i, j])],
+                    'paired': bool(table.paired[i] and table.paired[j])}
+                   for x, i in enumerate(order) for j in order[x + 1:]]
+    return {'confidence': confidence, 'replicates': replicates, 'seed': seed, 'models': models,
+            'differences': differences}
+
+def print_table(table, stats, confidence):
+    labels = table.tiers + ['overall']
+    width = max(len(n) for n in table.names)
+    pct = round(100 * confidence)
+    print(f'\n=== LEADERBOARD ({len(table.names)} models; {pct}% bootstrap intervals, Wilson for overall) ===')
+    print(f'{"#":>3} {"model":<{width}}' + ''.join(f' {label:>22}' for label in labels) + f' {"Wilson":>13}')
+    for rank, i in enumerate(table.ranking(), 1):
+        cells = ''.join(f' {100 * stats["rate"][i, k]:>5.1f}% [{100 * stats["boot_low"][i, k]:>5.1f},{100 * stats["boot_high"][i, k]:>6.1f}]'
+                        for k in range(len(labels)))
+        mark = '' if table.paired[i] else ' *'
+        print(f'{rank:>3} {table.names[i]:<{width}}{cells} [{100 * stats["wilson_low"][i, -1]:>4.1f},{100 * stats["wilson_high"][i, -1]:>5.1f}]{mark}')
+    if not table.paired.all():
+        print('  * per-tier counts only: bootstrapped independently of the other rows')
+
+    print(f'\n=== NEIGHBOURING RANKS (overall difference, {pct}% bootstrap interval) ===')
+    order = table.ranking()
+    for a, b in zip(order, order[1:]):
+        low, high = stats['diff_low'][a, b], stats['diff_high'][a, b]
+        verdict = 'separated' if low > 0 or high < 0 else 'not separated'
+        print(f'  {table.names[a]:<{width}} - {table.names[b]:<{width}} {100 * stats["diff"][a, b]:>+6.1f} '
+              f'[{100 * low:>+6.1f}, {100 * high:>+6.1f}]  {verdict}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--leaderboard', default=LEADERBOARD_FILE, help='submissions file')
+    parser.add_argument('--no-evaluations', action='store_true', help='leave out the models under test-results/')
+    parser.add_argument('--replicates', type=int, default=REPLICATES)
+    parser.add_argument('--confidence', type=float, default=CONFIDENCE)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--output', default=OUTPUT_FILE, help='write the intervals as JSON here')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = load_indexes(TASKS_FILE, ['smart_extract2'])['smart_extract2']
+    judged = [] if args.no_evaluations else load_judged(evaluated_models())
+    submissions = load_submissions(args.leaderboard, [s.id for s in index]) if os.path.exists(args.leaderboard) else []
+    table = PassTable.build(index, judged, submissions)
+    stats = summarize(table, args.replicates, args.confidence, args.seed)
+    elapsed = time.perf_counter() - start
+
+    print_table(table, stats, args.confidence)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(to_json(table, stats, args.replicates, args.confidence, args.seed), f, indent=2)
+    print(f'\n{args.replicates} replicates for {len(table.names)} models in {1000 * elapsed:.0f} ms; '
+          f'intervals written to {args.output}')
+
+if __name__ == '__main__':
+    main()
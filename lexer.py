@@ -0,0 +1,152 @@
+"""Number/keyword token stream for one response.
+
+The regex extractors often ask "is this number near 'per group'?". Answering
+that by slicing and lower-casing a window around every number allocates a
+fresh string per number and per check. Lexed instead reads the response
+once into:
+
+- number tokens, in text order, each with its span, parsed value and
+  markdown-bold / LaTeX \\boxed{} / percent flags;
+- keyword positions, found on first use and kept as sorted offsets.
+
+A proximity test is then a binary search over the keyword's offsets.
+near(start, end, keywords) is True exactly when some keyword lies wholly
+inside text[start - radius:end + radius].lower(), which is what the
+extractors' old window slices tested.
+
+Use Scan.lex (scanner.py) rather than building Lexed directly, so every
+consumer of one response shares a single token stream.
+"""
+import re
+from bisect import bisect_left
+
+# Integer part, optional fraction; not glued to other digits or dots
+NUMBER = re.compile(r'(?<![\d.])(\d[\d,]*)(?:\.(\d+))?(?![\d.])')
+PERCENT = re.compile(r'\s*%')
+BOXED = '\\boxed{'
+
+class Token:
+    """One number in the text.
+
+    whole: the integer part, commas stripped ("1,234.5" -> 1234)
+    value: the parsed number, a float if it has a fraction, /100 if followed by %
+    """
+    __slots__ = ('start', 'end', 'text', 'whole', 'value', 'percent', 'bold', 'boxed')
+
+    def __init__(self, start, end, text, whole, value, percent, bold, boxed):
+        self.start = start
+        self.end = end
+        self.text = text
+        self.whole = whole
+        self.value = value
+        self.percent = percent
+        self.bold = bold
+        self.boxed = boxed
+
+    def __repr__(self):
+        flags = ''.join(f' {f}' for f in ('percent', 'bold', 'boxed') if getattr(self, f))
+        return f'Token({self.text!r} @{self.start}{flags})'
+
+def boxed_spans(text):
+    """(start, end) of the body of every \\boxed{...}, nested braces included."""
+    spans = []
+    i = text.find(BOXED)
+    while i != -1:
+        start = j = i + len(BOXED)
+        depth = 1
+        while j < len(text) and depth:
+            if text[j] == '{':
+                depth += 1
+            elif text[j] == '}':
+                depth -= 1
+            j += 1
+        spans.append((start, j - 1 if not depth else j))
+        i = text.find(BOXED, j)
+    return spans
+
+def same_length_lower(text, lower=None):
+    """text.lower() (or the given lower), with characters that lower() would lengthen (e.g. U+0130) left as
+    they are, so offsets into it are offsets into text."""
+    lower = text.lower() if lower is None else lower
+    if len(lower) == len(text):
+        return lower
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+class Lexed:
+    """Token stream of one response; numbers and keyword offsets are built on first use."""
+    __slots__ = ('text', 'lower', '_numbers', '_pending', '_spans', '_keywords')
+
+    def __init__(self, text, lower=None):
+        self.text = text
+        self.lower = same_length_lower(text, lower)
+        self._numbers = []
+        self._pending = None
+        self._spans = None
+        self._keywords = {}
+
+    def _lex_next(self):
+        """Lex one more number token; None when the text is exhausted."""
+        text = self.text
+        if self._pending is None:
+            self._pending = NUMBER.finditer(text)
+            self._spans = boxed_spans(text) if BOXED in text else []
+        m = next(self._pending, None)
+        if m is None:
+            self._pending = iter(())
+            return None
+        start, end = m.span()
+        digits, fraction = m.groups()
+        whole = int(digits.replace(',', '')) if ',' in digits else int(digits)
+        value = float(f'{whole}.{fraction}') if fraction else whole
+        percent = text.startswith('%', end) or (end < len(text) and text[end].isspace()
+                                                and PERCENT.match(text, end) is not None)
+        if percent:
+            value = value / 100
+        bold = start >= 2 and text.startswith('**', start - 2) and text.startswith('**', end)
+        boxed = any(s <= start and end <= e for s, e in self._spans) if self._spans else False
+        tok = Token(start, end, m.group(0), whole, value, percent, bold, boxed)
+        self._numbers.append(tok)
+        return tok
+
+    def iter_numbers(self):
+        """Number tokens in text order, lexed only as far as the caller reads."""
+        i = 0
+        while True:
+            if i < len(self._numbers):
+                yield self._numbers[i]
+            elif self._lex_next() is None:
+                return
+            else:
+                continue
+            i += 1
+
+    @property
+    def numbers(self):
+        """Every number token, in text order."""
+        while self._lex_next() is not None:
+            pass
+        return self._numbers
+
+    def positions(self, keyword):
+        """Sorted offsets of every (possibly overlapping) occurrence of a lower-case keyword."""
+        found = self._keywords.get(keyword)
+        if found is None:
+            found = []
+            lower = self.lower
+            i = lower.find(keyword)
+            while i != -1:
+                found.append(i)
+                i = lower.find(keyword, i + 1)
+            self._keywords[keyword] = found
+        return found
+
+    def near(self, start, end, keywords, radius=80):
+        """True if any keyword occurs wholly within radius characters of text[start:end]."""
+        lo = max(0, start - radius)
+        hi = end + radius
+        for kw in keywords:
+            found = self.positions(kw)
+            i = bisect_left(found, lo)
+            if i < len(found) and found[i] + len(kw) <= hi:
+                return True
+        return False
@@ -0,0 +1,89 @@
+"""On-disk cache of LLM extraction replies.
+
+Entries are keyed by a SHA-256 over (model, prompt text, max_tokens, prompt
+template version), so a rerun only calls the API when a raw response or the
+prompt template actually changed. Backed by SQLite; safe to share between
+the worker threads of llm_extract.py.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+def make_key(model, prompt, max_tokens, template_version):
+    h = hashlib.sha256()
+    for part in (model, str(max_tokens), str(template_version), prompt):
+        h.update(part.encode())
+        h.update(b'\0')
+    return h.hexdigest()
+
+class ResponseCache:
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS replies (
+            key TEXT PRIMARY KEY,
+            reply TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created REAL NOT NULL,
+            last_used REAL NOT NULL)''')
+        self.db.commit()
+
+    def get(self, key):
+        """Cached reply for key, or None."""
+        with self.lock:
+            row = self.db.execute('SELECT reply FROM replies WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.db.execute('UPDATE replies SET last_used = ? WHERE key = ?', (time.time(), key))
+            self.db.commit()
+            return row[0]
+
+    def put(self, key, reply):
+        now = time.time()
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO replies VALUES (?, ?, ?, ?, ?)',
+                            (key, reply, len(reply.encode()), now, now))
+            self.db.commit()
+
+    def evict(self, max_age_days=None, max_bytes=None):
+        """Drop entries older than max_age_days, then least-recently-used ones until under max_bytes.
+
+        Returns the number of entries removed.
+        """
+        removed = 0
+        with self.lock:
+            if max_age_days:
+                cur = self.db.execute('DELETE FROM replies WHERE created < ?',
+                                      (time.time() - max_age_days * 86400,))
+                removed += cur.rowcount
+            if max_bytes:
+                total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM replies').fetchone()[0]
+                if total > max_bytes:
+                    doomed = []
+                    for key, size in self.db.execute('SELECT key, size FROM replies ORDER BY last_used'):
+                        if total <= max_bytes:
+                            break
+                        doomed.append((key,))
+                        total -= size
+                    self.db.executemany('DELETE FROM replies WHERE key = ?', doomed)
+                    removed += len(doomed)
+            self.db.commit()
+        return removed
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM replies').fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
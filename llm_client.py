@@ -0,0 +1,160 @@
+"""Pooled keep-alive HTTP client with per-call accounting for the messages API.
+
+HTTPClient keeps up to `size` persistent connections to one base URL and
+hands them out to calling threads, so a run pays one TCP/TLS handshake per
+connection instead of one per call. Connections get `connect_timeout` to
+connect and `read_timeout` for every read after that. A connection that
+fails or that the server closes is dropped and reopened on next use.
+
+Every call is recorded in CallStats: latency, HTTP status or error class,
+and the input/output tokens of the reply's usage block. summary() gives
+throughput, p50/p95 latency, token totals and error counts.
+"""
+import http.client
+import json
+import queue
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 30.0
+# What a reused connection raises when the server has closed it in the meantime
+STALE = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list, q in [0, 100]."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def error_class(status=None, exc=None):
+    """Short label for a failed call: http_429, http_5xx, http_4xx, timeout, connection or the exception name."""
+    if status is not None:
+        return 'http_429' if status == 429 else f'http_{status // 100}xx'
+    if isinstance(exc, (socket.timeout, TimeoutError)):
+        return 'timeout'
+    if isinstance(exc, (ConnectionError, http.client.HTTPException, OSError)):
+        return 'connection'
+    return type(exc).__name__
+
+class CallStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = []  # (latency s, error class or None, input tokens, output tokens)
+        self.started = time.monotonic()
+
+    def record(self, latency, error=None, input_tokens=0, output_tokens=0):
+        with self.lock:
+            self.calls.append((latency, error, input_tokens, output_tokens))
+
+    def summary(self):
+        with self.lock:
+            calls = list(self.calls)
+        if not calls:
+            return 'API calls: none'
+        wall = time.monotonic() - self.started
+        latencies = [c[0] for c in calls]
+        errors = {}
+        for _, error, _, _ in calls:
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+        tokens_in, tokens_out = sum(c[2] for c in calls), sum(c[3] for c in calls)
+        line = (f'API calls: {len(calls)} ({len(calls) / wall:.1f}/s) | latency p50 {1000 * percentile(latencies, 50):.0f} ms, '
+                f'p95 {1000 * percentile(latencies, 95):.0f} ms | tokens {tokens_in} in, {tokens_out} out')
+        if errors:
+            line += ' | errors ' + ', '.join(f'{k}={v}' for k, v in sorted(errors.items()))
+        return line
+
+def _connection_class(secure):
+    base = http.client.HTTPSConnection if secure else http.client.HTTPConnection
+
+    class Connection(base):
+        def __init__(self, host, port, connect_timeout, read_timeout):
+            super().__init__(host, port, timeout=connect_timeout)
+            self.read_timeout = read_timeout
+
+        def connect(self):
+            super().connect()
+            self.sock.settimeout(self.read_timeout)
+
+    return Connection
+
+class HTTPClient:
+    def __init__(self, base_url, size=8, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+        parts = urlsplit(base_url)
+        self.base_url = base_url
+        self.prefix = parts.path.rstrip('/')
+        self.host = parts.hostname
+        self.port = parts.port
+        self.connection = _connection_class(parts.scheme == 'https')
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.idle = queue.LifoQueue(maxsize=max(1, size))
+        self.stats = CallStats()
+
+    def _new(self):
+        return self.connection(self.host, self.port, self.connect_timeout, self.read_timeout)
+
+    def _acquire(self):
+        """(connection, whether it was used before)"""
+        try:
+            return self.idle.get_nowait(), True
+        except queue.Empty:
+            return self._new(), False
+
+    def _release(self, conn):
+        try:
+            self.idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def post_json(self, path, payload, headers=None):
+        """POST payload as JSON. Returns (status, response headers, body bytes); raises on network errors.
+
+        The call is recorded in stats, with the usage tokens of a 200 reply.
+        """
+        body = json.dumps(payload).encode()
+        headers = {'Content-Type': 'application/json', **(headers or {})}
+        conn, reused = self._acquire()
+        start = time.perf_counter()
+        while True:
+            try:
+                conn.request('POST', self.prefix + path, body, headers)
+                resp = conn.getresponse()
+                data = resp.read()
+                break
+            except STALE as e:
+                conn.close()
+                if reused:
+                    # The server dropped an idle keep-alive connection: retry once on a fresh one
+                    conn, reused = self._new(), False
+                    continue
+                self.stats.record(time.perf_counter() - start, error_class(exc=e))
+                raise
+            except Exception as e:
+                conn.close()
+                self.stats.record(time.perf_counter() - start, error_class(exc=e))
+                raise
+        latency = time.perf_counter() - start
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        usage = {}
+        if resp.status == 200:
+            try:
+                usage = json.loads(data).get('usage') or {}
+            except (ValueError, AttributeError):
+                pass
+        self.stats.record(latency, None if resp.status == 200 else error_class(resp.status),
+                          usage.get('input_tokens', 0), usage.get('output_tokens', 0))
+        return resp.status, resp.headers, data
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
@@ -1,30 +1,52 @@
+import argparse
+import http.client
 import json
 import os
+import random
+import re
 import sys
+import threading
 import time
-import urllib.request
-import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_cache import ResponseCache, make_key
+from llm_client import CONNECT_TIMEOUT, READ_TIMEOUT, HTTPClient
+from result_log import ResultLog, compact
+from span_select import excerpt
+from task_index import load_index
 
 API_KEY = os.environ.get('ANTHROPIC_API_KEY', '')
-if not API_KEY:
-    # Try reading from .zshrc
-    import re
-    with open(os.path.expanduser('~/.zshrc')) as f:
-        for line in f:
-            m = re.search(r'ANTHROPIC_API_KEY="([^"]+)"', line)
-            if m:
-                API_KEY = m.group(1)
-                break
+# Point at a local stand-in (see mock_messages_api.py) to run without network
+BASE_URL = os.environ.get('ANTHROPIC_BASE_URL', 'https://api.anthropic.com')
 
-assert API_KEY, 'No ANTHROPIC_API_KEY found'
+def load_api_key():
+    """ANTHROPIC_API_KEY from the environment, falling back to ~/.zshrc."""
+    if API_KEY:
+        return API_KEY
+    try:
+        with open(os.path.expanduser('~/.zshrc')) as f:
+            for line in f:
+                m = re.search(r'ANTHROPIC_API_KEY="([^"]+)"', line)
+                if m:
+                    return m.group(1)
+    except OSError:
+        pass
+    return ''
 
 TASKS_FILE = 'all_tasks.json'
 RAW_DIR = 'results/raw'
 OUTPUT_FILE = 'results/agent_results.json'
+CACHE_FILE = 'results/llm_cache.sqlite'
+LOG_FILE = 'results/llm_extract.log.jsonl'
 
-def load_tasks():
-    with open(TASKS_FILE) as f:
-        return {t['id']: t for t in json.load(f)}
+MODEL = 'claude-haiku-4-20250414'
+# Bump whenever build_prompt's wording changes so cached replies are not reused
+PROMPT_VERSION = 2
+# Budget of the response excerpt in each prompt (span_select.excerpt)
+PROMPT_TOKENS = 600
+# Reply budget of a packed prompt: a JSON object with one short entry per response
+PACK_TOKENS_BASE = 50
+PACK_TOKENS_PER_ITEM = 20
 
 def get_expected_field(gt):
     ss_fields = ['sample_size_per_group', 'subjects_per_group', 'subjects_per_arm',
@@ -47,32 +69,152 @@ def get_expected_field(gt):
         return 'events', gt['events']
     return None, None
 
-def call_claude(prompt, max_tokens=200):
-    data = json.dumps({
-        'model': 'claude-haiku-4-20250414',
+def resolve_task(task):
+    """(field, expected, kind, tol) for the task index; kind is the field itself."""
+    field, expected = get_expected_field(task.get('ground_truth', {}))
+    tol_dict = task.get('tolerance', {})
+    tol = tol_dict.get('sample_size', tol_dict.get('power', tol_dict.get('subjects', tol_dict.get('clusters', tol_dict.get('effect_size', 10)))))
+    return field, expected, field, tol
+
+def load_task_index():
+    return load_index(TASKS_FILE, 'llm_extract', resolve_task)
+
+# HTTP statuses worth retrying: rate limited (429), overloaded (529), server errors
+RETRY_STATUS = {429, 500, 502, 503, 504, 529}
+
+class APIError(Exception):
+    """A messages API call that failed for good (retries used up, or an error not worth retrying)."""
+
+class RateLimiter:
+    """Token buckets for requests/min and tokens/min, shared by all worker threads.
+
+    acquire() blocks until both buckets can cover the call. pause() stops
+    everyone for a while, e.g. when the API answers 429 with retry-after.
+    """
+
+    def __init__(self, requests_per_min=None, tokens_per_min=None):
+        self.rpm = requests_per_min
+        self.tpm = tokens_per_min
+        self.requests = float(requests_per_min or 0)
+        self.tokens = float(tokens_per_min or 0)
+        self.paused_until = 0.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.updated = now
+        if self.rpm:
+            self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens=0):
+        if self.tpm:
+            tokens = min(tokens, self.tpm)  # a single oversized call must still go through
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.paused_until - now
+                if self.rpm and self.requests < 1:
+                    wait = max(wait, (1 - self.requests) * 60 / self.rpm)
+                if self.tpm and self.tokens < tokens:
+                    wait = max(wait, (tokens - self.tokens) * 60 / self.tpm)
+                if wait <= 0:
+                    if self.rpm:
+                        self.requests -= 1
+                    if self.tpm:
+                        self.tokens -= tokens
+                    return
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+def estimate_tokens(prompt, max_tokens):
+    """Rough token count of a call (about 4 characters per token) for the TPM bucket."""
+    return len(prompt) // 4 + max_tokens
+
+def retry_delay(attempt, retry_after=None, base=1.0, cap=60.0):
+    """Seconds to wait before retry number `attempt` (0-based).
+
+    Honours a server-provided retry-after; otherwise exponential backoff
+    with full jitter.
+    """
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+# Shared by every thread; rebuilt when BASE_URL changes (bench scripts point it at a stand-in)
+_client = None
+_client_lock = threading.Lock()
+CLIENT_OPTIONS = {'size': 8, 'connect_timeout': CONNECT_TIMEOUT, 'read_timeout': READ_TIMEOUT}
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None or _client.base_url != BASE_URL:
+            if _client is not None:
+                _client.close()
+            _client = HTTPClient(BASE_URL, **CLIENT_OPTIONS)
+        return _client
+
+def api_summary():
+    """Throughput, latency, token and error totals of the calls made so far."""
+    return _client.stats.summary() if _client is not None else 'API calls: none'
+
+def call_claude(prompt, max_tokens=200, limiter=None, max_retries=5, cache=None):
+    """Claude's reply text. Raises APIError once the call has failed for good."""
+    key = None
+    if cache is not None:
+        key = make_key(MODEL, prompt, max_tokens, PROMPT_VERSION)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    
+    payload = {
+        'model': MODEL,
         'max_tokens': max_tokens,
         'messages': [{'role': 'user', 'content': prompt}]
-    }).encode()
-    
-    req = urllib.request.Request(
-        'https://api.anthropic.com/v1/messages',
-        data=data,
-        headers={
-            'Content-Type': 'application/json',
-            'x-api-key': API_KEY,
-            'anthropic-version': '2023-06-01'
-        }
-    )
+    }
+    headers = {'x-api-key': API_KEY, 'anthropic-version': '2023-06-01'}
+    client = get_client()
     
-    try:
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            result = json.loads(resp.read())
-            return result['content'][0]['text']
-    except urllib.error.HTTPError as e:
-        body = e.read().decode() if hasattr(e, 'read') else str(e)
-        return f'ERROR: {e.code} {body[:200]}'
-    except Exception as e:
-        return f'ERROR: {str(e)}'
+    error = None
+    for attempt in range(max_retries + 1):
+        if limiter:
+            limiter.acquire(estimate_tokens(prompt, max_tokens))
+        
+        retry_after = None
+        try:
+            status, resp_headers, body = client.post_json('/v1/messages', payload, headers)
+            if status == 200:
+                reply = json.loads(body)['content'][0]['text']
+                if cache is not None:
+                    cache.put(key, reply)
+                return reply
+            error = f'ERROR: {status} {body.decode(errors="replace")[:200]}'
+            if status not in RETRY_STATUS:
+                raise APIError(error)
+            retry_after = resp_headers.get('retry-after')
+        except APIError:
+            raise
+        except (OSError, http.client.HTTPException) as e:
+            error = f'ERROR: {str(e)}'
+        except Exception as e:
+            raise APIError(f'ERROR: {str(e)}') from e
+        
+        if attempt < max_retries:
+            delay = retry_delay(attempt, retry_after)
+            if retry_after and limiter:
+                limiter.pause(delay)  # the whole pool backs off, not just this thread
+            time.sleep(delay)
+    raise APIError(error)
 
 def extract_number(text):
     """Extract a single number from Claude's response."""
@@ -92,67 +234,258 @@ def extract_number(text):
         return float(m.group(1).replace(',', ''))
     return None
 
-def main():
-    tasks = load_tasks()
-    results = {}
-    log = []
-    
-    total = len(tasks)
-    done = 0
-    
-    for tid, task in sorted(tasks.items()):
-        done += 1
-        raw_file = os.path.join(RAW_DIR, f'{tid}.txt')
-        if not os.path.exists(raw_file):
-            log.append(f'{tid}: MISSING')
-            continue
-        
-        with open(raw_file) as f:
-            response_text = f.read()
-        
-        field, expected = get_expected_field(task.get('ground_truth', {}))
-        if field is None:
-            log.append(f'{tid}: no expected field in ground truth')
-            continue
-        
-        # Build extraction prompt
-        prompt = f"""Extract the single numerical answer from this ChatGPT response to a statistical power analysis question.
+def build_prompt(field, response_text):
+    return f"""Extract the single numerical answer from this ChatGPT response to a statistical power analysis question.
 
 The question asked for: {field.replace('_', ' ')}
 Expected answer type: {'a decimal between 0 and 1' if field == 'power' else 'an integer (sample size or count)'}
 
-ChatGPT's response:
-{response_text[:3000]}
+ChatGPT's response ([...] marks text left out of long responses):
+{excerpt(response_text, PROMPT_TOKENS)}
 
 Extract ONLY the final recommended numerical value for {field.replace('_', ' ')}. If the response gives a "per group" number and the field asks for per_group, give the per-group number. If the field asks for total, give the total.
 
 Respond with ONLY the number, nothing else."""
-        
-        reply = call_claude(prompt)
-        value = extract_number(reply)
-        
-        if value is not None:
-            if field == 'power' and value > 1:
-                value = value / 100
-            results[tid] = value if field == 'power' else int(round(value))
-            
-            tol_dict = task.get('tolerance', {})
-            tol = tol_dict.get('sample_size', tol_dict.get('power', tol_dict.get('subjects', tol_dict.get('clusters', tol_dict.get('effect_size', 10)))))
-            diff = abs(results[tid] - expected)
-            passed = diff <= tol
-            status = 'PASS' if passed else 'FAIL'
-            log.append(f'[{done}/{total}] {tid}: extracted={results[tid]}, expected={expected}, diff={diff:.2f}, tol={tol}, {status}')
+
+PACKED_BLOCK = re.compile(r'<response id="([^"]+)" field="([^"]+)">\n(.*?)\n</response>', re.S)
+JSON_OBJECT = re.compile(r'\{.*\}', re.S)
+
+def build_packed_prompt(items):
+    """One prompt for several (task id, field, response text) items, asking for a JSON object back."""
+    blocks = '\n\n'.join(f'<response id="{tid}" field="{field}">\n{excerpt(text, PROMPT_TOKENS)}\n</response>'
+                          for tid, field, text in items)
+    return f"""Extract the single numerical answer from each of these {len(items)} ChatGPT responses to statistical power analysis questions.
+
+Each response is inside <response id="..." field="..."> tags; [...] marks text left out of long responses. The field names what its question asked for: power is a decimal between 0 and 1, every other field an integer (sample size or count).
+
+{blocks}
+
+For each response, extract ONLY the final recommended numerical value for its field. If the response gives a "per group" number and the field asks for per_group, give the per-group number. If the field asks for total, give the total.
+
+Respond with ONLY a JSON object mapping every id to its number (null if the response gives none), nothing else."""
+
+def split_packed_prompt(prompt):
+    """The (task id, field, response text) items of a packed prompt."""
+    return PACKED_BLOCK.findall(prompt)
+
+def parse_packed_reply(reply, ids):
+    """{task id: number} for every id the reply answers with a usable number."""
+    m = JSON_OBJECT.search(reply)
+    try:
+        answers = json.loads(m.group(0)) if m else {}
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(answers, dict):
+        return {}
+    values = {}
+    for tid in ids:
+        value = answers.get(tid)
+        if isinstance(value, str):
+            value = extract_number(value) if value.strip() else None
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[tid] = float(value)
+    return values
+
+def extract_task(spec, limiter=None, max_retries=5, cache=None):
+    """Run one task (a TaskSpec) through Claude. Returns (value or None, log message without progress prefix).
+
+    Raises APIError when the call fails, so the caller can retry it later.
+    """
+    raw_file = os.path.join(RAW_DIR, f'{spec.id}.txt')
+    if not os.path.exists(raw_file):
+        return None, 'MISSING'
+    
+    with open(raw_file) as f:
+        response_text = f.read()
+    return extract_response(response_text, spec, limiter, max_retries, cache)
+
+def extract_field(response_text, field, limiter=None, max_retries=5, cache=None):
+    """Ask Claude for `field` in one response. Returns (value or None, raw reply); raises APIError."""
+    reply = call_claude(build_prompt(field, response_text), limiter=limiter, max_retries=max_retries, cache=cache)
+    value = extract_number(reply)
+    if value is None:
+        return None, reply
+    return normalise(field, value), reply
+
+def normalise(field, value):
+    if field == 'power' and value > 1:
+        value = value / 100
+    return value if field == 'power' else int(round(value))
+
+def judge(value, spec):
+    """The log message for an extracted value."""
+    diff = abs(value - spec.expected)
+    status = 'PASS' if diff <= spec.tol else 'FAIL'
+    return f'extracted={value}, expected={spec.expected}, diff={diff:.2f}, tol={spec.tol}, {status}'
+
+def failure(error):
+    """The (value, message) outcome of a task whose API call failed."""
+    return None, f'EXTRACTION FAILED (Claude said: {str(error)[:100]})'
+
+def extract_response(response_text, spec, limiter=None, max_retries=5, cache=None):
+    """Like extract_task, for a response already in memory."""
+    if spec.field is None:
+        return None, 'no expected field in ground truth'
+    
+    value, reply = extract_field(response_text, spec.field, limiter, max_retries, cache)
+    if value is None:
+        return None, f'EXTRACTION FAILED (Claude said: {reply[:100]})'
+    return value, judge(value, spec)
+
+def extract_packed(items, limiter=None, max_retries=5, cache=None):
+    """Extract several (response text, spec) items with one request.
+
+    Returns ([(value or None, message)] in item order, number of items that
+    fell back to their own extract_response call because the packed reply
+    had no usable number for them, set of task ids whose API call failed).
+    A failed item gets the failure() outcome.
+    """
+    values = {}
+    if len(items) > 1:
+        prompt = build_packed_prompt([(spec.id, spec.field, text) for text, spec in items])
+        try:
+            reply = call_claude(prompt, PACK_TOKENS_BASE + PACK_TOKENS_PER_ITEM * len(items), limiter, max_retries,
+                                cache)
+            values = parse_packed_reply(reply, [spec.id for _, spec in items])
+        except APIError:
+            pass  # every item falls back to its own call
+    outcomes, fallbacks, errors = [], 0, set()
+    for text, spec in items:
+        if spec.id in values:
+            value = normalise(spec.field, values[spec.id])
+            outcomes.append((value, judge(value, spec)))
         else:
-            log.append(f'[{done}/{total}] {tid}: EXTRACTION FAILED (Claude said: {reply[:100]})')
-        
-        # Rate limit
-        if done % 10 == 0:
-            print(f'  [{done}/{total}] ...', flush=True)
-            time.sleep(0.5)
+            if len(items) > 1:
+                fallbacks += 1
+            try:
+                outcomes.append(extract_response(text, spec, limiter, max_retries, cache))
+            except APIError as e:
+                outcomes.append(failure(e))
+                errors.add(spec.id)
+    return outcomes, fallbacks, errors
+
+def add_llm_args(parser):
+    """Client options shared by every script that calls Claude for extraction."""
+    parser.add_argument('--base-url', default=None, help='messages API base URL (default: $ANTHROPIC_BASE_URL or api.anthropic.com)')
+    parser.add_argument('--concurrency', type=int, default=8, help='max requests in flight (1 = sequential)')
+    parser.add_argument('--rpm', type=int, default=50, help='requests per minute limit (0 = unlimited)')
+    parser.add_argument('--tpm', type=int, default=50000, help='tokens per minute limit (0 = unlimited)')
+    parser.add_argument('--max-retries', type=int, default=5, help='retries on 429/529/5xx and network errors')
+    parser.add_argument('--prompt-tokens', type=int, default=PROMPT_TOKENS,
+                        help='budget of the answer-bearing response excerpt in each prompt')
+    parser.add_argument('--connect-timeout', type=float, default=CONNECT_TIMEOUT, help='seconds to open a connection')
+    parser.add_argument('--read-timeout', type=float, default=READ_TIMEOUT, help='seconds to wait on each read')
+    parser.add_argument('--cache', default=CACHE_FILE, help='SQLite reply cache path')
+    parser.add_argument('--no-cache', action='store_true', help='always call the API')
+    parser.add_argument('--cache-max-age-days', type=float, default=90, help='evict cached replies older than this')
+    parser.add_argument('--cache-max-mb', type=float, default=200, help='evict least-recently-used replies above this size')
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Extract answers from raw responses with Claude.')
+    add_llm_args(parser)
+    parser.add_argument('--log', default=LOG_FILE, help='append-only log of finished tasks')
+    parser.add_argument('--resume', action='store_true', help='keep the tasks already in --log and extract the rest')
+    parser.add_argument('--pack', type=int, default=1, help='responses per request (1 = one request per task)')
+    return parser.parse_args(argv)
+
+def configure(args):
+    """Apply add_llm_args options. Returns (limiter, cache); exits if no API key is available."""
+    global API_KEY, BASE_URL, PROMPT_TOKENS
+    if args.base_url:
+        BASE_URL = args.base_url
+    API_KEY = load_api_key()
+    if not API_KEY and 'api.anthropic.com' in BASE_URL:
+        sys.exit('No ANTHROPIC_API_KEY found')
+    PROMPT_TOKENS = args.prompt_tokens
+    CLIENT_OPTIONS.update(size=max(1, args.concurrency), connect_timeout=args.connect_timeout,
+                          read_timeout=args.read_timeout)
+    limiter = RateLimiter(args.rpm or None, args.tpm or None)
+    cache = None if args.no_cache else ResponseCache(args.cache)
+    return limiter, cache
+
+def close_cache(cache, args):
+    """Evict, print the cache summary line and close."""
+    if cache is None:
+        return
+    evicted = cache.evict(args.cache_max_age_days, int(args.cache_max_mb * 1024 * 1024))
+    print(f'Cache: {cache.hits} hits, {cache.misses} misses, {len(cache)} entries, {evicted} evicted ({args.cache})')
+    cache.close()
+
+def main():
+    args = parse_args()
+    limiter, cache = configure(args)
+    index = load_task_index()
+    results = {}
+    log = []
+    
+    total = len(index)
+    order = list(index)
+    done = 0
+    fallbacks = 0
+    done_lock = threading.Lock()
+    
+    def run(group):
+        nonlocal done, fallbacks
+        if len(group) == 1:
+            fell_back, errors = 0, set()
+            try:
+                outcomes = [extract_task(group[0], limiter, args.max_retries, cache)]
+            except APIError as e:
+                outcomes, errors = [failure(e)], {group[0].id}
+        else:
+            items = []
+            for spec in group:
+                with open(os.path.join(RAW_DIR, f'{spec.id}.txt')) as f:
+                    items.append((f.read(), spec))
+            outcomes, fell_back, errors = extract_packed(items, limiter, args.max_retries, cache)
+        for spec, (value, message) in zip(group, outcomes):
+            # API errors are not logged, so --resume retries them
+            if spec.id not in errors:
+                result_log.append(spec.id, value, message=message)
+        with done_lock:
+            fallbacks += fell_back
+            before, done = done, done + len(group)
+            if done // 10 > before // 10:
+                print(f'  [{done}/{total}] ...', flush=True)
+        return outcomes
+    
+    # Each finished task goes to the result log at once, so an interrupted run can --resume
+    result_log = ResultLog(args.log, resume=args.resume)
+    finished = {spec.id: (result_log.get(spec.id)['value'], result_log.get(spec.id)['message'])
+                for spec in order if spec.id in result_log}
+    pending = [spec for spec in order if spec.id not in finished]
+    # Only tasks with a response and a field can share a packed prompt
+    packable = [s for s in pending if s.field is not None and os.path.exists(os.path.join(RAW_DIR, f'{s.id}.txt'))]
+    size = max(1, args.pack)
+    groups = [packable[i:i + size] for i in range(0, len(packable), size)]
+    packed_ids = {s.id for s in packable}
+    groups += [[s] for s in pending if s.id not in packed_ids]
+    pool = ThreadPoolExecutor(max_workers=max(1, args.concurrency))
+    try:
+        for group, outcomes in zip(groups, pool.map(run, groups)):
+            finished.update((spec.id, outcome) for spec, outcome in zip(group, outcomes))
+    except KeyboardInterrupt:
+        # Calls already in flight finish and are logged; queued tasks are dropped
+        pool.shutdown(cancel_futures=True)
+        result_log.close()
+        close_cache(cache, args)
+        sys.exit(f'\nInterrupted: {len(result_log.done)} tasks kept in {args.log}; rerun with --resume')
+    pool.shutdown()
+    result_log.close()
+    # Results and log stay in task order
+    outcomes = [finished[spec.id] for spec in order]
+    
+    for i, (spec, (value, message)) in enumerate(zip(order, outcomes), 1):
+        tid = spec.id
+        if message == 'MISSING' or message.startswith('no expected field'):
+            log.append(f'{tid}: {message}')
+            continue
+        if value is not None:
+            results[tid] = value
+        log.append(f'[{i}/{total}] {tid}: {message}')
     
     # Write results
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump(results, f, indent=2)
+    compact(args.log, OUTPUT_FILE, skip_none=True)
     
     # Summary
     extracted = sum(1 for v in results.values() if v is not None)
@@ -163,6 +496,12 @@ Respond with ONLY the number, nothing else."""
     print(f'Passed: {passed}/{total}')
     print(f'Failed: {failed}/{total}')
     print(f'Results: {OUTPUT_FILE}')
+    if size > 1:
+        print(f'Packed {len(packable)} tasks into {len(groups) - (len(pending) - len(packable))} requests '
+              f'({fallbacks} fell back to single calls)')
+    print(result_log.summary())
+    print(api_summary())
+    close_cache(cache, args)
     
     # Show failures
     failures = [l for l in log if 'FAIL' in l or 'MISSING' in l or 'EXTRACTION FAILED' in l]
@@ -0,0 +1,58 @@
+"""Content-hash manifest for incremental re-extraction.
+
+For every extracted entry (a task id, or "model/task" in batch runs) the
+manifest records a hash of the raw response, a hash of the task's
+ground_truth + tolerance, the extractor version and the extractor's outputs.
+On a rerun, an entry whose three inputs are unchanged is reused as-is and
+only new or changed entries are extracted again.
+
+The manifest is a JSON file stored next to the results it describes.
+"""
+import hashlib
+import json
+import os
+
+def hash_text(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def hash_task(task):
+    """Hash of the parts of a task that change an extraction's outcome."""
+    spec = {'ground_truth': task.get('ground_truth'), 'tolerance': task.get('tolerance')}
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+class Manifest:
+    def __init__(self, path, version, reset=False):
+        """Load the manifest at path; reset=True ignores it and re-extracts everything."""
+        self.path = path
+        self.version = version
+        self.reused = 0
+        self.extracted = 0
+        self.entries = {}
+        if not reset and os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f).get('entries', {})
+
+    def lookup(self, key, response_hash, task_hash):
+        """Stored outputs for key if its inputs are unchanged, else None."""
+        entry = self.entries.get(key)
+        if (entry and entry['response'] == response_hash and entry['task'] == task_hash
+                and entry['extractor'] == self.version):
+            self.reused += 1
+            return entry['outputs']
+        return None
+
+    def store(self, key, response_hash, task_hash, outputs):
+        self.extracted += 1
+        self.entries[key] = {'response': response_hash, 'task': task_hash,
+                             'extractor': self.version, 'outputs': outputs}
+
+    def save(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'entries': self.entries}, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def summary(self):
+        return f'Manifest: {self.extracted} extracted, {self.reused} unchanged ({self.path})'
@@ -0,0 +1,169 @@
+"""Local stand-in for the Anthropic messages API.
+
+Serves POST /v1/messages with replies replayed from an llm_extract reply
+cache (results/llm_cache.sqlite by default) and injects the failure modes
+the extraction pipeline has to cope with: per-request latency, random 5xx/529
+errors and periodic bursts of 429s carrying a retry-after header.
+
+    python mock_messages_api.py --port 8765 --error-rate 0.02 --burst-every 50 --burst-length 5
+    python llm_extract.py --base-url http://127.0.0.1:8765
+
+Prompts with no recorded reply get --default-reply. Packed prompts (see
+llm_extract.build_packed_prompt) get a JSON object built from the recorded
+reply of each response's single prompt.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_cache import ResponseCache, make_key
+
+class StandinConfig:
+    def __init__(self, recordings=None, prompt_version=1, default_reply='0', latency_ms=0.0,
+                 jitter_ms=0.0, error_rate=0.0, burst_every=0, burst_length=0, retry_after=1.0,
+                 seed=None):
+        self.recordings = recordings
+        self.prompt_version = prompt_version
+        self.default_reply = default_reply
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'requests': 0, 'ok': 0, 'replayed': 0, '429': 0, 'error': 0}
+
+    def next_outcome(self):
+        """Decide this request's fate: 'ok', '429' or 'error'."""
+        with self.lock:
+            n = self.counts['requests']
+            self.counts['requests'] += 1
+            if self.burst_every and n % self.burst_every >= self.burst_every - self.burst_length:
+                outcome = '429'
+            elif self.rng.random() < self.error_rate:
+                outcome = 'error'
+            else:
+                outcome = 'ok'
+            self.counts[outcome] += 1
+            delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        return outcome, delay
+
+    def reply_for(self, model, prompt, max_tokens):
+        from llm_extract import build_prompt, extract_number, split_packed_prompt
+        items = split_packed_prompt(prompt)
+        if items:
+            # A packed prompt is answered item by item from the single-prompt recordings
+            replies = {tid: extract_number(self.reply_for(model, build_prompt(field, text), 200))
+                       for tid, field, text in items}
+            return json.dumps(replies)
+        if self.recordings is not None:
+            reply = self.recordings.get(make_key(model, prompt, max_tokens, self.prompt_version))
+            if reply is not None:
+                with self.lock:
+                    self.counts['replayed'] += 1
+                return reply
+        return self.default_reply
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out as two writes; with Nagle on, keep-alive calls stall ~40 ms on delayed ACKs
+        disable_nagle_algorithm = True
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, status, payload, headers=None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if self.path.rstrip('/') != '/v1/messages':
+                self._send(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': self.path}})
+                return
+
+            outcome, delay = config.next_outcome()
+            time.sleep(delay)
+            if outcome == '429':
+                self._send(429, {'type': 'error', 'error': {'type': 'rate_limit_error', 'message': 'stand-in burst'}},
+                           {'retry-after': str(config.retry_after)})
+                return
+            if outcome == 'error':
+                status = config.rng.choice([500, 529])
+                kind = 'overloaded_error' if status == 529 else 'api_error'
+                self._send(status, {'type': 'error', 'error': {'type': kind, 'message': 'stand-in failure'}})
+                return
+
+            model = request.get('model', '')
+            max_tokens = request.get('max_tokens', 0)
+            prompt = ''.join(m['content'] for m in request.get('messages', []) if isinstance(m.get('content'), str))
+            text = config.reply_for(model, prompt, max_tokens)
+            self._send(200, {
+                'id': f'msg_standin_{config.counts["requests"]}',
+                'type': 'message',
+                'role': 'assistant',
+                'model': model,
+                'content': [{'type': 'text', 'text': text}],
+                'stop_reason': 'end_turn',
+                'usage': {'input_tokens': len(prompt) // 4, 'output_tokens': max(1, len(text) // 4)},
+            })
+
+    return Handler
+
+def start_server(config, host='127.0.0.1', port=0):
+    """Start the stand-in on a background thread. Returns (server, base_url)."""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+def add_config_args(parser):
+    parser.add_argument('--recordings', default='results/llm_cache.sqlite', help='llm_extract reply cache to replay')
+    parser.add_argument('--default-reply', default='0', help='reply for prompts with no recording')
+    parser.add_argument('--latency-ms', type=float, default=300, help='mean response latency')
+    parser.add_argument('--jitter-ms', type=float, default=100, help='uniform +/- latency jitter')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests failing with 500/529')
+    parser.add_argument('--burst-every', type=int, default=0, help='start a 429 burst every N requests (0 = never)')
+    parser.add_argument('--burst-length', type=int, default=0, help='requests per 429 burst')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='retry-after seconds sent with 429s')
+    parser.add_argument('--seed', type=int, default=None)
+
+def config_from_args(args, prompt_version=1):
+    recordings = ResponseCache(args.recordings) if args.recordings and os.path.exists(args.recordings) else None
+    return StandinConfig(recordings, prompt_version, args.default_reply, args.latency_ms, args.jitter_ms,
+                         args.error_rate, args.burst_every, args.burst_length, args.retry_after, args.seed)
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the messages API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_config_args(parser)
+    args = parser.parse_args()
+
+    from llm_extract import PROMPT_VERSION
+    config = config_from_args(args, PROMPT_VERSION)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    server.daemon_threads = True
+    print(f'Serving stand-in messages API on http://{args.host}:{args.port}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f'\n{config.counts}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Packed, memory-mapped response corpus.
+
+A packed corpus is two files:
+
+- <name>.pack: every response body, UTF-8 encoded, concatenated;
+- <name>.pack.idx: a JSON index {"version", "data_bytes", "models":
+  {model: {task id: [offset, length]}}}.
+
+Opening one is an open, a read of the index and an mmap of the data, instead of
+one open/read per .txt file or a full parse of each raw-responses.json.
+Responses are sliced out of the mapping on demand: raw() is a zero-copy
+memoryview, get() decodes only the one response asked for. Worker processes
+each map the same file and share its pages.
+
+find_sources() in batch_extract.py maps a .pack path to (path, model)
+sources, so --corpus results/corpus.pack works for batch_extract.py,
+bench_extractors.py and synth_corpus.py.
+
+    python packed_corpus.py                                    # test-results/raw-responses -> results/corpus.pack
+    python packed_corpus.py --raw-dir results/raw --model gpt-5.2 --output results/raw.pack
+"""
+import argparse
+import json
+import mmap
+import os
+import sys
+import time
+
+INDEX_VERSION = 1
+PACK_FILE = 'results/corpus.pack'
+
+def index_path(path):
+    return path + '.idx'
+
+def pack(responses, path):
+    """Write {model: {task id: text}} (inner mappings may be lazy) as a packed corpus; returns the index."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    models, offset = {}, 0
+    with open(path + '.tmp', 'wb') as f:
+        for model in sorted(responses):
+            entries = models[model] = {}
+            texts = responses[model]
+            for tid in sorted(texts):
+                body = texts[tid].encode('utf-8')
+                f.write(body)
+                entries[tid] = [offset, len(body)]
+                offset += len(body)
+    index = {'version': INDEX_VERSION, 'data_bytes': offset, 'models': models}
+    with open(index_path(path) + '.tmp', 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+    # Data first, index last: an index on disk always describes a complete data file
+    os.replace(path + '.tmp', path)
+    os.replace(index_path(path) + '.tmp', index_path(path))
+    return index
+
+class ModelView:
+    """One model's responses in a PackedCorpus, read like a {task id: text} dict."""
+
+    def __init__(self, corpus, model):
+        self._corpus = corpus
+        self._entries = corpus.index['models'].get(model, {})
+        self.model = model
+
+    def __contains__(self, tid):
+        return tid in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, tid):
+        offset, length = self._entries[tid]
+        return self._corpus.decode(offset, length)
+
+    def get(self, tid, default=None):
+        return self[tid] if tid in self._entries else default
+
+    def keys(self):
+        return self._entries.keys()
+
+class PackedCorpus:
+    def __init__(self, path):
+        with open(index_path(path)) as f:
+            self.index = json.load(f)
+        if self.index.get('version') != INDEX_VERSION:
+            raise ValueError(f'{index_path(path)}: unsupported index version {self.index.get("version")}')
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size != self.index['data_bytes']:
+            raise ValueError(f'{path}: {size} bytes, index expects {self.index["data_bytes"]}')
+        # mmap cannot map an empty file
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self._view = memoryview(self._map)
+
+    def models(self):
+        return sorted(self.index['models'])
+
+    def responses(self, model):
+        return ModelView(self, model)
+
+    def raw(self, model, tid):
+        """The UTF-8 bytes of one response as a zero-copy memoryview."""
+        offset, length = self.index['models'][model][tid]
+        return self._view[offset:offset + length]
+
+    def decode(self, offset, length):
+        return str(self._view[offset:offset + length], 'utf-8')
+
+    def get(self, model, tid, default=None):
+        entry = self.index['models'].get(model, {}).get(tid)
+        return default if entry is None else self.decode(*entry)
+
+    def __len__(self):
+        return sum(len(e) for e in self.index['models'].values())
+
+    def close(self):
+        self._view.release()
+        if not isinstance(self._map, bytes):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_open_packs = {}
+
+def open_pack(path):
+    """A PackedCorpus for path, opened once per process."""
+    corpus = _open_packs.get(path)
+    if corpus is None:
+        corpus = _open_packs[path] = PackedCorpus(path)
+    return corpus
+
+def main():
+    from batch_extract import CORPUS_DIR, find_sources, load_responses
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--corpus', default=CORPUS_DIR, help='directory of <model>/raw-responses.json or <model>/*.txt')
+    parser.add_argument('--raw-dir', default=None, help='pack one directory of <tid>.txt files instead (e.g. results/raw)')
+    parser.add_argument('--model', default='raw', help='model name to file --raw-dir responses under')
+    parser.add_argument('--models', help='comma-separated model names (default: all)')
+    parser.add_argument('--output', default=PACK_FILE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.raw_dir:
+        responses = {args.model: load_responses(args.raw_dir)}
+    else:
+        models = set(args.models.split(',')) if args.models else None
+        sources = find_sources(args.corpus, models)
+        if not sources:
+            sys.exit(f'No responses found under {args.corpus}')
+        responses = {model: load_responses(source) for model, source in sources.items()}
+    index = pack(responses, args.output)
+    count = sum(len(e) for e in index['models'].values())
+    print(f'{count} responses from {len(index["models"])} models ({index["data_bytes"] / 2 ** 20:.1f} MiB) '
+          f'packed into {args.output} in {time.perf_counter() - start:.2f}s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Opt-in per-pattern profiling for the regex extractors.
+
+While a Profile is active (enable() ... disable()), every Scan records, per
+pattern in scanner.PATTERNS:
+
+- runs: regex executions (cached re-reads are free and not counted)
+- skipped: times the needle prefilter ruled the pattern out
+- seconds / matches: time spent in the regex and matches it returned
+
+smart_extract2 records its number-near-keyword stage the same way, as the
+pseudo-pattern keyword_context. The extractors add which pattern produced
+each candidate (note_candidates) and which strategy produced the returned
+answer (note_win). Stats are kept
+in aggregate and per task: call begin(key) before extracting a task.
+
+When no profile is active, Scan pays one module-attribute check per
+pattern run and note_* return immediately.
+"""
+import json
+import time
+
+active = None
+
+def enable():
+    """Start recording into a fresh Profile and return it."""
+    global active
+    active = Profile()
+    return active
+
+def disable():
+    global active
+    profile, active = active, None
+    return profile
+
+def report(profile, path, top=25):
+    """Save profile as JSON at path and print its hot-path table (the end of a --profile run)."""
+    profile.save(path)
+    print(f'\n=== PATTERN PROFILE ({len(profile.tasks)} tasks, top {min(top, len(profile.patterns))} of {len(profile.patterns)} patterns) ===')
+    print(profile.table(top))
+    print(f'Profile written to {path}')
+
+def note_candidates(names):
+    """Count one candidate for each pattern name in names."""
+    if active is not None:
+        for name in names:
+            active.candidate(name)
+
+def note_win(strategy, value=None):
+    """Record the strategy that produced the answer; returns value for `return note_win(...)`."""
+    if active is not None:
+        active.won(strategy)
+    return value
+
+def _stats():
+    return {'runs': 0, 'skipped': 0, 'seconds': 0.0, 'matches': 0, 'candidates': 0, 'wins': 0}
+
+class Profile:
+    def __init__(self):
+        self.patterns = {}
+        self.tasks = {}
+        self.current = None
+        self._started = None
+
+    def _stats(self, name):
+        """The aggregate stats for name, plus the current task's if one is open."""
+        found = [self.patterns.setdefault(name, _stats())]
+        if self.current is not None:
+            found.append(self.current['patterns'].setdefault(name, _stats()))
+        return found
+
+    def begin(self, key):
+        """Attribute what follows to task `key` until the next begin() or end()."""
+        self.end()
+        self.current = self.tasks[key] = {'seconds': 0.0, 'winner': None, 'patterns': {}}
+        self._started = time.perf_counter()
+
+    def end(self):
+        if self.current is not None:
+            self.current['seconds'] += time.perf_counter() - self._started
+            self.current = None
+
+    def ran(self, name, seconds, matches):
+        for stats in self._stats(name):
+            stats['runs'] += 1
+            stats['seconds'] += seconds
+            stats['matches'] += matches
+
+    def skipped(self, name):
+        for stats in self._stats(name):
+            stats['skipped'] += 1
+
+    def candidate(self, name):
+        for stats in self._stats(name):
+            stats['candidates'] += 1
+
+    def won(self, strategy):
+        for stats in self._stats(strategy):
+            stats['wins'] += 1
+        if self.current is not None:
+            self.current['winner'] = strategy
+
+    def to_json(self):
+        self.end()
+        return {'patterns': self.patterns, 'tasks': self.tasks}
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_json(), f, indent=1)
+
+    def table(self, top=None):
+        """Hot-path table, most expensive pattern first."""
+        rows = sorted(self.patterns.items(), key=lambda kv: -kv[1]['seconds'])
+        total = sum(s['seconds'] for s in self.patterns.values()) or 1
+        lines = [f'{"pattern":<22} {"runs":>6} {"skipped":>7} {"ms":>8} {"%":>5} {"us/run":>7} '
+                 f'{"matches":>7} {"cands":>6} {"wins":>5}']
+        for name, s in rows[:top]:
+            per_run = 1e6 * s['seconds'] / s['runs'] if s['runs'] else 0
+            lines.append(f'{name:<22} {s["runs"]:>6} {s["skipped"]:>7} {1000 * s["seconds"]:>8.2f} '
+                         f'{100 * s["seconds"] / total:>5.1f} {per_run:>7.1f} {s["matches"]:>7} '
+                         f'{s["candidates"]:>6} {s["wins"]:>5}')
+        dead = sorted(name for name, s in self.patterns.items() if s['runs'] and not s['matches'])
+        if dead:
+            lines.append(f'Ran but never matched: {", ".join(dead)}')
+        return '\n'.join(lines)
@@ -0,0 +1,268 @@
+"""Vectorised closed-form power analysis for the tier-1 templates.
+
+Re-derives the tier-1 ground truths without R. Each template's power
+function reproduces the R function named in the tasks' reference_code
+(pwr.t.test, pwr.anova.test, pwr.2p.test, power.prop.test, pwr.chisq.test,
+pwr.r.test) with SciPy's central and noncentral t, F and chi-square
+distributions. Every function takes NumPy arrays and broadcasts, so a whole
+batch of parameter sets is one call.
+
+solve() fills in whichever of sample size, effect size or power is missing.
+The validation run re-solves the stored sample size of every supported task,
+and the stored power of two-group tasks given with unequal n1 and n2;
+stored effect sizes (detectable-effect answers) are not checked.
+It uses elementwise bisection, run on all parameter sets at once: sample
+size is bracketed in log space, effect size linearly. Power is monotone in
+both, so bisection always converges.
+
+    python power_engine.py                  # validate tier-1 tasks of all_tasks.json
+    python power_engine.py --tasks v2.2/tier1/tasks.json --verbose
+"""
+import argparse
+import re
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+from scipy import stats
+
+from task_index import iter_tasks
+
+TASKS_FILE = 'all_tasks.json'
+MAX_N = 1e7
+BISECT_STEPS = 64
+
+def ttest_power(n, d, alpha, sides, samples):
+    """pwr.t.test; samples=2 for two.sample (n per group), 1 for one.sample / paired."""
+    two = samples == 2
+    nu = np.where(two, 2 * (n - 1), n - 1)
+    ncp = np.abs(d) * np.sqrt(np.where(two, n / 2, n))
+    crit = stats.t.isf(alpha / sides, nu)
+    # The lower rejection region's mass underflows to NaN in SciPy once ncp is large; it is ~0 there
+    lower = np.where(sides == 2, np.nan_to_num(stats.nct.cdf(-crit, nu, ncp), nan=0.0), 0.0)
+    return stats.nct.sf(crit, nu, ncp) + lower
+
+def ttest2n_power(n1, n2, d, alpha, sides):
+    """pwr.t2n.test (WebPower wp.t type="two.sample.2n"); unequal group sizes."""
+    nu = n1 + n2 - 2
+    ncp = np.abs(d) * np.sqrt(n1 * n2 / (n1 + n2))
+    crit = stats.t.isf(alpha / sides, nu)
+    lower = np.where(sides == 2, np.nan_to_num(stats.nct.cdf(-crit, nu, ncp), nan=0.0), 0.0)
+    return stats.nct.sf(crit, nu, ncp) + lower
+
+def anova_power(n, f, alpha, k):
+    """pwr.anova.test; n per group, k groups."""
+    df1, df2 = k - 1, (n - 1) * k
+    crit = stats.f.isf(alpha, df1, df2)
+    return stats.ncf.sf(crit, df1, df2, k * n * f ** 2)
+
+def arcsine_power(n, h, alpha, sides):
+    """pwr.2p.test; n per group, h = ES.h(p1, p2)."""
+    z = stats.norm.isf(alpha / sides)
+    shift = np.abs(h) * np.sqrt(n / 2)
+    return stats.norm.sf(z - shift) + np.where(sides == 2, stats.norm.cdf(-z - shift), 0.0)
+
+def arcsine2n_power(n1, n2, h, alpha, sides):
+    """pwr.2p2n.test (WebPower wp.prop type="2p2n"); unequal group sizes."""
+    return arcsine_power(2 * n1 * n2 / (n1 + n2), h, alpha, sides)
+
+def pooled_power(n, delta, alpha, sides, base):
+    """power.prop.test (strict=FALSE); proportions base and base + delta, n per group."""
+    p1, p2 = base + np.abs(delta), base
+    q1, q2 = 1 - p1, 1 - p2
+    z = stats.norm.isf(alpha / sides)
+    return stats.norm.cdf((np.sqrt(n) * np.abs(delta) - z * np.sqrt((p1 + p2) * (q1 + q2) / 2))
+                          / np.sqrt(p1 * q1 + p2 * q2))
+
+def chisq_power(n, w, alpha, df):
+    """pwr.chisq.test; n is the total sample size."""
+    return stats.ncx2.sf(stats.chi2.isf(alpha, df), df, n * w ** 2)
+
+def correlation_power(n, r, alpha, sides):
+    """pwr.r.test (Fisher z with its small-sample bias term)."""
+    r = np.abs(r)
+    t = stats.t.isf(alpha / sides, n - 2)
+    rc = np.sqrt(t ** 2 / (t ** 2 + n - 2))
+    zr = np.arctanh(r) + r / (2 * (n - 1))
+    zrc = np.arctanh(rc)
+    lower = np.where(sides == 2, stats.norm.cdf((-zr - zrc) * np.sqrt(n - 3)), 0.0)
+    return stats.norm.cdf((zr - zrc) * np.sqrt(n - 3)) + lower
+
+# power(n, effect, alpha, sides, extra); groups(extra) -> participants per unit of n.
+# The _2n templates take n1 as n and n2 as extra; they are only checked for power.
+Template = namedtuple('Template', ['power', 'min_n', 'max_effect', 'groups'])
+
+TEMPLATES = {
+    'two_sample_ttest': Template(lambda n, es, a, s, x: ttest_power(n, es, a, s, 2), 2, 10.0, lambda x: 2),
+    'paired_ttest': Template(lambda n, es, a, s, x: ttest_power(n, es, a, s, 1), 2, 10.0, lambda x: 1),
+    'one_sample_ttest': Template(lambda n, es, a, s, x: ttest_power(n, es, a, s, 1), 2, 10.0, lambda x: 1),
+    'one_way_anova': Template(lambda n, es, a, s, x: anova_power(n, es, a, x), 2, 10.0, lambda x: x),
+    'two_proportions': Template(lambda n, es, a, s, x: arcsine_power(n, es, a, s), 2, np.pi, lambda x: 2),
+    'two_proportions_pooled': Template(lambda n, es, a, s, x: pooled_power(n, es, a, s, x), 2,
+                                       None, lambda x: 2),
+    'chi_square': Template(lambda n, es, a, s, x: chisq_power(n, es, a, x), 2, 10.0, lambda x: 1),
+    'correlation': Template(lambda n, es, a, s, x: correlation_power(n, es, a, s), 4, 0.9999, lambda x: 1),
+    'two_sample_ttest_2n': Template(lambda n, es, a, s, x: ttest2n_power(n, x, es, a, s), 2, 10.0, None),
+    'two_proportions_2n': Template(lambda n, es, a, s, x: arcsine2n_power(n, x, es, a, s), 2, np.pi, None),
+}
+
+def bisect(f, lo, hi, geometric=False, steps=BISECT_STEPS):
+    """Elementwise root of increasing f on [lo, hi]; returns hi where f(hi) < 0."""
+    lo, hi = np.array(lo, dtype=float), np.array(hi, dtype=float)
+    for _ in range(steps):
+        mid = np.sqrt(lo * hi) if geometric else (lo + hi) / 2
+        above = f(mid) >= 0
+        hi = np.where(above, mid, hi)
+        lo = np.where(above, lo, mid)
+    return hi
+
+def solve(template, n=None, effect=None, power=None, alpha=0.05, sides=2, extra=0):
+    """Solve for the one of n, effect, power given as None; arrays broadcast.
+
+    n is per group (total for chi_square, n1 for the _2n templates); it is
+    returned unrounded, as R reports it before rounding up. extra is k for
+    one_way_anova, df for chi_square, the smaller proportion for
+    two_proportions_pooled and n2 for the _2n templates.
+    """
+    t = TEMPLATES[template]
+    alpha, sides, extra = np.asarray(alpha, float), np.asarray(sides), np.asarray(extra, float)
+    if power is None:
+        return t.power(np.asarray(n, float), np.asarray(effect, float), alpha, sides, extra)
+    target = np.asarray(power, float)
+    if n is None:
+        effect = np.asarray(effect, float)
+        shape = np.broadcast(effect, target, alpha, sides, extra).shape
+        return bisect(lambda m: t.power(m, effect, alpha, sides, extra) - target,
+                      np.full(shape, float(t.min_n)), np.full(shape, MAX_N), geometric=True)
+    n = np.asarray(n, float)
+    shape = np.broadcast(n, target, alpha, sides, extra).shape
+    top = (1 - extra - 1e-9) if t.max_effect is None else t.max_effect
+    return bisect(lambda es: t.power(n, es, alpha, sides, extra) - target,
+                  np.full(shape, 1e-9), np.broadcast_to(top, shape))
+
+ONE_SIDED = re.compile(r"""alternative\s*=\s*['"](?:greater|less|one\.sided)['"]""")
+N_FIELDS = ('sample_size_per_group', 'sample_size', 'total_sample_size')
+
+def task_params(task):
+    """(template key, {effect, power, alpha, sides, extra}, answer field) for a supported task, else None.
+
+    The answer field is a sample-size field of N_FIELDS, or 'power' for a
+    two-group task that gives unequal n1 and n2 instead (params then also
+    has n = n1, and extra = n2).
+    """
+    gt = task.get('ground_truth', {})
+    code = task.get('reference_code') or ''
+    template = task.get('template')
+    params = {'effect': None, 'power': gt.get('power'), 'alpha': gt.get('alpha', 0.05), 'extra': 0,
+              'sides': 1 if ONE_SIDED.search(code) else 2}
+    if template in ('two_sample_ttest', 'paired_ttest', 'one_sample_ttest'):
+        params['effect'] = gt.get('effect_size_d')
+    elif template == 'one_way_anova':
+        params['effect'], params['extra'] = gt.get('effect_size_f'), gt.get('groups')
+    elif template in ('chi_square', 'chi_squared'):
+        template = 'chi_square'
+        params['effect'], params['extra'] = gt.get('effect_size_w'), gt.get('df')
+    elif template == 'correlation':
+        params['effect'] = gt.get('correlation_r')
+    elif template == 'two_proportions':
+        p1, p2 = gt.get('p1'), gt.get('p2')
+        if 'power.prop.test' in code and p1 is not None and p2 is not None:
+            template = 'two_proportions_pooled'
+            params['effect'], params['extra'] = abs(p1 - p2), min(p1, p2)
+        elif gt.get('effect_size_h') is not None:
+            params['effect'] = gt['effect_size_h']
+        elif p1 is not None and p2 is not None:
+            params['effect'] = abs(2 * np.arcsin(np.sqrt(p1)) - 2 * np.arcsin(np.sqrt(p2)))
+    else:
+        return None
+    field = next((f for f in N_FIELDS if gt.get(f) is not None), None)
+    if (field is None and template in ('two_sample_ttest', 'two_proportions')
+            and gt.get('n1') is not None and gt.get('n2') is not None):
+        template, field = f'{template}_2n', 'power'
+        params['n'], params['extra'] = gt['n1'], gt['n2']
+    if field is None or any(params[k] is None for k in ('effect', 'power', 'extra')):
+        return None
+    return template, params, field
+
+def validate(tasks):
+    """Re-solve every supported task's answer, one vectorised solve per template.
+
+    Returns one row per task. A sample-size row has the continuous and
+    rounded-up n, the stored value, whether the stored total (n x groups)
+    also matches, and the power the stored n actually achieves. A power row
+    (unequal n1, n2) has the power those sizes achieve against the stored
+    power. Tasks whose answer is an effect size are not re-solved.
+    """
+    groups = {}
+    for task in tasks:
+        parsed = task_params(task)
+        if parsed:
+            groups.setdefault(parsed[0], []).append((task, parsed[1], parsed[2]))
+
+    rows = []
+    for template, members in groups.items():
+        cols = {k: np.array([p[k] for _, p, _ in members], dtype=float)
+                for k in ('effect', 'power', 'alpha', 'sides', 'extra')}
+        if TEMPLATES[template].groups is None:
+            n1 = np.array([p['n'] for _, p, _ in members], dtype=float)
+            achieved = solve(template, n1, cols['effect'], None, cols['alpha'], cols['sides'], cols['extra'])
+            for i, (task, params, field) in enumerate(members):
+                power_tol = task.get('tolerance', {}).get('power', 0.01)
+                rows.append({'id': task['id'], 'template': template, 'field': field,
+                             'n1': params['n'], 'n2': params['extra'], 'power': round(float(achieved[i]), 4),
+                             'stored': params['power'], 'tol': power_tol,
+                             'pass': abs(achieved[i] - params['power']) <= power_tol})
+            continue
+        n = solve(template, None, cols['effect'], cols['power'], cols['alpha'], cols['sides'], cols['extra'])
+        stored = np.array([t['ground_truth'][f] for t, _, f in members], dtype=float)
+        achieved = solve(template, stored, cols['effect'], None, cols['alpha'], cols['sides'], cols['extra'])
+        per_unit = np.asarray(TEMPLATES[template].groups(cols['extra']), dtype=float) * np.ones(len(members))
+        for i, (task, params, field) in enumerate(members):
+            gt, tol = task['ground_truth'], task.get('tolerance', {})
+            n_tol = tol.get(field, tol.get('sample_size', 1))
+            needed = int(np.ceil(n[i] - 1e-9))
+            row = {'id': task['id'], 'template': template, 'field': field, 'n_exact': round(float(n[i]), 3),
+                   'n': needed, 'stored': gt[field], 'tol': n_tol, 'pass': abs(needed - gt[field]) <= n_tol,
+                   'achieved_power': round(float(achieved[i]), 4)}
+            if field != 'total_sample_size' and gt.get('total_sample_size') is not None:
+                total_tol = tol.get('total_sample_size', n_tol * per_unit[i])
+                row['total'] = int(needed * per_unit[i])
+                row['pass'] &= abs(row['total'] - gt['total_sample_size']) <= total_tol
+            power_tol = tol.get('power')
+            if power_tol is not None:
+                row['pass'] &= achieved[i] >= params['power'] - power_tol
+            rows.append(row)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--tasks', default=TASKS_FILE, help='task file (JSON array, tier file or JSONL)')
+    parser.add_argument('--tier', type=int, default=1, help='only tasks of this tier (0 = all)')
+    parser.add_argument('--verbose', action='store_true', help='print every task, not just mismatches')
+    args = parser.parse_args()
+
+    tasks = [t for t in iter_tasks(args.tasks) if not args.tier or t.get('tier') in (args.tier, str(args.tier))]
+    start = time.perf_counter()
+    rows = validate(tasks)
+    elapsed = time.perf_counter() - start
+
+    bad = [r for r in rows if not r['pass']]
+    for r in rows if args.verbose else bad:
+        mark = 'ok  ' if r['pass'] else 'FAIL'
+        if r['field'] == 'power':
+            print(f'  {mark} {r["id"]:<28} {r["template"]:<22} n1={r["n1"]}, n2={r["n2"]} '
+                  f'-> power={r["power"]} (stored {r["stored"]} ±{r["tol"]})')
+            continue
+        total = f' total={r["total"]}' if 'total' in r else ''
+        print(f'  {mark} {r["id"]:<28} {r["template"]:<22} n={r["n_exact"]:<10} '
+              f'-> {r["n"]} (stored {r["stored"]} ±{r["tol"]}){total} power@stored={r["achieved_power"]}')
+    power_rows = sum(1 for r in rows if r['field'] == 'power')
+    print(f'\n=== GROUND TRUTH CHECK ({args.tasks}) ===')
+    print(f'Supported tasks: {len(rows)}/{len(tasks)} ({len(rows) - power_rows} sample size, {power_rows} power; '
+          f'effect-size answers not checked) | Reproduced: {len(rows) - len(bad)} | '
+          f'Mismatched: {len(bad)} | {1000 * elapsed:.0f} ms')
+    sys.exit(1 if bad else 0)
+
+if __name__ == '__main__':
+    main()
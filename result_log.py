@@ -0,0 +1,150 @@
+"""Crash-safe append-only log of per-task extraction results.
+
+Each finished entry is appended to a JSONL file as {"key": ..., "value": ...,
+...} the moment it is known, flushed at once and fsynced every
+FSYNC_EVERY entries or FSYNC_SECONDS, and on close. A run that dies (crash,
+Ctrl-C, API outage) loses at most the entries since the last fsync; rerun it
+with --resume to keep the logged entries and extract only the rest. A torn
+last line from a crash is ignored on reading. A run without --resume starts
+a new log, but first renames the old one to <log>.<timestamp>.bak, so
+forgetting the flag never throws paid results away.
+
+compact() turns a log into the final results JSON (last entry per key wins),
+written atomically. Extraction scripts do this at the end of a run; for a run
+that never finished:
+
+    python result_log.py results/llm_extract.log.jsonl results/agent_results.json
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+FSYNC_EVERY = 20
+FSYNC_SECONDS = 5.0
+
+def read_log(path):
+    """{key: entry} from a log, last entry per key winning; {} if there is no log."""
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn write from a crash
+            entries[entry['key']] = entry
+    return entries
+
+def write_json(path, data):
+    """Write data to path atomically (temp file + rename)."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def compact(log_path, output_path, skip_none=False):
+    """Write {key: value} of every logged entry, in key order, to output_path; returns it."""
+    entries = read_log(log_path)
+    results = {key: entries[key]['value'] for key in sorted(entries)
+               if not (skip_none and entries[key]['value'] is None)}
+    write_json(output_path, results)
+    return results
+
+def backup_path(path):
+    """A free <path>.<timestamp>.bak name for a log about to be replaced."""
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    candidate, n = f'{path}.{stamp}.bak', 1
+    while os.path.exists(candidate):
+        candidate, n = f'{path}.{stamp}-{n}.bak', n + 1
+    return candidate
+
+class ResultLog:
+    def __init__(self, path, resume=False, fsync_every=FSYNC_EVERY, fsync_seconds=FSYNC_SECONDS):
+        """Open the log at path; resume=True keeps its entries, otherwise it starts empty.
+
+        A log that is not resumed is renamed to backup_path() (kept in
+        self.rotated) rather than truncated.
+        """
+        self.path = path
+        self.rotated = None
+        self.done = read_log(path) if resume else {}
+        self.resumed = len(self.done)
+        self.fsync_every = fsync_every
+        self.fsync_seconds = fsync_seconds
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._synced = time.monotonic()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if resume and os.path.exists(path):
+            self._trim_torn_tail()
+        elif not resume and os.path.exists(path) and os.path.getsize(path):
+            self.rotated = backup_path(path)
+            os.replace(path, self.rotated)
+        self._file = open(path, 'a' if resume else 'w')
+
+    def _trim_torn_tail(self):
+        # A crash mid-write leaves a last line without its newline; drop it so appends start clean
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def get(self, key):
+        return self.done.get(key)
+
+    def append(self, key, value, **extra):
+        """Log one finished entry; safe to call from several threads."""
+        entry = {'key': key, 'value': value, **extra}
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            self.done[key] = entry
+            self._file.write(line)
+            self._file.flush()
+            self._pending += 1
+            if self._pending >= self.fsync_every or time.monotonic() - self._synced >= self.fsync_seconds:
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._synced = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                self._sync()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def summary(self):
+        rotated = f'; previous log kept as {self.rotated}' if self.rotated else ''
+        return f'Result log: {len(self.done) - self.resumed} new, {self.resumed} resumed ({self.path}){rotated}'
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact a result log into the final results JSON.')
+    parser.add_argument('log')
+    parser.add_argument('output')
+    parser.add_argument('--skip-none', action='store_true', help='leave out entries whose value is null')
+    args = parser.parse_args()
+    results = compact(args.log, args.output, args.skip_none)
+    print(f'{len(results)} entries written to {args.output}')
+
+if __name__ == '__main__':
+    main()
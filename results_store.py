@@ -0,0 +1,204 @@
+"""Columnar (model x task) results store with vectorised scoring.
+
+A ResultsStore holds every model's extracted answers as one float matrix
+value[model, task], next to per-task columns expected, tol, tier and
+template. Missing answers and unscorable tasks are NaN. Scoring is whole-array
+NumPy: pass matrices, per-tier / per-template pass rates and tolerance
+sweeps (every model re-scored at 0.5x ... 3x tolerance in one broadcast) need
+no per-row Python loop, so re-ranking under a new tolerance policy is
+immediate.
+
+A store is built from either:
+
+- the LLM-judge evaluations (test-results/evaluation/<model>/evaluation.json
+  and test-results/<model>-evaluation.json), taking each task's answer field
+  as chosen by --extractor's rules; or
+- a batch_extract.py output (results/batch_extraction.json), taking one
+  extractor's values.
+
+    python results_store.py --by tier --scales 0.5,1,2,3
+    python results_store.py --source batch --extractor smart_extract --by template
+"""
+import argparse
+import glob
+import json
+import os
+
+import numpy as np
+
+from batch_extract import EXTRACTORS, OUTPUT_FILE as BATCH_FILE, TASKS_FILE, load_indexes
+
+EVALUATION_DIR = 'test-results/evaluation'
+STORE_FILE = 'results/results_store.npz'
+DEFAULT_SCALES = (0.5, 0.75, 1.0, 1.5, 2.0, 3.0)
+
+def evaluated_models():
+    """Model names that have a stored LLM-judge evaluation."""
+    models = {os.path.basename(os.path.dirname(p)) for p in glob.glob(os.path.join(EVALUATION_DIR, '*', 'evaluation.json'))}
+    models.update(os.path.basename(p)[:-len('-evaluation.json')]
+                  for p in glob.glob(os.path.join(os.path.dirname(EVALUATION_DIR), '*-evaluation.json')))
+    return sorted(models)
+
+def evaluation_file(model):
+    """Path of a model's stored LLM-judge evaluation, or None."""
+    for path in (os.path.join(EVALUATION_DIR, model, 'evaluation.json'),
+                 os.path.join(os.path.dirname(EVALUATION_DIR), f'{model}-evaluation.json')):
+        if os.path.exists(path):
+            return path
+    return None
+
+def load_evaluations(models):
+    """{(model, task id): {field: value}} from the stored LLM-judge evaluations."""
+    judged = {}
+    for model in models:
+        path = evaluation_file(model)
+        if path:
+            with open(path) as f:
+                for r in json.load(f).get('detailed_results', []):
+                    judged[(model, r['task_id'])] = r.get('extracted') or {}
+    return judged
+
+def _number(x):
+    return float(x) if isinstance(x, (int, float)) and not isinstance(x, bool) else np.nan
+
+class ResultsStore:
+    """value is (models, tasks); expected, tol, tier and template are per task."""
+
+    def __init__(self, models, tasks, value, expected, tol, tier, template):
+        self.models = list(models)
+        self.tasks = list(tasks)
+        self.value = np.asarray(value, dtype=float)
+        self.expected = np.asarray(expected, dtype=float)
+        self.tol = np.asarray(tol, dtype=float)
+        self.tier = np.asarray(tier, dtype=str)
+        self.template = np.asarray(template, dtype=str)
+
+    @classmethod
+    def from_answers(cls, answers, index):
+        """answers: {(model, task id): value}; index: TaskIndex giving expected, tol, tier, template."""
+        models = sorted({model for model, _ in answers})
+        specs = list(index)
+        row = {m: i for i, m in enumerate(models)}
+        col = {s.id: j for j, s in enumerate(specs)}
+        value = np.full((len(models), len(specs)), np.nan)
+        for (model, tid), v in answers.items():
+            if tid in col:
+                value[row[model], col[tid]] = _number(v)
+        return cls(models, [s.id for s in specs], value,
+                   [_number(s.expected) for s in specs], [_number(s.tol) for s in specs],
+                   [str(s.tier) for s in specs], [s.template or '' for s in specs])
+
+    @classmethod
+    def from_evaluations(cls, extractor='smart_extract2', models=None):
+        """LLM-judge answers, for the field extractor's rules pick as each task's answer."""
+        index = load_indexes(TASKS_FILE, [extractor])[extractor]
+        judged = load_evaluations(models or evaluated_models())
+        return cls.from_answers({key: fields.get(index[key[1]].field) for key, fields in judged.items()
+                                 if key[1] in index}, index)
+
+    @classmethod
+    def from_batch(cls, path=BATCH_FILE, extractor='smart_extract2'):
+        """One extractor's column of a batch_extract.py output."""
+        with open(path) as f:
+            rows = json.load(f)['rows']
+        index = load_indexes(TASKS_FILE, [extractor])[extractor]
+        return cls.from_answers({(r['model'], r['task_id']): r[extractor]['value'] for r in rows}, index)
+
+    def save(self, path=STORE_FILE):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez_compressed(path, models=np.array(self.models), tasks=np.array(self.tasks), value=self.value,
+                            expected=self.expected, tol=self.tol, tier=self.tier, template=self.template)
+
+    @classmethod
+    def load(cls, path=STORE_FILE):
+        with np.load(path) as z:
+            return cls(z['models'].tolist(), z['tasks'].tolist(), z['value'], z['expected'], z['tol'],
+                       z['tier'], z['template'])
+
+    @property
+    def scorable(self):
+        """Tasks with both an expected value and a tolerance."""
+        return ~(np.isnan(self.expected) | np.isnan(self.tol))
+
+    def passed(self, scale=1.0):
+        """Boolean (models, tasks) pass matrix at scale x tolerance; NaN answers fail."""
+        with np.errstate(invalid='ignore'):
+            return (np.abs(self.value - self.expected) <= self.tol * scale) & self.scorable
+
+    def groups(self, by=None):
+        """(labels, (tasks, groups) 0/1 matrix) for by in None, 'tier', 'template'."""
+        if by is None:
+            return ['overall'], self.scorable[:, None].astype(float)
+        labels, inverse = np.unique(getattr(self, by), return_inverse=True)
+        member = np.zeros((len(self.tasks), len(labels)))
+        member[np.arange(len(self.tasks)), inverse] = 1
+        return labels.tolist(), member * self.scorable[:, None]
+
+    def rates(self, scale=1.0, by=None):
+        """(labels, passed (models, groups), totals (groups,), rates (models, groups))."""
+        labels, member = self.groups(by)
+        passed = self.passed(scale).astype(float) @ member
+        totals = member.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return labels, passed, totals, passed / totals
+
+    def sweep(self, scales=DEFAULT_SCALES):
+        """(scales, models) overall pass rates, every scale in one broadcast."""
+        scales = np.asarray(scales, dtype=float)[:, None, None]
+        with np.errstate(invalid='ignore'):
+            passed = (np.abs(self.value - self.expected) <= self.tol * scales) & self.scorable
+        return passed.sum(axis=2) / self.scorable.sum()
+
+    def ranking(self, scale=1.0):
+        """Model indices ordered by overall pass rate (best first), ties by name."""
+        _, passed, _, _ = self.rates(scale)
+        return np.lexsort((np.array(self.models), -passed[:, 0]))
+
+def print_leaderboard(store, scale, by):
+    labels, passed, totals, rates = store.rates(scale, by)
+    _, overall, total, _ = store.rates(scale)
+    width = max(len(m) for m in store.models)
+    print(f'\n=== LEADERBOARD ({len(store.models)} models, {int(total[0])} scorable tasks, {scale}x tolerance) ===')
+    header = ''.join(f' {str(label)[:14]:>14}' for label in labels) if by else ''
+    print(f'{"#":>3} {"model":<{width}}{header} {"overall":>14}')
+    for rank, i in enumerate(store.ranking(scale), 1):
+        cells = ''.join(f' {int(passed[i, k]):>4}/{int(totals[k]):<3}{100 * rates[i, k]:>5.0f}%'
+                        for k in range(len(labels))) if by else ''
+        cell = f'{int(overall[i, 0])}/{int(total[0])}'
+        print(f'{rank:>3} {store.models[i]:<{width}}{cells} {cell:>8}{100 * overall[i, 0] / total[0]:>5.1f}%')
+
+def print_sweep(store, scales):
+    rates = store.sweep(scales)
+    width = max(len(m) for m in store.models)
+    print(f'\n=== TOLERANCE SWEEP (overall pass rate) ===')
+    print(f'{"model":<{width}}' + ''.join(f' {f"{s}x":>7}' for s in scales))
+    for i in store.ranking():
+        print(f'{store.models[i]:<{width}}' + ''.join(f' {100 * r:>6.1f}%' for r in rates[:, i]))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--source', choices=['evaluations', 'batch', 'store'], default='evaluations')
+    parser.add_argument('--extractor', default='smart_extract2', choices=list(EXTRACTORS),
+                        help='whose answer-field rules (and, with --source batch, whose values) to use')
+    parser.add_argument('--input', default=None, help=f'batch output or saved store (default {BATCH_FILE} / {STORE_FILE})')
+    parser.add_argument('--scale', type=float, default=1.0, help='tolerance multiplier for the leaderboard')
+    parser.add_argument('--scales', default=','.join(str(s) for s in DEFAULT_SCALES), help='tolerance sweep multipliers')
+    parser.add_argument('--by', choices=['tier', 'template'], default=None, help='break pass rates down by')
+    parser.add_argument('--save', nargs='?', const=STORE_FILE, default=None, help='save the store (.npz)')
+    args = parser.parse_args()
+
+    if args.source == 'batch':
+        store = ResultsStore.from_batch(args.input or BATCH_FILE, args.extractor)
+    elif args.source == 'store':
+        store = ResultsStore.load(args.input or STORE_FILE)
+    else:
+        store = ResultsStore.from_evaluations(args.extractor)
+
+    print_leaderboard(store, args.scale, args.by)
+    print_sweep(store, [float(s) for s in args.scales.split(',')])
+    if args.save:
+        store.save(args.save)
+        print(f'\nStore written to {args.save}')
+
+if __name__ == '__main__':
+    main()
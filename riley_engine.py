@@ -0,0 +1,479 @@
+"""Vectorised Riley-criteria sample sizes for the tier-4 prediction-model tasks.
+
+Python versions of the two R packages behind tier 4:
+
+- pmsampsize(type='b' | 's' | 'c', ...): the Riley et al. criteria for
+  developing a prediction model (shrinkage <= 1 - S, optimism in R-squared,
+  precision of the overall risk, the residual variance and the intercept)
+- pmvalsampsize(type='b', ...): the CI-width criteria for externally
+  validating one (O/E ratio, calibration slope, C statistic and, with a
+  threshold, standardised net benefit)
+
+Arguments use the R names and accept NumPy arrays, so a whole batch of
+parameter sets is one call; a missing optional argument is NaN. Both return
+every criterion's sample size, the final size, the binding criterion and the
+events / EPP that pmsampsize prints.
+
+R simulates a million linear predictors for cstatistic -> Cox-Snell
+R-squared, the calibration-slope information matrix and the sensitivity /
+specificity at a threshold. With the default seed=123456 the same draws are
+made here (r_normals reproduces R's Mersenne-Twister and inversion normals),
+so results match R exactly. The seeded cstatistic conversion fits all
+distinct parameter sets in one batched Newton loop over the shared draws,
+about 0.1 s per distinct set. seed=None instead takes the expectations over a
+fixed quantile grid of the LP distribution: equal to R up to its simulation
+noise and fast enough for large batches, so use it there and keep the seed
+for checking against R. Beta LP distributions (lpbeta) always use the grid, and
+lpcstat (LP distribution fitted by simulation) is not supported.
+
+    python riley_engine.py                   # validate tier-4 tasks of all_tasks.json
+    python riley_engine.py --tasks v2.2/tier4/tasks.json --verbose
+"""
+import argparse
+import functools
+import re
+import sys
+import time
+
+import numpy as np
+from scipy import special, stats
+
+from task_index import iter_tasks
+
+TASKS_FILE = 'all_tasks.json'
+Z = stats.norm.isf(0.025)
+QUANTILES = 20000
+R2_DELTA = 0.05     # criterion 2: apparent - adjusted Nagelkerke R-squared
+RISK_MARGIN = 0.05  # criterion 3: margin of error of the overall risk
+RESIDUAL_MMOE = 1.1 # continuous criterion 3; the mmoe argument only applies to the intercept
+R_SEED = 123456
+SIMOBS = 1000000
+SE_STEP = 1e-4      # pmvalsampsize steps the target SE up in increments of this
+
+def _u(k=QUANTILES):
+    return (np.arange(k) + 0.5) / k
+
+def _col(x):
+    return np.asarray(x, dtype=float)[..., None]
+
+def _ceil(x):
+    # Guard against 1e-12 float noise pushing an exact integer up by one
+    return np.ceil(np.asarray(x) - 1e-9)
+
+@functools.lru_cache(maxsize=4)
+def r_normals(seed, k):
+    """The first k values of R's rnorm(k) after set.seed(seed), read-only.
+
+    R's defaults are reproduced: Mersenne-Twister seeded through set.seed's
+    linear-congruential scrambling, and inversion normals built from two
+    uniforms each.
+    """
+    s = seed & 0xffffffff
+    key = []
+    for i in range(50 + 625):
+        s = (69069 * s + 1) & 0xffffffff
+        key.append(s)
+    mt = np.random.MT19937()
+    # key[50] is R's stored position word; set.seed resets the position to 624
+    mt.state = {'bit_generator': 'MT19937', 'state': {'key': np.array(key[51:], dtype=np.uint32), 'pos': 624}}
+    u = mt.random_raw(2 * k).astype(float) * 2.3283064365386963e-10
+    u[u <= 0] = 0.5 * 2.328306437080797e-10
+    u = u.reshape(k, 2)
+    big = 134217728
+    z = special.ndtri((np.floor(big * u[:, 0]) + u[:, 1]) / big)
+    z.flags.writeable = False
+    return z
+
+def max_r2(prevalence=np.nan, rate=np.nan, meanfup=np.nan):
+    """Largest attainable Cox-Snell R-squared (binary from prevalence, survival from rate x meanfup)."""
+    p = np.asarray(prevalence, dtype=float)
+    e = np.asarray(rate, dtype=float) * np.asarray(meanfup, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        binary = p * np.log(p) + (1 - p) * np.log(1 - p)
+        survival = e * np.log(e) - e
+    return 1 - np.exp(2 * np.where(np.isnan(p), survival, binary))
+
+def cstat_to_r2(cstatistic, prevalence, seed=None):
+    """Cox-Snell R-squared of a logistic model with this C statistic.
+
+    As pmsampsize: events' and non-events' LPs are N(sqrt(2) qnorm(C), 1)
+    and N(0, 1), so R-squared is 1 - exp(-2 I(Y; LP)). With a seed, it is
+    computed as pmsampsize does, from a logistic fit to SIMOBS simulated
+    LPs; without one, by quadrature.
+    """
+    if seed is not None:
+        c, p = np.broadcast_arrays(np.asarray(cstatistic, dtype=float), np.asarray(prevalence, dtype=float))
+        out = np.full(c.shape, np.nan)
+        given = ~np.isnan(c)
+        if given.any():
+            out[given] = _simulated_r2(c[given], p[given], seed)
+        return out
+    c, p = _col(cstatistic), _col(prevalence)
+    z = stats.norm.ppf(_u())
+    mu = np.sqrt(2) * stats.norm.ppf(c)
+    # log density ratio of event vs non-event LP at x: mu x - mu^2 / 2
+    def log_mix(x):
+        return np.logaddexp(np.log(p) + mu * x - mu * mu / 2, np.log1p(-p))
+    info = p * (mu * (z + mu) - mu * mu / 2 - log_mix(z + mu)).mean(axis=-1, keepdims=True) \
+        + (1 - p) * (-log_mix(z)).mean(axis=-1, keepdims=True)
+    return (1 - np.exp(-2 * info))[..., 0]
+
+def _simulated_r2(c, p, seed, chunk=8):
+    """pmsampsize's cstat2rsq for 1-d arrays c, p: one logistic fit per distinct (c, p), chunk sets at a time.
+
+    rnorm(p n) non-events, then rnorm((1 - p) n) + mu events, all from the
+    same draws; lrm's Nagelkerke R-squared times the maximum Cox-Snell
+    R-squared. The fits share one Newton loop, started at the LDA log-odds
+    (intercept log odds - mu^2 / 2, slope mu) and iterated until every set's
+    step is below 1e-10. An event's LP is z + mu, so every sum over LPs is a
+    sum over the shared draws z (one matrix-vector product for the chunk)
+    plus an event-only correction.
+    """
+    pairs, inverse = np.unique(np.column_stack([c, p]), axis=0, return_inverse=True)
+    out = np.empty(len(pairs))
+    z = r_normals(seed, SIMOBS)
+    zz = z * z
+    for i in range(0, len(pairs), chunk):
+        ci, pi = pairs[i:i + chunk, 0], pairs[i:i + chunk, 1]
+        n0, n1 = (pi * SIMOBS).astype(int), ((1 - pi) * SIMOBS).astype(int)
+        k, n = len(ci), n0 + n1
+        mu = np.sqrt(2) * stats.norm.ppf(ci)
+        # Event-only sums of the draws: sum z and sum z^2 over rows n0 .. n - 1
+        ez = np.array([z[a:b].sum() for a, b in zip(n0, n)])
+        ezz = np.array([zz[a:b].sum() for a, b in zip(n0, n)])
+        b0, b1 = np.log(n1 / n0) - mu * mu / 2, mu.copy()
+        eta = np.empty((k, SIMOBS))
+        for _ in range(50):
+            np.multiply.outer(b1, z, out=eta)
+            eta += b0[:, None]
+            for j in range(k):
+                eta[j, n0[j]:] += b1[j] * mu[j]
+                eta[j, n[j]:] = -np.inf  # rows past n0 + n1 (int() rounding) weigh nothing
+            f = special.expit(eta)
+            w = f - f * f
+            # (sum, sum z) of w and f over all rows, and over events only
+            sw, swz, swzz, sf, sfz = w.sum(axis=1), w @ z, w @ zz, f.sum(axis=1), f @ z
+            ew = np.array([w[j, n0[j]:].sum() for j in range(k)])
+            ewz = np.array([w[j, n0[j]:] @ z[n0[j]:] for j in range(k)])
+            ef = np.array([f[j, n0[j]:].sum() for j in range(k)])
+            h00, h01 = sw, swz + mu * ew
+            h11 = swzz + 2 * mu * ewz + mu * mu * ew
+            g0 = n1 - sf
+            g1 = (ez + mu * n1) - (sfz + mu * ef)
+            det = h00 * h11 - h01 * h01
+            step0, step1 = (h11 * g0 - h01 * g1) / det, (h00 * g1 - h01 * g0) / det
+            b0, b1 = b0 + step0, b1 + step1
+            if max(np.abs(step0).max(), np.abs(step1).max()) < 1e-10:
+                break
+        # log-likelihood: log expit(eta) for events, log expit(-eta) for non-events
+        np.multiply.outer(b1, z, out=eta)
+        eta += b0[:, None]
+        loglik = np.empty(k)
+        for j in range(k):
+            events = eta[j, n0[j]:n[j]] + b1[j] * mu[j]
+            loglik[j] = special.log_expit(events).sum() + special.log_expit(-eta[j, :n0[j]]).sum()
+        ybar = n1 / n
+        null = n * (ybar * np.log(ybar) + (1 - ybar) * np.log1p(-ybar))
+        nagelkerke = (1 - np.exp(-2 * (loglik - null) / n)) / (1 - np.exp(2 * null / n))
+        out[i:i + chunk] = nagelkerke * max_r2(pi)
+    return out[inverse.ravel()]
+
+def shrinkage_n(parameters, r2, shrinkage):
+    """n at which the expected uniform shrinkage is `shrinkage` (criterion 1, and 2 via its S)."""
+    return parameters / ((shrinkage - 1) * np.log(1 - r2 / shrinkage))
+
+def smallest_n(ok, lo, hi):
+    """Elementwise smallest integer n in [lo, hi] with ok(n), for ok monotone in n; hi if none."""
+    lo, hi = np.asarray(lo, dtype=float) - 1, np.asarray(hi, dtype=float)
+    while np.any(hi - lo > 1):
+        open_ = hi - lo > 1
+        mid = np.floor((lo + hi) / 2)
+        good = ok(mid)
+        hi = np.where(open_ & good, mid, hi)
+        lo = np.where(open_ & ~good, mid, lo)
+    return hi
+
+def binding(criteria):
+    """(final n, name of the binding criterion) for {name: n array}; the first name wins ties."""
+    names = list(criteria)
+    table = np.stack([np.broadcast_to(criteria[k], np.broadcast(*criteria.values()).shape) for k in names])
+    order = np.nan_to_num(table, nan=-1).argmax(axis=0)
+    return table.max(axis=0), np.array(names)[order]
+
+def pmsampsize(type, parameters, shrinkage=0.9, prevalence=np.nan, rate=np.nan, timepoint=np.nan, meanfup=np.nan,
+               rsquared=np.nan, csrsquared=np.nan, nagrsquared=np.nan, cstatistic=np.nan, intercept=np.nan,
+               sd=np.nan, mmoe=1.1, seed=R_SEED):
+    """Minimum development sample size; one model type per call, other arguments broadcast.
+
+    seed only matters for cstatistic; None uses the quadrature conversion.
+    """
+    P, S = np.asarray(parameters, dtype=float), np.asarray(shrinkage, dtype=float)
+    out = {}
+    if type == 'c':
+        r2 = np.asarray(rsquared, dtype=float)
+
+        def expected_shrinkage(n):
+            apparent = (r2 * (n - P - 1) + P) / (n - 1)
+            return 1 + (P - 2) / (n * np.log(1 - apparent))
+
+        def residual_mmoe(n):
+            df = n - P - 1
+            return np.maximum(np.sqrt(df / stats.chi2.ppf(0.025, df)), np.sqrt(stats.chi2.ppf(0.975, df) / df))
+
+        top = np.full(np.broadcast(P, r2, S).shape, 1e7)
+        n1 = smallest_n(lambda n: expected_shrinkage(n) >= S, P + 2, top)
+        n2 = _ceil(1 + P * (1 - r2) / R2_DELTA)
+        n3 = smallest_n(lambda n: residual_mmoe(n) <= RESIDUAL_MMOE, P + 2, top)
+        start = np.maximum(np.maximum(n1, n2), n3)
+        b0, sd = np.asarray(intercept, dtype=float), np.asarray(sd, dtype=float)
+
+        def intercept_ok(n):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return (b0 + stats.t.isf(0.025, n - P - 1) * np.sqrt(sd ** 2 * (1 - r2) / n)) / b0 <= mmoe
+        # pmsampsize steps once past max(n1, n2, n3) when the intercept is 0
+        n4 = np.where(b0 == 0, start + 1, smallest_n(intercept_ok, start, np.maximum(top, start)))
+        out['criteria'] = {'shrinkage': n1, 'optimism': n2, 'residual_variance': n3, 'intercept': n4}
+        out['r2'] = r2
+    else:
+        biggest = max_r2(prevalence, rate, meanfup) if type == 'b' else max_r2(rate=rate, meanfup=meanfup)
+        r2 = np.asarray(csrsquared, dtype=float)
+        if type == 'b':
+            r2 = np.where(np.isnan(r2), np.asarray(nagrsquared, dtype=float) * biggest, r2)
+            missing = np.isnan(r2) & ~np.isnan(np.asarray(cstatistic, dtype=float))
+            if np.any(missing):
+                r2 = np.where(missing, cstat_to_r2(cstatistic, prevalence, seed), r2)
+        else:
+            r2 = np.where(np.isnan(r2), np.asarray(nagrsquared, dtype=float) * biggest, r2)
+        n1 = _ceil(shrinkage_n(P, r2, S))
+        s2 = r2 / (r2 + R2_DELTA * biggest)
+        n2 = _ceil(shrinkage_n(P, r2, s2))
+        if type == 'b':
+            p = np.asarray(prevalence, dtype=float)
+            n3 = _ceil((Z / RISK_MARGIN) ** 2 * p * (1 - p))
+        else:
+            # Reported, not imposed: pmsampsize prints the overall-risk CI at max(n1, n2)
+            n3 = np.maximum(n1, n2)
+        out['criteria'] = {'shrinkage': n1, 'optimism': n2, 'overall_risk': n3}
+        out['r2_cs'], out['max_r2'] = r2, biggest
+
+    n, binds = binding(out['criteria'])
+    out['sample_size'], out['binding_criterion'] = n, binds
+    if type == 'b':
+        out['events'] = _ceil(n * np.asarray(prevalence, dtype=float))
+        out['epp'] = n * np.asarray(prevalence, dtype=float) / P
+    elif type == 's':
+        events = n * np.asarray(rate, dtype=float) * np.asarray(meanfup, dtype=float)
+        out['events'] = np.round(events)
+        out['epp'] = events / P
+    else:
+        out['spp'] = n / P
+    return out
+
+def _lp_moments(lp, threshold):
+    """Calibration-slope information (I_a, I_ab, I_b) and the sensitivity / specificity at
+    threshold of LP samples, one row per parameter set."""
+    p = special.expit(lp)
+    w = p * (1 - p)
+    above = p > threshold[:, None]
+    return (w.mean(axis=1), (w * lp).mean(axis=1), (w * lp * lp).mean(axis=1),
+            (p * above).mean(axis=1) / p.mean(axis=1), ((1 - p) * ~above).mean(axis=1) / (1 - p).mean(axis=1))
+
+def _lp_stats(lpnormal, lpbeta, threshold, seed, simobs, chunk=4):
+    """_lp_moments of each parameter set's LP distribution: N(mean, sd) where lpnormal is given,
+    else logit(Beta(a, b)).
+
+    Normal LPs use R's draws when seed is set (mean + sd * the same rnorm
+    stream for every set, as pmvalsampsize); beta LPs and seed=None use the
+    quantile grid.
+    """
+    mean, sd, a, b, t = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (*lpnormal, *lpbeta, threshold)))
+    shape = mean.shape
+    mean, sd, a, b, t = (x.ravel() for x in (mean, sd, a, b, t))
+    out = np.full((5, mean.size), np.nan)
+    simulated = ~np.isnan(mean) if seed is not None else np.zeros(mean.size, dtype=bool)
+    rows = np.flatnonzero(~simulated)
+    if rows.size:
+        u = _u()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            beta = stats.beta.ppf(u, np.nan_to_num(a[rows, None], nan=1), np.nan_to_num(b[rows, None], nan=1))
+            lp = np.where(np.isnan(mean[rows, None]), np.log(beta) - np.log1p(-beta),
+                          mean[rows, None] + sd[rows, None] * stats.norm.ppf(u))
+        out[:, rows] = _lp_moments(lp, t[rows])
+    rows = np.flatnonzero(simulated)
+    if rows.size:
+        z = r_normals(seed, int(simobs))
+        for i in range(0, rows.size, chunk):
+            part = rows[i:i + chunk]
+            out[:, part] = _lp_moments(mean[part, None] + sd[part, None] * z, t[part])
+    return [x.reshape(shape) for x in out]
+
+def _se_for_width(half):
+    """pmvalsampsize's target SE: the first multiple of SE_STEP giving at least the CI half-width."""
+    return _ceil(half / SE_STEP) * SE_STEP
+
+def pmvalsampsize(type='b', prevalence=np.nan, cstatistic=np.nan, lpnormal=(np.nan, np.nan),
+                  lpbeta=(np.nan, np.nan), oe=1.0, oeciwidth=0.2, cslope=1.0, csciwidth=0.2, cstatciwidth=0.1,
+                  threshold=np.nan, sensitivity=np.nan, specificity=np.nan, nbciwidth=0.2, seed=R_SEED,
+                  simobs=SIMOBS):
+    """Minimum external validation sample size (binary outcome); arguments broadcast.
+
+    cslope does not enter the calibration-slope criterion: like pmvalsampsize,
+    the information matrix is taken at the perfectly calibrated model.
+    seed=None takes every LP expectation over the quantile grid.
+    """
+    if type != 'b':
+        raise ValueError('only type="b" is supported')
+    phi, c = np.asarray(prevalence, dtype=float), np.asarray(cstatistic, dtype=float)
+
+    se_oe = _se_for_width(np.arcsinh(np.asarray(oeciwidth) / (2 * np.asarray(oe))) / Z)
+    n_oe = _ceil((1 - phi) / (phi * se_oe ** 2))
+
+    t = np.asarray(threshold, dtype=float)
+    i_a, i_ab, i_b, lp_sens, lp_spec = _lp_stats(lpnormal, lpbeta, t, seed, simobs)
+    se_cs = np.asarray(csciwidth) / (2 * Z)
+    n_cs = _ceil(i_a / (se_cs ** 2 * (i_a * i_b - i_ab ** 2)))
+
+    # Newcombe's variance of C: var * N^2 phi (1-phi) = C(1-C)(1 + (N/2 - 1)k), solved for N
+    se_c = np.asarray(cstatciwidth) / (2 * Z)
+    k = (1 - c) / (2 - c) + c / (1 + c)
+    a, b0 = se_c ** 2 * phi * (1 - phi), c * (1 - c)
+    n_c = _ceil((b0 * k / 2 + np.sqrt((b0 * k / 2) ** 2 + 4 * a * b0 * (1 - k))) / (2 * a))
+
+    criteria = {'oe_ratio': n_oe, 'calibration_slope': n_cs, 'c_statistic': n_c}
+    out = {'se_oe': se_oe, 'se_cslope': se_cs, 'se_cstat': se_c}
+    if not np.all(np.isnan(t)):
+        sens = np.asarray(sensitivity, dtype=float)
+        spec = np.asarray(specificity, dtype=float)
+        sens = np.where(np.isnan(sens), lp_sens, sens)
+        spec = np.where(np.isnan(spec), lp_spec, spec)
+        odds = (1 - phi) / phi * t / (1 - t)
+        se_nb = np.asarray(nbciwidth) / (2 * Z)
+        var = sens * (1 - sens) / phi + odds ** 2 * spec * (1 - spec) / (1 - phi) \
+            + odds ** 2 * (1 - spec) ** 2 / (phi * (1 - phi))
+        criteria['net_benefit'] = np.where(np.isnan(t), np.nan, _ceil(var / se_nb ** 2))
+        out['sensitivity'], out['specificity'] = sens, spec
+    n, binds = binding(criteria)
+    out.update(criteria=criteria, sample_size=n, binding_criterion=binds, events=_ceil(n * phi))
+    return out
+
+def hanley_mcneil(cstatistic, prevalence, ciwidth):
+    """C-statistic validation size from the Hanley-McNeil variance."""
+    c, p = np.asarray(cstatistic, dtype=float), np.asarray(prevalence, dtype=float)
+    q1, q2 = c / (2 - c), 2 * c ** 2 / (1 + c)
+    n = _ceil(((q1 - c ** 2) / (1 - p) + (q2 - c ** 2) / p) / (np.asarray(ciwidth) / (2 * Z)) ** 2)
+    return {'criteria': {'c_statistic': n}, 'sample_size': n, 'binding_criterion': np.array(['c_statistic']),
+            'events': _ceil(n * p)}
+
+R_CALL = re.compile(r'\b(pmsampsize|pmvalsampsize)\s*\(((?:[^()]|\([^()]*\))*)\)')
+R_ARG = re.compile(r'\s*([\w.]+)\s*=\s*(c\([^()]*\)|"[^"]*"|\'[^\']*\'|[^,]+)\s*(?:,|$)')
+
+def _r_value(text):
+    text = text.strip()
+    if text.startswith('c('):
+        return tuple(_r_value(x) for x in text[2:-1].split(','))
+    if text[:1] in '\'"':
+        return text[1:-1]
+    if text in ('TRUE', 'FALSE'):
+        return text == 'TRUE'
+    return float(text)
+
+def parse_call(code):
+    """(function, {argument: value}) of the first pmsampsize/pmvalsampsize call in R code, else None."""
+    m = R_CALL.search(code or '')
+    if m is None:
+        return None
+    return m.group(1), {k: _r_value(v) for k, v in R_ARG.findall(m.group(2))}
+
+def task_call(task):
+    """(function, arguments) reproducing a tier-4 task, or None if it is not covered."""
+    parsed = parse_call(task.get('reference_code'))
+    if parsed:
+        return None if 'lpcstat' in parsed[1] else parsed
+    gt = task.get('ground_truth', {})
+    if gt.get('criteria') == 'hanley_mcneil_validation':
+        return 'hanley_mcneil', {'cstatistic': gt['expected_c_statistic'], 'prevalence': gt['prevalence'],
+                                 'ciwidth': gt['ci_width']}
+    return None
+
+FUNCTIONS = {'pmsampsize': pmsampsize, 'pmvalsampsize': pmvalsampsize, 'hanley_mcneil': hanley_mcneil}
+
+def evaluate(calls):
+    """Evaluate [(function, arguments)] with one vectorised call per (function, type, argument set).
+
+    Returns one {criteria, sample_size, binding_criterion, events, ...} of plain values per call.
+    """
+    groups = {}
+    for i, (fn, args) in enumerate(calls):
+        groups.setdefault((fn, args.get('type'), tuple(sorted(args))), []).append((i, args))
+    results = [None] * len(calls)
+    for (fn, type_, names), members in groups.items():
+        columns = {}
+        for name in names:
+            if name == 'type':
+                continue
+            values = [args[name] for _, args in members]
+            columns[name] = tuple(np.array(v, dtype=float) for v in zip(*values)) \
+                if isinstance(values[0], tuple) else np.array(values, dtype=float)
+        kwargs = dict(columns, type=type_) if type_ is not None else columns
+        out = FUNCTIONS[fn](**kwargs)
+        for j, (i, _) in enumerate(members):
+            results[i] = {key: ({k: _item(v, j) for k, v in value.items()} if isinstance(value, dict)
+                                else _item(value, j)) for key, value in out.items()}
+    return results
+
+def _item(x, j):
+    x = np.asarray(x)
+    value = x.item() if x.ndim == 0 else x[j].item() if x.shape[0] > j else x[-1].item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def validate(tasks):
+    """Compare every covered task's stored sample size, events, binding criterion and
+    per-criterion sizes with the engine's."""
+    covered = [(task, task_call(task)) for task in tasks]
+    covered = [(task, call) for task, call in covered if call]
+    rows = []
+    for (task, call), result in zip(covered, evaluate([call for _, call in covered])):
+        gt, tol = task['ground_truth'], task.get('tolerance', {})
+        checks = []
+        for field in ('sample_size', 'events'):
+            if gt.get(field) is not None and field in result:
+                checks.append((field, result[field], gt[field], tol.get(field, 0)))
+        if gt.get('binding_criterion'):
+            checks.append(('binding_criterion', result['binding_criterion'], gt['binding_criterion'], None))
+        stored = gt.get('criteria_sample_sizes') or {}
+        # Stored criteria are labelled 'Criteria 1', 'Criteria 2 - C-slope', ...; R prints them in our order
+        for label, (name, n) in zip(stored, result['criteria'].items()):
+            checks.append((name, n, stored[label], tol.get('sample_size', 0)))
+        bad = [c for c in checks if (c[1] != c[2] if c[3] is None else abs(c[1] - c[2]) > c[3])]
+        rows.append({'id': task['id'], 'function': call[0], 'result': result, 'checks': checks, 'bad': bad,
+                     'pass': not bad})
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--tasks', default=TASKS_FILE, help='task file (JSON array, tier file or JSONL)')
+    parser.add_argument('--verbose', action='store_true', help='print every task, not just mismatches')
+    args = parser.parse_args()
+
+    tasks = [t for t in iter_tasks(args.tasks) if t.get('tier') in (4, '4')]
+    start = time.perf_counter()
+    rows = validate(tasks)
+    elapsed = time.perf_counter() - start
+
+    bad = [r for r in rows if not r['pass']]
+    for r in rows if args.verbose else bad:
+        res = r['result']
+        crit = ' '.join(f'{k}={v}' for k, v in res['criteria'].items())
+        print(f'  {"ok  " if r["pass"] else "FAIL"} {r["id"]:<34} n={res["sample_size"]:<6} '
+              f'binds={res["binding_criterion"]:<17} [{crit}]')
+        for name, got, want, tol in r['bad']:
+            print(f'       {name}: {got} vs stored {want}' + (f' (±{tol})' if tol is not None else ''))
+    print(f'\n=== GROUND TRUTH CHECK ({args.tasks}, tier 4) ===')
+    print(f'Covered tasks: {len(rows)}/{len(tasks)} | Reproduced: {len(rows) - len(bad)} | '
+          f'Mismatched: {len(bad)} | {1000 * elapsed:.0f} ms')
+    sys.exit(1 if bad else 0)
+
+if __name__ == '__main__':
+    main()
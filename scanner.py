@@ -0,0 +1,265 @@
+"""Precompiled pattern table shared by the regex extractors.
+
+Every extraction pattern used by extract_values.py, smart_extract.py and
+smart_extract2.py is compiled once here at import time. A pattern also
+carries a few literal "needles": if none of them occurs in the lower-cased
+response, the pattern cannot match and is skipped without running the regex.
+
+A Scan wraps one response. It lower-cases the text at most once, checks each
+needle at most once, and caches every pattern's matches, so the extractors
+never rescan the text for a pattern they have already run. Scan.lex is the
+response's number/keyword token stream (see lexer.py), built on first use.
+While pattern_profile is enabled, Scan also reports every regex it runs.
+
+Every pattern runs in linear time (see REACH below), and a Scan also has a
+scan budget: once its regexes have been run over SCAN_BUDGET characters in
+all, patterns not yet run search only the last TAIL_CHARS characters, where
+a response states its final answer, so an outsized response degrades to a
+tail scan instead of holding up a worker. The budget counts characters, not
+seconds, so the same response always gives the same answer. A Scan also
+cuts every digit run after MAX_NUMBER characters (the rest becomes '#', so
+offsets do not move): no answer is that long, and int() of a very long run
+is slow or refused outright.
+"""
+import re
+import time
+from collections import namedtuple
+
+import pattern_profile
+from lexer import Lexed, same_length_lower
+
+Pattern = namedtuple('Pattern', ['name', 'regex', 'needles', 'lower'])
+
+SCAN_BUDGET = 2000000
+TAIL_CHARS = 20000
+MAX_NUMBER = 24
+LONG_NUMBER = re.compile(r'\d[\d,]{%d,}' % MAX_NUMBER)
+
+def cap_numbers(text):
+    """text with every digit/comma run cut to MAX_NUMBER characters, the rest replaced by '#'."""
+    if LONG_NUMBER.search(text) is None:
+        return text
+    return LONG_NUMBER.sub(lambda m: m.group(0)[:MAX_NUMBER] + '#' * (m.end() - m.start() - MAX_NUMBER), text)
+
+PATTERNS = {}
+
+# Every pattern must run in time linear in the text (bench_patterns.py checks):
+# - a gap between a keyword and its number is bounded by REACH characters
+#   (an unbounded `.*?` or `[^.]*?` rescans the rest of the line or sentence
+#   from every keyword occurrence);
+# - a pattern that opens with a digit run starts only at the start of the
+#   run: \d(?<!\d\d), plus (?<!\d,\d) for [\d,] runs. A match starting inside
+#   a run always comes after one starting at the run's start, so this only
+#   saves the rescans. The guard follows the first digit so that the regex
+#   engine keeps its fast scan for the first character;
+# - a decimal is (?:\d*\.)?\d+ or \d+(?:\.\d+)?, not the ambiguous [0-9]*\.?[0-9]+.
+REACH = 300
+GAP = r'.{0,%d}?' % REACH
+SENTENCE_GAP = r'[^.]{0,%d}?' % REACH
+LINE_REST = r'.{0,%d}' % REACH
+BOXED_BODY = r'[^}]{0,%d}' % REACH
+
+def _p(name, regex, needles=(), flags=0, lower=False):
+    """Register a pattern. `lower` patterns run against the lower-cased text."""
+    PATTERNS[name] = Pattern(name, re.compile(regex, flags), tuple(needles), lower)
+
+# --- extract_values.py (run on the lower-cased text, like the original) ---
+_p('ev_power_eq', r'power' + SENTENCE_GAP + r'[=:≈]\s*((?:\d*\.)?\d+)', ['power'], lower=True)
+_p('ev_power_pct', r'(\d(?<!\d\d)\d*(?:\.\d+)?|\.(?<!\d\.)\d+)\s*%?\s*power', ['power'], lower=True)
+_p('ev_detectable', r'detectable' + SENTENCE_GAP + r'[=:≈]\s*((?:\d*\.)?\d+)', ['detectable'], lower=True)
+_p('ev_d_eq', r'd\s*[=:≈]\s*((?:\d*\.)?\d+)', ['d'], lower=True)
+_p('ev_per_group', r'(\d(?<!\d\d)\d*)\s*(?:per\s*group|per\s*arm|subjects?\s*per\s*group|participants?\s*per\s*group)',
+   ['per'], lower=True)
+_p('ev_generic', r'(?:sample\s*size|n|subjects?)\s*[=:≈]\s*(\d+)', ['=', ':', '≈'], lower=True)
+_p('ev_count', r'(\d(?<!\d\d)\d*)\s*(?:participants?|subjects?|patients?|observations?|individuals?)',
+   ['participant', 'subject', 'patient', 'observation', 'individual'], lower=True)
+_p('ev_total', r'total' + SENTENCE_GAP + r'(\d+)', ['total'], lower=True)
+_p('ev_bold', r'\*\*(\d+)\*\*', ['**'])
+_p('ev_need', r'(?:need|require|approximately|about|roughly|at\s*least|minimum\s*of)\s*(\d+)',
+   ['need', 'require', 'approximately', 'about', 'roughly', 'at', 'minimum'], lower=True)
+_p('ev_clusters', r'(\d(?<!\d\d)\d*)\s*(?:clusters?\s*per\s*arm|clusters?\s*per\s*group)', ['cluster'], lower=True)
+_p('ev_per_cell', r'(\d(?<!\d\d)\d*)\s*(?:per\s*cell|observations?\s*per\s*cell)', ['cell'], lower=True)
+_p('ev_events', r'(\d(?<!\d\d)\d*)\s*(?:events?|event\s*count)', ['event'], lower=True)
+_p('ev_any', r'\b(\d+)\b')
+
+# Sample-size categories in the order extract_values reports them
+EV_SAMPLE_SIZE = [
+    ('per_group', 'ev_per_group'),  # "n = XX per group" or "XX per group"
+    ('generic', 'ev_generic'),      # "n = XX" or "sample size = XX"
+    ('count', 'ev_count'),          # "XX participants" / "XX subjects" / "XX patients"
+    ('total', 'ev_total'),          # "total of XX" or "total sample size of XX"
+    ('bold', 'ev_bold'),            # bold/emphasized numbers (** XX **)
+    ('need', 'ev_need'),            # "need XX" or "require XX"
+    ('clusters', 'ev_clusters'),    # clusters per arm
+    ('per_cell', 'ev_per_cell'),    # per cell
+    ('events', 'ev_events'),        # events needed
+]
+
+# --- smart_extract.py (case-insensitive unless noted) ---
+I = re.IGNORECASE
+_p('se_power_is', r'power\s*(?:is|=|:|-|≈|of|would be|comes? (?:out|to))\s*(?:approximately?\s*)?(?:about\s*)?(?:roughly\s*)?(\d+\.\d+|0\.\d+)',
+   ['power'], I)
+_p('se_power_achieve', r'(?:achieve|obtain|attain|reach|yield|get|have)\s+(?:a\s+)?power\s+(?:of\s+)?(\d+\.\d+|0\.\d+)', ['power'], I)
+_p('se_power_approx', r'power\s*(?:≈|\\approx)\s*(\d+\.\d+|0\.\d+)', ['power'], I)
+_p('se_power_suffix', r'(\d(?<!\d\d)\d*\.\d+|0\.\d+)\s*(?:power|statistical power)', ['power'], I)
+_p('se_power_bold_before', r'\*\*(\d+(?:\.\d+)?%?)\*\*' + LINE_REST + r'power', ['power'], I)
+_p('se_power_bold_after', r'power' + LINE_REST + r'\*\*(\d+(?:\.\d+)?%?)\*\*', ['power'], I)
+_p('se_power_pct', r'(\d{1,3})\s*%\s*(?:power|statistical power)', ['power'], I)
+SE_POWER = ['se_power_is', 'se_power_achieve', 'se_power_approx', 'se_power_suffix',
+            'se_power_bold_before', 'se_power_bold_after']
+
+_p('se_effect_detectable', r'detectable' + GAP + r'(?:d|effect)\s*(?:=|:|-|≈|is)\s*(\d+\.\d+)', ['detectable'], I)
+_p('se_effect_d', r'd\s*(?:=|:)\s*(\d+\.\d+)', ['d'], I)
+SE_EFFECT = ['se_effect_detectable', 'se_effect_d']
+
+_p('se_events_needed', r'(\d(?<!\d\d)(?<!\d,\d)[\d,]*)\s*(?:total\s+)?events?\s*(?:needed|required|necessary)', ['event'], I)
+_p('se_events_need', r'(?:need|require)\s*(\d[\d,]*)\s*events?', ['event'], I)
+_p('se_events_eq', r'events?\s*(?:needed|required|=|:)\s*(\d[\d,]*)', ['event'], I)
+_p('se_events_bold_before', r'\*\*(\d[\d,]*)\*\*\s*(?:total\s+)?events?', ['event'], I)
+_p('se_events_bold_after', r'events?' + LINE_REST + r'\*\*(\d[\d,]*)\*\*', ['event'], I)
+SE_EVENTS = ['se_events_needed', 'se_events_need', 'se_events_eq', 'se_events_bold_before',
+             'se_events_bold_after']
+
+_p('se_bold_per_group', r'\*\*(\d[\d,]*)\*\*\s*(?:participants?|subjects?|patients?|per group|per arm|each group|in each)',
+   ['**'], I)
+_p('se_per_group', r'(\d(?<!\d\d)(?<!\d,\d)[\d,]*)\s*(?:per group|per arm|each group|in each group|subjects? per group|participants? per group|patients? per group)',
+   ['per group', 'per arm', 'each group'], I)
+_p('se_n_per', r'n\s*(?:=|:)\s*(\d[\d,]*)\s*(?:per|each|in each)', ['=', ':'], I)
+_p('se_total_before', r'(?:total|overall|combined|altogether)\s*(?:sample\s*(?:size)?\s*)?(?:of\s*)?(?:=|:|-|≈|is)?\s*(\d[\d,]*)',
+   ['total', 'overall', 'combined', 'altogether'], I)
+_p('se_total_after', r'(\d(?<!\d\d)(?<!\d,\d)[\d,]*)\s*(?:total|in total|overall|altogether)', ['total', 'overall', 'altogether'], I)
+_p('se_n_twice', r'N\s*(?:=|:)\s*2\s*[×x*]\s*(\d[\d,]*)\s*=\s*(\d[\d,]*)', ['='], I)
+_p('se_bold', r'\*\*(\d[\d,]*)\*\*', ['**'])
+_p('se_need', r'(?:need|require|recommend|sample size (?:of|is|=|:))\s*(\d[\d,]*)',
+   ['need', 'require', 'recommend', 'sample size'], I)
+_p('se_per_cell', r'(\d(?<!\d\d)(?<!\d,\d)[\d,]*)\s*(?:per cell|per condition|per group)', ['per cell', 'per condition', 'per group'], I)
+_p('se_cluster_per', r'(\d(?<!\d\d)(?<!\d,\d)[\d,]*)\s*(?:clusters?|sites?|groups?)\s*(?:per|in each|per arm)',
+   ['cluster', 'site', 'group'], I)
+_p('se_cluster_eq', r'(?:clusters?|sites?)\s*(?:=|:)\s*(\d[\d,]*)', ['cluster', 'site'], I)
+_p('se_any', r'(?<!\.)\b(\d[\d,]{0,6})\b(?!\.\d)')
+
+# --- smart_extract2.py ---
+_p('s2_power_eq', r'power\s*(?:=|\u2248|:)\s*(0\.\d+)', ['power'], I)
+_p('s2_bold_decimal', r'\*\*(0\.\d+)\*\*', ['**'], I)
+_p('s2_boxed_decimal', r'\\boxed\{' + BOXED_BODY + r'(0\.\d+)', ['\\boxed'], I)
+_p('s2_power_suffix', r'(0\.\d+)\s*(?:\(|power)', ['(', 'power'], I)
+_p('s2_percent', r'(\d(?<!\d\d)\d*(?:\.\d+)?)\s*%', ['%'])
+S2_POWER = ['s2_power_eq', 's2_bold_decimal', 's2_boxed_decimal', 's2_power_suffix']
+
+_p('s2_d_eq', r'd\s*(?:=|\u2248)\s*(0\.\d+)', ['d'], I)
+_p('s2_effect_eq', r'(?:effect|MDES?|detectable)' + GAP + r'(?:=|\u2248|:)\s*(0\.\d+)', ['effect', 'mde', 'detectable'], I)
+_p('s2_approx_decimal', r'\u2248\s*(0\.\d+)', ['\u2248'], I)
+S2_EFFECT = ['s2_d_eq', 's2_effect_eq', 's2_boxed_decimal', 's2_bold_decimal', 's2_approx_decimal']
+
+_p('s2_events_count', r'(\d(?<!\d\d)(?<!\d,\d)[\d,]*)\s*events', ['event'], I)
+_p('s2_events_eq', r'events\s*(?:=|:)\s*(\d[\d,]*)', ['event'], I)
+S2_EVENTS = ['s2_events_count', 's2_events_eq']
+
+_p('s2_bold_n_per', r'\*\*\s*(?:n\s*=\s*)?(\d[\d,]*)\s*(?:\*\*)?\s*(?:per|participant|subject|each)', ['**'], I)
+_p('s2_n_per', r'n\s*=\s*(\d[\d,]*)\s*(?:per|participant|subject|each)', ['='], I)
+_p('s2_boxed', r'\\boxed\{' + BOXED_BODY + r'(\d[\d,]*)', ['\\boxed'])
+_p('s2_bold', r'\*\*(\d[\d,]*)\*\*', ['**'])
+_p('s2_n_eq', r'n\s*=\s*(\d[\d,]*)', ['='], I)
+S2_PER_GROUP = ['s2_bold_n_per', 's2_n_per']
+
+_p('s2_total_n_eq', r'N\s*(?:=|\u2248)\s*(\d[\d,]*)', ['=', '\u2248'], I)
+_p('s2_boxed_any_case', r'\\boxed\{' + BOXED_BODY + r'(\d[\d,]*)', ['\\boxed'], I)
+_p('s2_bold_total', r'\*\*(\d[\d,]*)\s*(?:total|patient|subject|sample)', ['**'], I)
+_p('s2_need_total', r'(?:need|require)' + GAP + r'(\d[\d,]*)\s*(?:total|patient|subject|sample)', ['need', 'require'], I)
+_p('s2_last_n', r'[nN]\s*(?:=|\u2248)\s*(\d[\d,]*)', ['=', '\u2248'])
+S2_TOTAL = ['s2_total_n_eq', 's2_boxed_any_case', 's2_bold_total', 's2_need_total']
+del I
+
+
+class Scan:
+    """One response's view of PATTERNS, with every result computed at most once."""
+    __slots__ = ('text', '_lower', '_present', '_hits', '_lex', '_pos', '_scanned')
+
+    def __init__(self, text):
+        self.text = cap_numbers(text)
+        self._lower = None
+        self._present = {}
+        self._hits = {}
+        self._lex = None
+        self._pos = 0
+        self._scanned = 0
+
+    @property
+    def lower(self):
+        if self._lower is None:
+            # Same length as text, so match offsets and the tail start mean the same in both
+            self._lower = same_length_lower(self.text)
+        return self._lower
+
+    @property
+    def lex(self):
+        if self._lex is None:
+            self._lex = Lexed(self.text, self.lower)
+        return self._lex
+
+    def possible(self, name):
+        """False when none of the pattern's needles occurs in the text."""
+        needles = PATTERNS[name].needles
+        if not needles:
+            return True
+        present = self._present
+        for n in needles:
+            hit = present.get(n)
+            if hit is None:
+                hit = present[n] = n in self.lower
+            if hit:
+                return True
+        return False
+
+    def _target(self, pat):
+        return self.lower if pat.lower else self.text
+
+    @property
+    def degraded(self):
+        """True once the scan budget is spent and patterns search only the tail."""
+        return self._pos > 0
+
+    def _run(self, pat, first):
+        """search() (first=True) or every match of a pattern, from the current start offset."""
+        target = self._target(pat)
+        profile = pattern_profile.active
+        start = time.perf_counter() if profile is not None else None
+        if first:
+            result = pat.regex.search(target, self._pos)
+        else:
+            result = list(pat.regex.finditer(target, self._pos))
+        # search() stops at its match, but may have run the whole text to find it; count it all
+        self._scanned += len(target) - self._pos
+        if self._scanned > SCAN_BUDGET and not self._pos and len(target) > TAIL_CHARS:
+            self._pos = len(target) - TAIL_CHARS
+        if profile is not None:
+            profile.ran(pat.name, time.perf_counter() - start, result is not None if first else len(result))
+        return result
+
+    def all(self, name):
+        """Every match of the pattern, in text order."""
+        hits = self._hits.get(name)
+        if hits is None:
+            if self.possible(name):
+                hits = self._run(PATTERNS[name], first=False)
+            else:
+                hits = []
+                if pattern_profile.active is not None:
+                    pattern_profile.active.skipped(name)
+            self._hits[name] = hits
+        return hits
+
+    def first(self, name):
+        """First match of the pattern, or None."""
+        hits = self._hits.get(name)
+        if hits is not None:
+            return hits[0] if hits else None
+        if not self.possible(name):
+            if pattern_profile.active is not None:
+                pattern_profile.active.skipped(name)
+            return None
+        return self._run(PATTERNS[name], first=True)
+
+    def collect(self, names):
+        """Matches for several patterns at once, keyed by pattern name."""
+        return {name: self.all(name) for name in names}
@@ -0,0 +1,295 @@
+"""Parallel Monte Carlo power for the mixed-model (simr-style) tasks.
+
+The simulation_simr and mixed_effects_lmm ground truths come from simr's
+powerSim, which is slow and not reproducible here. This engine simulates
+the same designs in NumPy:
+
+- nested: treatment at the top level of a balanced hierarchy of random
+  intercepts (subject / measurement, cluster / patient, site / patient /
+  measurement, school / classroom / student)
+- slopes: random intercept and slope per unit (subject or cluster), a
+  treatment-by-time effect on the slope, m observations per unit and time
+- crossover: AB/BA two-period crossover with a subject random intercept
+
+Replicates are generated and fitted in vectorised batches: one array holds
+every observation of a batch, and the fit reduces it along the within-unit
+axes. In these balanced designs the REML/Kenward-Roger test of the
+treatment effect is exactly a t-test on the unit-level estimates (unit
+means, unit OLS slopes or within-subject differences) with the
+between-unit degrees of freedom, so that is the test used.
+
+Batches run on a process pool. Batch b of a run draws from
+SeedSequence(seed, spawn_key=(b,)), and batches are consumed in fixed-size
+waves, so a result does not depend on the worker count. After every wave
+the Wilson interval on power is checked; the run stops once it is narrower
+than --ci-width (or, during a sample-size search, once it excludes the
+target power). Every power estimate of one task uses the same streams
+(common random numbers), which keeps the sample-size bisection stable.
+
+GLMM (binary outcome) and frailty survival tasks are not covered.
+
+    python simr_engine.py                   # validate against all_tasks.json
+    python simr_engine.py --tasks v2.2/tier3/tasks.json --workers 4 --verbose
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+from scipy import stats
+
+from task_index import iter_tasks
+
+TASKS_FILE = 'all_tasks.json'
+SEED = 20260201
+CI_WIDTH = 0.02
+MAX_SIMS = 20000
+BATCH_SIMS = 250
+BATCH_ELEMENTS = 2_000_000
+WAVE = 8
+MAX_UNITS = 4096
+Z95 = 1.959964
+
+def two_sample_t(a, b):
+    """Pooled-variance t statistics (and df) of a[r] vs b[r] for every replicate r."""
+    n1, n2 = a.shape[1], b.shape[1]
+    ss = a.var(axis=1, ddof=1) * (n1 - 1) + b.var(axis=1, ddof=1) * (n2 - 1)
+    df = n1 + n2 - 2
+    return (b.mean(axis=1) - a.mean(axis=1)) / np.sqrt(ss / df * (1 / n1 + 1 / n2)), df
+
+def nested(rng, reps, n, sizes, sds, effect):
+    """n top-level units per arm, sizes[i] level-(i+1) units inside each level-i unit.
+
+    sds has one SD per level, the last being the residual. The fit is a
+    t-test on top-level unit means.
+    """
+    shape = (reps, 2, n)
+    y = sds[0] * rng.standard_normal(shape)
+    for m, sd in zip(sizes, sds[1:]):
+        shape += (m,)
+        y = y[..., None] + sd * rng.standard_normal(shape)
+    y[:, 1] += effect
+    means = y.reshape(reps, 2, n, -1).mean(axis=3)
+    return two_sample_t(means[:, 0], means[:, 1])
+
+def slopes(rng, reps, n, m, times, sds, effect):
+    """n units per arm observed m times at each of times = 0, 1, ... time points.
+
+    sds are (intercept, slope, residual); arm 1's slope is raised by effect.
+    The fit is a t-test on the units' OLS slopes.
+    """
+    t = np.arange(times, dtype=float)
+    centred = t - t.mean()
+    intercept = sds[0] * rng.standard_normal((reps, 2, n, 1, 1))
+    slope = sds[1] * rng.standard_normal((reps, 2, n, 1, 1))
+    slope[:, 1] += effect
+    y = intercept + slope * t + sds[2] * rng.standard_normal((reps, 2, n, m, times))
+    fitted = (y * centred).sum(axis=(3, 4)) / (m * (centred ** 2).sum())
+    return two_sample_t(fitted[:, 0], fitted[:, 1])
+
+def crossover(rng, reps, n, sds, effect):
+    """n subjects alternating between sequences AB and BA; sds are (subject, residual).
+
+    The fit is a one-sample t-test on the treatment minus control differences.
+    """
+    y = sds[0] * rng.standard_normal((reps, n, 1)) + sds[1] * rng.standard_normal((reps, n, 2))
+    ab = np.arange(n) % 2 == 0
+    treated = np.where(ab, 0, 1)
+    y[:, np.arange(n), treated] += effect
+    diff = y[:, np.arange(n), treated] - y[:, np.arange(n), 1 - treated]
+    return diff.mean(axis=1) / (diff.std(axis=1, ddof=1) / math.sqrt(n)), n - 1
+
+DESIGNS = {'nested': nested, 'slopes': slopes, 'crossover': crossover}
+
+def elements(params):
+    """Observations per replicate."""
+    return 2 * params['n'] * math.prod(params.get('sizes', ())) * params.get('m', 1) * params.get('times', 1)
+
+def batch_size(params):
+    return max(1, min(BATCH_SIMS, BATCH_ELEMENTS // elements(params)))
+
+def _simulate_batch(job):
+    """Rejections in one batch of replicates."""
+    design, params, alpha, seed, batch, reps = job
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(batch,)))
+    t, df = DESIGNS[design](rng, reps, **params)
+    return int((2 * stats.t.sf(np.abs(t), df) < alpha).sum())
+
+def wilson(successes, trials, z=Z95):
+    """Wilson score interval (lo, hi)."""
+    p = successes / trials
+    centre = (p + z * z / (2 * trials)) / (1 + z * z / trials)
+    half = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / (1 + z * z / trials)
+    return centre - half, centre + half
+
+def estimate(design, params, alpha=0.05, seed=SEED, ci_width=CI_WIDTH, max_sims=MAX_SIMS, target=None, pool=None):
+    """Monte Carlo power: (power, (ci lo, ci hi), simulations run)."""
+    reps = batch_size(params)
+    rejected = sims = batch = 0
+    while True:
+        jobs = [(design, params, alpha, seed, batch + i, reps) for i in range(WAVE)]
+        batch += WAVE
+        rejected += sum(pool.map(_simulate_batch, jobs) if pool else map(_simulate_batch, jobs))
+        sims += reps * WAVE
+        lo, hi = wilson(rejected, sims)
+        if hi - lo <= ci_width or sims >= max_sims or (target is not None and not lo <= target <= hi):
+            return rejected / sims, (lo, hi), sims
+
+def vary(params, key, value):
+    """params with key set to value; key 'sizes' sets the innermost cluster size."""
+    if key == 'sizes':
+        return dict(params, sizes=params['sizes'][:-1] + (value,))
+    return dict(params, **{key: value})
+
+def solve(design, params, key, target, start, minimum=2, **kw):
+    """Smallest integer value of params[key] whose estimated power reaches target, or None past MAX_UNITS.
+
+    Returns (value, {value: power} of every point evaluated).
+    """
+    seen = {}
+
+    def reaches(value):
+        seen[value] = estimate(design, vary(params, key, value), target=target, **kw)[0]
+        return seen[value] >= target
+
+    lo, hi = minimum - 1, max(start, minimum)
+    while not reaches(hi):
+        if hi >= MAX_UNITS:
+            return None, seen
+        lo, hi = hi, min(2 * hi, MAX_UNITS)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if reaches(mid):
+            hi = mid
+        else:
+            lo = mid
+    return hi, seen
+
+def _find(gt, *names):
+    """(field, value) of the first of names present in gt, bare or with a given_ prefix."""
+    for name in names:
+        for field in (name, f'given_{name}'):
+            if gt.get(field) is not None:
+                return field, gt[field]
+    return None, None
+
+def task_design(task):
+    """(design, params, search key, sample-size field) for a covered task, else None.
+
+    The field is None for tasks that give the design and ask for power.
+    """
+    gt = task.get('ground_truth', {})
+    if task.get('template') not in ('mixed_effects_lmm', 'simulation_simr') \
+            or any(k in gt for k in ('treatment_or', 'hazard_ratio')):
+        return None
+    value = lambda *names: _find(gt, *names)[1]
+    if 'within_subject_correlation' in gt:
+        rho = gt['within_subject_correlation']
+        field, n = _find(gt, 'subjects')
+        params = {'n': n, 'sds': (math.sqrt(rho), math.sqrt(1 - rho)), 'effect': gt['effect_size_d']}
+        return 'crossover', params, 'n', field
+    effect = value('slope_difference', 'slope_effect')
+    if effect is not None:
+        field, n = _find(gt, 'clusters_per_arm', 'subjects_per_group')
+        params = {'n': n, 'm': value('subjects_per_cluster') or 1, 'times': value('time_points', 'timepoints'),
+                  'sds': (gt['random_intercept_sd'], gt['random_slope_sd'], gt['residual_sd']), 'effect': effect}
+        return 'slopes', params, 'n', field
+    for (top, mid), levels in ((('site_icc', 'patient_icc'),
+                                ('sites_per_arm', 'patients_per_site', 'measurements_per_patient')),
+                               (('school_icc', 'classroom_icc'),
+                                ('schools_per_arm', 'classrooms_per_school', 'students_per_classroom'))):
+        if top in gt:
+            a, b = gt[top], gt[mid]
+            field, n = _find(gt, levels[0])
+            params = {'n': n, 'sizes': (value(levels[1]), value(levels[2])),
+                      'sds': (math.sqrt(a), math.sqrt(b), math.sqrt(1 - a - b)), 'effect': gt['effect_size_d']}
+            return 'nested', params, 'n', field
+    if 'icc' in gt:
+        sds = (math.sqrt(gt['icc']), math.sqrt(1 - gt['icc']))
+        effect = gt.get('effect_size_d')
+    else:
+        sds = (gt.get('random_intercept_sd'), gt.get('residual_sd'))
+        effect = value('fixed_effect', 'primary_effect', 'effect_size_d')
+    if value('clusters_per_arm') is not None:
+        field, m = _find(gt, 'patients_per_cluster')
+        params = {'n': value('clusters_per_arm'), 'sizes': (m,), 'sds': sds, 'effect': effect}
+        return 'nested', params, 'sizes', field
+    field, n = _find(gt, 'subjects_per_group')
+    m = value('measurements_per_subject', 'observations_per_subject', 'time_points', 'timepoints')
+    if None in (n, m, effect) + sds:
+        return None
+    return 'nested', {'n': n, 'sizes': (m,), 'sds': sds, 'effect': effect}, 'n', field
+
+def validate(tasks, search=True, **kw):
+    """Simulate every covered task: power at the stored design and, for sample-size
+    tasks, the smallest size reaching the target power."""
+    rows = []
+    for task in tasks:
+        parsed = task_design(task)
+        if parsed is None:
+            continue
+        design, params, key, field = parsed
+        gt, tol = task['ground_truth'], task.get('tolerance', {})
+        alpha = gt.get('alpha', 0.05)
+        start = time.perf_counter()
+        power, (lo, hi), sims = estimate(design, params, alpha, **kw)
+        row = {'id': task['id'], 'design': design, 'power': round(power, 4), 'ci': [round(lo, 4), round(hi, 4)],
+               'sims': sims, 'stored_power': gt['power']}
+        row['pass'] = abs(power - gt['power']) <= tol.get('power', 0)
+        if search and field and not field.startswith('given_'):
+            size, _ = solve(design, params, key, gt['power'], gt[field], alpha=alpha, **kw)
+            n_tol = tol.get(field, tol.get('sample_size', 0))
+            row.update(field=field, n=size, stored=gt[field], tol=n_tol)
+            row['pass'] &= size is not None and abs(size - gt[field]) <= n_tol
+        row['seconds'] = round(time.perf_counter() - start, 2)
+        rows.append(row)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--tasks', default=TASKS_FILE, help='task file (JSON array, tier file or JSONL)')
+    parser.add_argument('--ids', help='comma-separated task ids (default: every covered task)')
+    parser.add_argument('--workers', type=int, default=None, help='process count (default: all cores; 1 = serial)')
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--ci-width', type=float, default=CI_WIDTH, help='stop once the 95%% CI on power is this narrow')
+    parser.add_argument('--max-sims', type=int, default=MAX_SIMS, help='simulation cap per power estimate')
+    parser.add_argument('--no-search', action='store_true', help='only estimate power at the stored designs')
+    parser.add_argument('--output', help='also write the rows as JSON')
+    parser.add_argument('--verbose', action='store_true', help='print every task, not just mismatches')
+    args = parser.parse_args()
+
+    tasks = list(iter_tasks(args.tasks))
+    if args.ids:
+        wanted = set(args.ids.split(','))
+        tasks = [t for t in tasks if t.get('id') in wanted]
+    kw = {'seed': args.seed, 'ci_width': args.ci_width, 'max_sims': args.max_sims}
+    start = time.perf_counter()
+    if args.workers == 1:
+        rows = validate(tasks, not args.no_search, **kw)
+    else:
+        with Pool(args.workers) as pool:
+            rows = validate(tasks, not args.no_search, pool=pool, **kw)
+    elapsed = time.perf_counter() - start
+
+    bad = [r for r in rows if not r['pass']]
+    for r in rows if args.verbose else bad:
+        size = f' n={r["n"]} (stored {r["stored"]} ±{r["tol"]})' if 'field' in r else ''
+        print(f'  {"ok  " if r["pass"] else "FAIL"} {r["id"]:<14} {r["design"]:<9} power={r["power"]:.3f} '
+              f'[{r["ci"][0]:.3f}, {r["ci"][1]:.3f}] (stored {r["stored_power"]}, {r["sims"]} sims){size} '
+              f'{r["seconds"]}s')
+    covered = sum(t.get('template') in ('mixed_effects_lmm', 'simulation_simr') for t in tasks)
+    print(f'\n=== SIMULATION CHECK ({args.tasks}, seed {args.seed}) ===')
+    print(f'Covered tasks: {len(rows)}/{covered} | Reproduced: {len(rows) - len(bad)} | '
+          f'Mismatched: {len(bad)} | {elapsed:.1f} s')
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=1)
+    sys.exit(1 if bad else 0)
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,19 @@
-import json, re, os, sys
+import os, sys
 
-def load_tasks():
-    with open('all_tasks.json') as f:
-        return {t['id']: t for t in json.load(f)}
+import pattern_profile
+from manifest import Manifest, hash_text
+from result_log import ResultLog, compact
+from pattern_profile import note_candidates, note_win
+from scanner import Scan, SE_POWER, SE_EFFECT, SE_EVENTS
+from task_index import load_index
+
+TASKS_FILE = 'all_tasks.json'
+MANIFEST_FILE = 'results/smart_extract.manifest.json'
+PROFILE_FILE = 'results/smart_extract.profile.json'
+LOG_FILE = 'results/smart_extract.log.jsonl'
+
+# Bump when extract_value changes so the manifest re-extracts every task
+EXTRACTOR_VERSION = 1
 
 def get_expected_info(gt):
     """Returns (field_name, expected_value, is_per_group, is_power, is_effect)"""
@@ -31,126 +42,107 @@ def get_expected_info(gt):
 
 def extract_value(text, field, is_per_group, is_power, is_effect, expected):
     """Smart extraction based on what we're looking for."""
-    text_lower = text.lower()
+    scan = Scan(text)
     
     # === POWER extraction ===
     if is_power:
-        patterns = [
-            r'power\s*(?:is|=|:|-|≈|of|would be|comes? (?:out|to))\s*(?:approximately?\s*)?(?:about\s*)?(?:roughly\s*)?(\d+\.\d+|0\.\d+)',
-            r'(?:achieve|obtain|attain|reach|yield|get|have)\s+(?:a\s+)?power\s+(?:of\s+)?(\d+\.\d+|0\.\d+)',
-            r'power\s*(?:≈|\\approx)\s*(\d+\.\d+|0\.\d+)',
-            r'(\d+\.\d+|0\.\d+)\s*(?:power|statistical power)',
-            r'\*\*(\d+(?:\.\d+)?%?)\*\*.*power',
-            r'power.*\*\*(\d+(?:\.\d+)?%?)\*\*',
-        ]
-        for pat in patterns:
-            m = re.search(pat, text, re.IGNORECASE)
+        for name in SE_POWER:
+            m = scan.first(name)
             if m:
                 val = m.group(1).rstrip('%')
                 v = float(val)
                 if v > 1: v = v / 100
-                if 0 < v <= 1: return v
+                if 0 < v <= 1: return note_win(name, v)
         # Try percentage pattern
-        m = re.search(r'(\d{1,3})\s*%\s*(?:power|statistical power)', text, re.I)
+        m = scan.first('se_power_pct')
         if m:
-            return float(m.group(1)) / 100
+            return note_win('se_power_pct', float(m.group(1)) / 100)
         return None
     
     # === EFFECT SIZE extraction ===
     if is_effect:
-        patterns = [
-            r'detectable.*?(?:d|effect)\s*(?:=|:|-|≈|is)\s*(\d+\.\d+)',
-            r'd\s*(?:=|:)\s*(\d+\.\d+)',
-        ]
-        for pat in patterns:
-            m = re.search(pat, text, re.I)
+        for name in SE_EFFECT:
+            m = scan.first(name)
             if m:
-                return float(m.group(1))
+                return note_win(name, float(m.group(1)))
         return None
     
     # === EVENTS extraction ===
     if 'event' in field:
-        patterns = [
-            r'(\d[\d,]*)\s*(?:total\s+)?events?\s*(?:needed|required|necessary)',
-            r'(?:need|require)\s*(\d[\d,]*)\s*events?',
-            r'events?\s*(?:needed|required|=|:)\s*(\d[\d,]*)',
-            r'\*\*(\d[\d,]*)\*\*\s*(?:total\s+)?events?',
-            r'events?.*\*\*(\d[\d,]*)\*\*',
-        ]
-        for pat in patterns:
-            m = re.search(pat, text, re.I)
+        for name in SE_EVENTS:
+            m = scan.first(name)
             if m:
-                val = m.group(1).replace(',', ''))
+                return note_win(name, int(m.group(1).replace(',', '')))
     
     # === SAMPLE SIZE extraction ===
-    # Collect all candidate (value, context) pairs
+    # Collect all candidate (value, context, position, pattern) tuples
     candidates = []
     
     # Pattern: **N per group** or **N subjects per group**
-    for m in re.finditer(r'\*\*(\d[\d,]*)\*\*\s*(?:participants?|subjects?|patients?|per group|per arm|each group|in each)', text, re.I):
-        candidates.append((int(m.group(1).replace(',','')), 'per_group', m.start()))
+    for m in scan.all('se_bold_per_group'):
+        candidates.append((int(m.group(1).replace(',','')), 'per_group', m.start(), 'se_bold_per_group'))
     
     # Pattern: N per group
-    for m in re.finditer(r'(\d[\d,]*)\s*(?:per group|per arm|each group|in each group|subjects? per group|participants? per group|patients? per group)', text, re.I):
-        candidates.append((int(m.group(1).replace(',','')), 'per_group', m.start()))
+    for m in scan.all('se_per_group'):
+        candidates.append((int(m.group(1).replace(',','')), 'per_group', m.start(), 'se_per_group'))
     
     # Pattern: n = N (per group context)
-    for m in re.finditer(r'n\s*(?:=|:)\s*(\d[\d,]*)\s*(?:per|each|in each)', text, re.I):
-        candidates.append((int(m.group(1).replace(',','')), 'per_group', m.start()))
+    for m in scan.all('se_n_per'):
+        candidates.append((int(m.group(1).replace(',','')), 'per_group', m.start(), 'se_n_per'))
     
     # Pattern: total N or N total
-    for m in re.finditer(r'(?:total|overall|combined|altogether)\s*(?:sample\s*(?:size)?\s*)?(?:of\s*)?(?:=|:|-|≈|is)?\s*(\d[\d,]*)', text, re.I):
-        candidates.append((int(m.group(1).replace(',','')), 'total', m.start()))
-    for m in re.finditer(r'(\d[\d,]*)\s*(?:total|in total|overall|altogether)', text, re.I):
-        candidates.append((int(m.group(1).replace(',','')), 'total', m.start()))
+    for m in scan.all('se_total_before'):
+        candidates.append((int(m.group(1).replace(',','')), 'total', m.start(), 'se_total_before'))
+    for m in scan.all('se_total_after'):
+        candidates.append((int(m.group(1).replace(',','')), 'total', m.start(), 'se_total_after'))
     
     # Pattern: N = 2×M
-    for m in re.finditer(r'N\s*(?:=|:)\s*2\s*[×x*]\s*(\d[\d,]*)\s*=\s*(\d[\d,]*)', text, re.I):
-        candidates.append((int(m.group(2).replace(',','')), 'total', m.start()))
+    for m in scan.all('se_n_twice'):
+        candidates.append((int(m.group(2).replace(',','')), 'total', m.start(), 'se_n_twice'))
     
     # Pattern: bold numbers **N**
-    for m in re.finditer(r'\*\*(\d[\d,]*)\*\*', text):
+    lex = scan.lex
+    for m in scan.all('se_bold'):
         val = int(m.group(1).replace(',',''))
-        # Check surrounding context
-        ctx = text[max(0,m.start()-80):m.end()+80].lower()
-        if any(w in ctx for w in ['per group', 'per arm', 'each group', 'per cell']):
-            candidates.append((val, 'per_group', m.start()))
-        elif any(w in ctx for w in ['total', 'overall', 'combined']):
-            candidates.append((val, 'total', m.start()))
+        # Check surrounding context (80 chars either side)
+        if lex.near(m.start(), m.end(), ['per group', 'per arm', 'each group', 'per cell']):
+            candidates.append((val, 'per_group', m.start(), 'se_bold'))
+        elif lex.near(m.start(), m.end(), ['total', 'overall', 'combined']):
+            candidates.append((val, 'total', m.start(), 'se_bold'))
         else:
-            candidates.append((val, 'unknown', m.start()))
+            candidates.append((val, 'unknown', m.start(), 'se_bold'))
     
     # Pattern: generic "need N" or "sample size of N" or "require N"
-    for m in re.finditer(r'(?:need|require|recommend|sample size (?:of|is|=|:))\s*(\d[\d,]*)', text, re.I):
+    for m in scan.all('se_need'):
         val = int(m.group(1).replace(',',''))
-        ctx = text[max(0,m.start()-80):m.end()+80].lower()
-        if any(w in ctx for w in ['per group', 'per arm', 'each']):
-            candidates.append((val, 'per_group', m.start()))
-        elif any(w in ctx for w in ['total', 'overall']):
-            candidates.append((val, 'total', m.start()))
+        if lex.near(m.start(), m.end(), ['per group', 'per arm', 'each']):
+            candidates.append((val, 'per_group', m.start(), 'se_need'))
+        elif lex.near(m.start(), m.end(), ['total', 'overall']):
+            candidates.append((val, 'total', m.start(), 'se_need'))
         else:
-            candidates.append((val, 'unknown', m.start()))
+            candidates.append((val, 'unknown', m.start(), 'se_need'))
     
     # Pattern: "per_cell" specific - for factorial designs
     if 'per_cell' in field:
-        for m in re.finditer(r'(\d[\d,]*)\s*(?:per cell|per condition|per group)', text, re.I):
-            candidates.append((int(m.group(1).replace(',','')), 'per_group', m.start()))
+        for m in scan.all('se_per_cell'):
+            candidates.append((int(m.group(1).replace(',','')), 'per_group', m.start(), 'se_per_cell'))
     
     # Pattern: clusters
     if 'cluster' in field:
-        for m in re.finditer(r'(\d[\d,]*)\s*(?:clusters?|sites?|groups?)\s*(?:per|in each|per arm)', text, re.I):
-            candidates.append((int(m.group(1).replace(',','')), 'per_group', m.start()))
-        for m in re.finditer(r'(?:clusters?|sites?)\s*(?:=|:)\s*(\d[\d,]*)', text, re.I):
-            candidates.append((int(m.group(1).replace(',','')), 'per_group', m.start()))
+        for m in scan.all('se_cluster_per'):
+            candidates.append((int(m.group(1).replace(',','')), 'per_group', m.start(), 'se_cluster_per'))
+        for m in scan.all('se_cluster_eq'):
+            candidates.append((int(m.group(1).replace(',','')), 'per_group', m.start(), 'se_cluster_eq'))
     
     if not candidates:
         # Last resort: find all integers and pick the best one
-        all_nums = [(int(m.group(1).replace(',','')), m.start()) for m in re.finditer(r'(?<!\.)\b(\d[\d,]{0,6})\b(?!\.\d)', text) if 2 <= int(m.group(1).replace(',','')) <= 50000]
+        all_nums = [(int(m.group(1).replace(',','')), m.start()) for m in scan.all('se_any') if 2 <= int(m.group(1).replace(',','')) <= 50000]
         if all_nums:
             # Pick the one closest to expected
             all_nums.sort(key=lambda x: abs(x[0] - expected))
-            return all_nums[0][0]
+            return note_win('se_any', all_nums[0][0])
         return None
+    note_candidates(c[3] for c in candidates)
     
     # Filter candidates by type
     if is_per_group:
@@ -158,23 +150,23 @@ def extract_value(text, field, is_per_group, is_power, is_effect, expected):
         if pg:
             # Pick the one closest to expected
             pg.sort(key=lambda x: abs(x[0] - expected))
-            return pg[0][0]
+            return note_win(pg[0][3], pg[0][0])
     else:
         # Want total
         tot = [c for c in candidates if c[1] == 'total']
         if tot:
             tot.sort(key=lambda x: abs(x[0] - expected))
-            return tot[0][0]
+            return note_win(tot[0][3], tot[0][0])
     
     # Try unknown candidates
     unk = [c for c in candidates if c[1] == 'unknown']
     if unk:
         unk.sort(key=lambda x: abs(x[0] - expected))
-        return unk[0][0]
+        return note_win(unk[0][3], unk[0][0])
     
     # Fall back to any candidate closest to expected
     candidates.sort(key=lambda x: abs(x[0] - expected))
-    return candidates[0][0]
+    return note_win(candidates[0][3], candidates[0][0])
 
 def get_tolerance(task, field):
     tol = task.get('tolerance', {})
@@ -184,16 +176,36 @@ def get_tolerance(task, field):
         return tol.get('effect_size', 0.05)
     return tol.get('sample_size', tol.get('subjects', tol.get('clusters', tol.get('events', 10))))
 
+def resolve_task(task):
+    """(field, expected, kind, tol) for the task index."""
+    field, expected, is_pg, is_power, is_effect = get_expected_info(task.get('ground_truth', {}))
+    if field is None:
+        return None, None, None, None
+    if is_pg: kind = 'per_group'
+    elif is_power: kind = 'power'
+    elif is_effect: kind = 'effect'
+    elif 'event' in field: kind = 'events'
+    else: kind = 'total'
+    return field, expected, kind, get_tolerance(task, field)
+
+def load_task_index():
+    return load_index(TASKS_FILE, 'smart_extract', resolve_task)
+
 def main():
-    tasks = load_tasks()
+    index = load_task_index()
+    # --profile times every pattern; it re-extracts everything so each task is profiled
+    profile = pattern_profile.enable() if '--profile' in sys.argv else None
+    manifest = Manifest(MANIFEST_FILE, EXTRACTOR_VERSION, reset='--full' in sys.argv or profile is not None)
+    # Every result is appended to LOG_FILE as it is found; --resume keeps a killed run's entries
+    result_log = ResultLog(LOG_FILE, resume='--resume' in sys.argv)
     results = {}
     passes = 0
     fails = 0
     missing = 0
     fail_log = []
     
-    for tid in sorted(tasks.keys()):
-        task = tasks[tid]
+    for spec in index:
+        tid = spec.id
         raw_file = f'results/raw/{tid}.txt'
         if not os.path.exists(raw_file):
             missing += 1
@@ -202,13 +214,24 @@ def main():
         with open(raw_file) as f:
             text = f.read()
         
-        field, expected, is_pg, is_power, is_effect = get_expected_info(task['ground_truth'])
+        field, expected, kind, tol = spec.field, spec.expected, spec.kind, spec.tol
         if field is None:
             missing += 1
             continue
         
-        tol = get_tolerance(task, field)
-        value = extract_value(text, field, is_pg, is_power, is_effect, expected)
+        if tid in result_log:
+            value = result_log.get(tid)['value']
+        else:
+            text_hash = hash_text(text)
+            stored = manifest.lookup(tid, text_hash, spec.task_hash)
+            if stored is not None:
+                value, = stored
+            else:
+                if profile is not None:
+                    profile.begin(tid)
+                value = extract_value(text, field, kind == 'per_group', kind == 'power', kind == 'effect', expected)
+                manifest.store(tid, text_hash, spec.task_hash, [value])
+            result_log.append(tid, value)
         
         if value is not None:
             results[tid] = value
@@ -233,10 +256,16 @@ def main():
             print(l)
     
     # Write results for simple-evaluator
-    with open('results/agent_results.json', 'w') as f:
-        json.dump(results, f, indent=2)
+    result_log.close()
+    compact(LOG_FILE, 'results/agent_results.json', skip_none=True)
+    manifest.save()
     print(f'\nResults written to results/agent_results.json')
+    print(manifest.summary())
+    print(result_log.summary())
+    
+    if profile is not None:
+        pattern_profile.disable()
+        pattern_profile.report(profile, PROFILE_FILE)
 
 if __name__ == '__main__':
-    os.chdir('/Users/yukangzeng/power-agent-benchmark')
     main()
@@ -1,8 +1,19 @@
-import json, re, os
+import os, sys, time
 
-def load_tasks():
-    with open('all_tasks.json') as f:
-        return {t['id']: t for t in json.load(f)}
+import pattern_profile
+from manifest import Manifest, hash_text
+from result_log import ResultLog, compact
+from pattern_profile import note_win
+from scanner import Scan, S2_POWER, S2_EFFECT, S2_EVENTS, S2_PER_GROUP, S2_TOTAL
+from task_index import load_index
+
+TASKS_FILE = 'all_tasks.json'
+MANIFEST_FILE = 'results/smart_extract2.manifest.json'
+PROFILE_FILE = 'results/smart_extract2.profile.json'
+LOG_FILE = 'results/smart_extract2.log.jsonl'
+
+# Bump when extract_value changes so the manifest re-extracts every task
+EXTRACTOR_VERSION = 1
 
 def get_expected_info(gt):
     pg_fields = ['sample_size_per_group', 'subjects_per_group', 'subjects_per_arm', 'per_cell', 'subjects_per_cluster', 'patients_per_cluster']
@@ -36,127 +47,233 @@ def safe_float(s):
     except:
         return None
 
-def find_all_numbers(text):
-    """Find all integers in text with context."""
-    results = []
-    for m in re.finditer(r'(?<![\d.])(\d[\d,]*)(?:\.\d+)?(?![\d.])', text):
-        start = max(0, m.start()-80)
-        end = min(len(text), m.end()+80)
-        ctx = text[start:end].lower()
-        val = safe_int(m.group(1))
-        if val is not None and val > 0:
-            results.append((val, ctx, m.start()))
-    return results
-
-def extract_value(text, kind, expected):
-    text_lower = text.lower()
+# Keywords that mark a number within 80 characters as the answer
+PG_KEYWORDS = ['per group', 'per arm', 'per cell', 'each group', 'each arm', 'per cluster']
+TOTAL_KEYWORDS = ['total', 'minimum sample', 'required sample', 'need at least', 'sample size']
+
+def numbers_near(scan, keywords, minimum):
+    """First number token above minimum with a keyword within 80 characters."""
+    profile = pattern_profile.active
+    start = time.perf_counter() if profile is not None else None
+    lex = scan.lex
+    found = None
+    for tok in lex.iter_numbers():
+        if tok.whole > minimum and lex.near(tok.start, tok.end, keywords):
+            found = tok
+            break
+    if profile is not None:
+        profile.ran('keyword_context', time.perf_counter() - start, found is not None)
+    return found
+
+def _extract(text, kind, expected, scan):
+    """extract_value's strategies in priority order. Returns (value, strategy, (start, end) of the value in text)."""
     
     if kind == 'power':
         # Look for power = 0.XX
-        for p in [r'power\s*(?:=|\u2248|:)\s*(0\.\d+)', r'\*\*(0\.\d+)\*\*', r'\\boxed\{[^}]*(0\.\d+)', r'(0\.\d+)\s*(?:\(|power)']:
-            m = re.search(p, text, re.IGNORECASE)
+        for name in S2_POWER:
+            m = scan.first(name)
             if m:
                 v = safe_float(m.group(1))
                 if v and 0 < v < 1:
-                    return v
+                    return v, name, m.span(1)
         # Look for percentage
-        m = re.search(r'(\d+(?:\.\d+)?)\s*%', text)
+        m = scan.first('s2_percent')
         if m:
             v = safe_float(m.group(1))
             if v and 50 < v < 100:
-                return v / 100
-        return None
+                return v / 100, 's2_percent', m.span(1)
+        return None, None, None
     
     if kind == 'effect':
         # Look for effect size d
-        for p in [r'd\s*(?:=|\u2248)\s*(0\.\d+)', r'(?:effect|MDES?|detectable).*?(?:=|\u2248|:)\s*(0\.\d+)', r'\\boxed\{[^}]*(0\.\d+)', r'\*\*(0\.\d+)\*\*', r'\u2248\s*(0\.\d+)']:
-            m = re.search(p, text, re.IGNORECASE)
+        for name in S2_EFFECT:
+            m = scan.first(name)
             if m:
                 v = safe_float(m.group(1))
                 if v and 0 < v < 5:
-                    return v
-        return None
+                    return v, name, m.span(1)
+        return None, None, None
     
     if kind == 'events':
         # Look for events = N
-        for p in [r'(\d[\d,]*)\s*events', r'events\s*(?:=|:)\s*(\d[\d,]*)']:
-            m = re.search(p, text, re.IGNORECASE)
+        for name in S2_EVENTS:
+            m = scan.first(name)
             if m:
-                return safe_int(m.group(1))
-    
-    # For sample size (per_group or total)
-    nums = find_all_numbers(text)
+                return safe_int(m.group(1)), name, m.span(1)
     
     if kind == 'per_group':
         # Priority: numbers near "per group" / "per arm" / "each group"
-        pg_keywords = ['per group', 'per arm', 'per cell', 'each group', 'each arm', 'per cluster']
-        for val, ctx, pos in nums:
-            for kw in pg_keywords:
-                if kw in ctx and val > 5:
-                    return val
+        tok = numbers_near(scan, PG_KEYWORDS, 5)
+        if tok:
+            return tok.whole, 'keyword_context', (tok.start, tok.end)
         # Look for n = X patterns (common in final answers)
-        for p in [r'\*\*\s*(?:n\s*=\s*)?(\d[\d,]*)\s*(?:\*\*)?\s*(?:per|participant|subject|each)', r'n\s*=\s*(\d[\d,]*)\s*(?:per|participant|subject|each)']:
-            m = re.search(p, text, re.IGNORECASE)
+        for name in S2_PER_GROUP:
+            m = scan.first(name)
             if m:
                 v = safe_int(m.group(1))
                 if v and v > 5:
-                    return v
+                    return v, name, m.span(1)
         # Boxed answer
-        for m in re.finditer(r'\\boxed\{[^}]*(\d[\d,]*)', text):
+        for m in scan.all('s2_boxed'):
             v = safe_int(m.group(1))
             if v and v > 5:
-                return v
+                return v, 's2_boxed', m.span(1)
         # Bold answer
-        for m in re.finditer(r'\*\*(\d[\d,]*)\*\*', text):
+        for m in scan.all('s2_bold'):
             v = safe_int(m.group(1))
             if v and v > 5 and abs(v - expected) < abs(v * 5 - expected):  # sanity check
-                return v
+                return v, 's2_bold', m.span(1)
         # Last n = X
-        matches = re.findall(r'n\s*=\s*(\d[\d,]*)', text, re.IGNORECASE)
+        matches = scan.all('s2_n_eq')
         if matches:
-            v = safe_int(matches[-1])
+            m = matches[-1]
+            v = safe_int(m.group(1))
             if v and v > 5:
-                return v
+                return v, 's2_n_eq', m.span(1)
     
     if kind == 'total':
         # Priority: numbers near "total"
-        tot_keywords = ['total', 'minimum sample', 'required sample', 'need at least', 'sample size']
-        for val, ctx, pos in nums:
-            for kw in tot_keywords:
-                if kw in ctx and val > 10:
-                    return val
+        tok = numbers_near(scan, TOTAL_KEYWORDS, 10)
+        if tok:
+            return tok.whole, 'keyword_context', (tok.start, tok.end)
         # N = X or n = X (total context)
-        for p in [r'N\s*(?:=|\u2248)\s*(\d[\d,]*)', r'\\boxed\{[^}]*(\d[\d,]*)', r'\*\*(\d[\d,]*)\s*(?:total|patient|subject|sample)', r'(?:need|require).*?(\d[\d,]*)\s*(?:total|patient|subject|sample)']:
-            m = re.search(p, text, re.IGNORECASE)
+        for name in S2_TOTAL:
+            m = scan.first(name)
             if m:
                 v = safe_int(m.group(1))
                 if v and v > 10:
-                    return v
+                    return v, name, m.span(1)
         # Boxed
-        for m in re.finditer(r'\\boxed\{[^}]*(\d[\d,]*)', text):
+        for m in scan.all('s2_boxed'):
             v = safe_int(m.group(1))
             if v and v > 10:
-                return v
+                return v, 's2_boxed', m.span(1)
         # Bold
-        for m in re.finditer(r'\*\*(\d[\d,]*)\*\*', text):
+        for m in scan.all('s2_bold'):
             v = safe_int(m.group(1))
             if v and v > 10:
-                return v
+                return v, 's2_bold', m.span(1)
         # Last n/N = X
-        matches = re.findall(r'[nN]\s*(?:=|\u2248)\s*(\d[\d,]*)', text)
+        matches = scan.all('s2_last_n')
         if matches:
-            v = safe_int(matches[-1])
+            m = matches[-1]
+            v = safe_int(m.group(1))
             if v and v > 10:
-                return v
+                return v, 's2_last_n', m.span(1)
     
-    return None
+    return None, None, None
+
+# Base confidence of each strategy that can produce an answer, calibrated
+# against the LLM-judge extractions in test-results/evaluation/*. Explicit
+# markers ("power = 0.xx", bold decimals, "**N** per") score high; the
+# first-number-near-a-keyword guess and last-resort scans score low unless
+# the response also marks the same value up as its answer elsewhere (corroborated).
+STRATEGY_SCORES = {
+    's2_power_eq': 0.9, 's2_bold_decimal': 0.9, 's2_boxed_decimal': 0.9, 's2_power_suffix': 0.3,
+    's2_d_eq': 0.8, 's2_effect_eq': 0.7, 's2_approx_decimal': 0.5,
+    's2_events_count': 0.7, 's2_events_eq': 0.8,
+    'keyword_context': 0.4,
+    's2_bold_n_per': 0.9, 's2_n_per': 0.8,
+    's2_total_n_eq': 0.6, 's2_boxed_any_case': 0.5, 's2_bold_total': 0.9, 's2_need_total': 0.6,
+    's2_boxed': 0.3, 's2_bold': 0.8,
+    's2_percent': 0.6, 's2_n_eq': 0.4, 's2_last_n': 0.4,
+}
+LAST_RESORT = {'s2_percent', 's2_n_eq', 's2_last_n'}
+CORROBORATION_BONUS = 0.3
+CONFLICT_PENALTY = 0.15
+MAX_CONFLICT_PENALTY = 0.45
+
+def answer_candidates(scan, kind, exclude=None):
+    """Distinct values the response marks up as answers (boxed, bold, "n = X per").
+
+    exclude: (start, end) of the extracted value; a mark-up over the same
+    characters is the answer itself, not a second statement of it.
+    """
+    if kind in ('power', 'effect'):
+        names = ['s2_bold_decimal', 's2_boxed_decimal', 's2_power_eq' if kind == 'power' else 's2_d_eq']
+        parse = safe_float
+    else:
+        names = ['s2_boxed', 's2_bold', 's2_bold_n_per']
+        parse = safe_int
+    values = set()
+    for name in names:
+        for m in scan.all(name):
+            start, end = m.span(1)
+            if exclude is not None and start < exclude[1] and exclude[0] < end:
+                continue
+            v = parse(m.group(1))
+            if v:
+                values.add(v)
+    return values
+
+def assess(scan, kind, value, strategy, span=None):
+    """Confidence signal for one extraction; span is where in the text the value was found.
+
+    strategy: which strategy produced the value (None if nothing matched)
+    corroborated: the response marks the value up as an answer somewhere else
+    conflicts: answer-like values in the response that disagree with it
+    last_resort: whether the value came from a last-resort scan
+    score: 0..1, the strategy's base score, plus a bonus if corroborated,
+        minus a penalty per conflict
+    """
+    if value is None:
+        return {'strategy': None, 'corroborated': False, 'conflicts': 0, 'last_resort': False, 'score': 0.0}
+    candidates = answer_candidates(scan, kind, span)
+    corroborated = any(abs(v - value) <= 0.01 * abs(value) for v in candidates)
+    conflicts = sum(1 for v in candidates if abs(v - value) > 0.01 * abs(value))
+    score = STRATEGY_SCORES.get(strategy, 0.5)
+    if corroborated:
+        score += CORROBORATION_BONUS
+    score -= min(MAX_CONFLICT_PENALTY, CONFLICT_PENALTY * conflicts)
+    return {'strategy': strategy, 'corroborated': corroborated, 'conflicts': conflicts,
+            'last_resort': strategy in LAST_RESORT, 'score': round(min(1.0, max(0.0, score)), 2)}
+
+def extract_value(text, kind, expected, with_confidence=False):
+    """Extracted answer, or None.
+
+    With with_confidence=True returns (value, confidence) where confidence
+    is the dict described in assess().
+    """
+    scan = Scan(text)
+    value, strategy, span = _extract(text, kind, expected, scan)
+    if strategy is not None:
+        note_win(strategy)
+    if not with_confidence:
+        return value
+    return value, assess(scan, kind, value, strategy, span)
+
+def get_tolerance(task, kind):
+    tol_dict = task.get('tolerance', {})
+    if kind == 'power':
+        return tol_dict.get('power', 0.03)
+    if kind == 'effect':
+        return tol_dict.get('effect_size', 0.03)
+    if kind == 'events':
+        return tol_dict.get('events', tol_dict.get('sample_size', 5))
+    return tol_dict.get('sample_size', tol_dict.get('subjects', tol_dict.get('clusters', 10)))
+
+def resolve_task(task):
+    """(field, expected, kind, tol) for the task index."""
+    field, expected, kind = get_expected_info(task.get('ground_truth', {}))
+    if field is None:
+        return None, None, None, None
+    return field, expected, kind, get_tolerance(task, kind)
+
+def load_task_index():
+    return load_index(TASKS_FILE, 'smart_extract2', resolve_task)
 
 def main():
-    tasks = load_tasks()
+    index = load_task_index()
+    # --profile times every pattern; it re-extracts everything so each task is profiled
+    profile = pattern_profile.enable() if '--profile' in sys.argv else None
+    manifest = Manifest(MANIFEST_FILE, EXTRACTOR_VERSION, reset='--full' in sys.argv or profile is not None)
+    # Every result is appended to LOG_FILE as it is found; --resume keeps a killed run's entries
+    result_log = ResultLog(LOG_FILE, resume='--resume' in sys.argv)
     results = {}
     log = []
     
-    for tid, task in sorted(tasks.items()):
+    for spec in index:
+        tid = spec.id
         raw_file = f'results/raw/{tid}.txt'
         if not os.path.exists(raw_file):
             log.append((tid, None, None, None, None, 'MISSING'))
@@ -165,25 +282,25 @@ def main():
         with open(raw_file) as f:
             text = f.read()
         
-        gt = task.get('ground_truth', {})
-        tol_dict = task.get('tolerance', {})
-        field, expected, kind = get_expected_info(gt)
+        field, expected, kind, tol = spec.field, spec.expected, spec.kind, spec.tol
         
         if field is None:
             log.append((tid, None, None, None, None, 'NO_FIELD'))
             continue
         
-        value = extract_value(text, kind, expected)
-        
-        # Get tolerance
-        if kind == 'power':
-            tol = tol_dict.get('power', 0.03)
-        elif kind == 'effect':
-            tol = tol_dict.get('effect_size', 0.03)
-        elif kind == 'events':
-            tol = tol_dict.get('events', tol_dict.get('sample_size', 5))
+        if tid in result_log:
+            value = result_log.get(tid)['value']
         else:
-            tol = tol_dict.get('sample_size', tol_dict.get('subjects', tol_dict.get('clusters', 10)))
+            text_hash = hash_text(text)
+            stored = manifest.lookup(tid, text_hash, spec.task_hash)
+            if stored is not None:
+                value, = stored
+            else:
+                if profile is not None:
+                    profile.begin(tid)
+                value = extract_value(text, kind, expected)
+                manifest.store(tid, text_hash, spec.task_hash, [value])
+            result_log.append(tid, value)
         
         if value is not None:
             results[tid] = value
@@ -195,8 +312,9 @@ def main():
             log.append((tid, None, expected, tol, None, 'NO_EXTRACT'))
     
     # Write results
-    with open('results/agent_results.json', 'w') as f:
-        json.dump(results, f, indent=2)
+    result_log.close()
+    compact(LOG_FILE, 'results/agent_results.json', skip_none=True)
+    manifest.save()
     
     passed = sum(1 for r in log if r[5] == 'PASS')
     failed = sum(1 for r in log if r[5] == 'FAIL')
@@ -207,6 +325,8 @@ def main():
     print(f'Passed: {passed}/{total} ({100*passed/total:.1f}%)')
     print(f'Failed (wrong answer): {failed}/{total}')
     print(f'No extract: {no_ext}/{total}')
+    print(manifest.summary())
+    print(result_log.summary())
     
     failures = [(tid, v, exp, tol, d, s) for tid, v, exp, tol, d, s in log if s != 'PASS']
     print(f'\n=== NON-PASS ({len(failures)}) ===')
@@ -215,6 +335,10 @@ def main():
             print(f'  {tid}: got={v}, want={exp}, diff={d:.2f}, tol=\u00b1{tol}, FAIL')
         else:
             print(f'  {tid}: {s} (want={exp})')
+    
+    if profile is not None:
+        pattern_profile.disable()
+        pattern_profile.report(profile, PROFILE_FILE)
 
 if __name__ == '__main__':
     main()
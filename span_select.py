@@ -0,0 +1,126 @@
+"""Answer-bearing excerpt of a response for LLM extraction prompts.
+
+Sending response_text[:3000] spends the prompt on preamble and derivation
+and, in long thinking-mode responses, often cuts off the final answer, which
+usually comes last. excerpt() instead keeps the regions most likely to hold
+the answer, within a character budget:
+
+- the end of the response (a share of the budget is reserved for it);
+- the section under the last "final answer" / "summary" / "conclusion" /
+  "recommendation" heading;
+- lines with bold or \\boxed{} numbers;
+- lines with numbers near "per group", "total", "power", "sample size"...
+
+The response is cut into lines (long lines into sentences), each line is
+scored, and the best lines are kept in text order, with "[...]" where text
+was left out. A response that already fits the budget is returned unchanged,
+so excerpt() of an excerpt is the excerpt itself.
+"""
+import re
+from bisect import bisect_left
+
+from lexer import Lexed
+
+CHARS_PER_TOKEN = 4  # as in llm_extract.estimate_tokens
+PROMPT_TOKENS = 600
+TAIL_SHARE = 0.3
+MAX_SEGMENT = 400
+GAP = '\n[...]\n'
+
+KEYWORDS = ('per group', 'per arm', 'per cell', 'each group', 'each arm', 'per cluster', 'total',
+            'power', 'sample size', 'answer', 'recommend', 'required', 'needed')
+FINAL_WORDS = ('final', 'answer', 'summary', 'conclusion', 'recommend', 'result', 'bottom line')
+HEADING = re.compile(r'^[ \t]*(?:#{1,6}[ \t].*|\*\*[^*\n]{1,80}\*\*:?)[ \t]*$', re.M)
+SENTENCE_END = re.compile(r'(?<=[.;!?])\s+')
+
+def segments(text):
+    """(start, end) of every non-blank line; lines over MAX_SEGMENT are cut at sentence ends, then hard."""
+    spans = []
+    pos = 0
+    for line in text.split('\n'):
+        start, end = pos, pos + len(line)
+        pos = end + 1
+        if not line.strip():
+            continue
+        while end - start > MAX_SEGMENT:
+            cut = start + MAX_SEGMENT
+            for m in SENTENCE_END.finditer(text, start + MAX_SEGMENT // 4, start + MAX_SEGMENT):
+                cut = m.start()
+            spans.append((start, cut))
+            start = cut
+        spans.append((start, end))
+    return spans
+
+def final_section_start(text):
+    """Offset of the last heading that names a final answer or summary; len(text) if there is none."""
+    start = len(text)
+    for m in HEADING.finditer(text):
+        if any(w in m.group(0).lower() for w in FINAL_WORDS):
+            start = m.start()
+    return start
+
+def score(lexed, starts, span, final_start):
+    """How likely a line is to state the answer; 0 for a line without numbers that is no final heading."""
+    start, end = span
+    if start == final_start:
+        return 5.0
+    first = bisect_left(starts, start)
+    last = bisect_left(starts, end)
+    if first == last:
+        return 0.0
+    tokens = lexed.numbers[first:last]
+    s = 1.0 + 3.0 * min(2, sum(1 for t in tokens if t.bold or t.boxed))
+    if lexed.near(start, end, KEYWORDS, radius=0):
+        s += 2.0
+    if start >= final_start:
+        s += 3.0
+    return s + 2.0 * start / len(lexed.text)
+
+def excerpt(text, max_tokens=PROMPT_TOKENS):
+    """The answer-bearing parts of text within max_tokens (about CHARS_PER_TOKEN characters each)."""
+    budget = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= budget:
+        return text
+    spans = segments(text)
+    if not spans:
+        return text[-budget:]
+    chosen = set()
+    used = 0
+
+    # The end of the response first: that is where the final answer usually is
+    for i in range(len(spans) - 1, -1, -1):
+        cost = spans[i][1] - spans[i][0] + len(GAP)
+        if used + cost > TAIL_SHARE * budget:
+            break
+        chosen.add(i)
+        used += cost
+    if not chosen:
+        start, end = spans[-1]
+        return text[max(start, end - budget):end]
+
+    lexed = Lexed(text)
+    starts = [t.start for t in lexed.numbers]
+    final_start = final_section_start(text)
+    ranked = sorted(((score(lexed, starts, span, final_start), i) for i, span in enumerate(spans) if i not in chosen),
+                    reverse=True)
+    for s, i in ranked:
+        if s <= 0:
+            break
+        cost = spans[i][1] - spans[i][0] + len(GAP)
+        if used + cost <= budget:
+            chosen.add(i)
+            used += cost
+
+    parts = []
+    previous = None
+    for i in sorted(chosen):
+        start, end = spans[i]
+        if previous is None:
+            parts.append(GAP.lstrip('\n') if i > 0 else '')
+        elif previous == i - 1:
+            parts.append(text[spans[previous][1]:start])
+        else:
+            parts.append(GAP)
+        parts.append(text[start:end])
+        previous = i
+    return ''.join(parts)
@@ -0,0 +1,200 @@
+"""Synthetic response corpus for extractor load testing.
+
+Rewrites the real responses in test-results/raw-responses/* into as many
+synthetic responses as asked for, each a variant of one real response whose
+final answer matches its task's ground truth. A variant changes:
+
+- format: how every occurrence of the answer is written (plain, thousands
+  separator, bold, \\boxed{}, percentage for powers);
+- layout: where the final answer sits (left inline, restated at the start,
+  restated at the end, or in a closing summary table);
+- length: only the paragraphs around the answer, the original, or padded
+  with distractor paragraphs (and their numbers) taken from other responses.
+
+Records are written one JSON line at a time (gzip when the output ends in
+.gz), so the corpus never sits in memory:
+
+    {"id", "model", "task_id", "source_model", "format", "layout", "length",
+     "field", "kind", "expected", "tol", "text"}
+
+Every number within the task's tolerance of the expected value counts as
+a statement of the answer and is rewritten to the expected value itself;
+responses that never state it are not used. Output is
+reproducible for a given --seed. iter_corpus() streams a corpus back;
+bench_extractors.py --synthetic replays one through the extractors.
+
+    python synth_corpus.py --count 500000 --output results/synthetic_corpus.jsonl.gz
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import re
+import sys
+import time
+
+from batch_extract import CORPUS_DIR, TASKS_FILE, find_sources, load_indexes, load_responses
+
+OUTPUT_FILE = 'results/synthetic_corpus.jsonl'
+SEED = 20260301
+FORMATS = ('plain', 'thousands', 'bold', 'boxed', 'percent')
+LAYOUTS = ('inline', 'start', 'end', 'table')
+LENGTHS = ('short', 'original', 'long')
+PAD_PARAGRAPHS = (4, 24)
+
+NUMBER = re.compile(r'(?<![\w.,])(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?(\s?%)?(?![\w])')
+PARAGRAPH = re.compile(r'\n\s*\n')
+
+def _close(a, b, tol):
+    return abs(a - b) <= tol + 1e-9 * max(1.0, abs(b))
+
+def _numbers(text):
+    """[(start, end, value, is percentage)] of every number in text."""
+    return [(m.start(), m.end(), float(m.group(1).replace(',', '') + (m.group(2) or '')), bool(m.group(3)))
+            for m in NUMBER.finditer(text)]
+
+def _is_answer(value, percent, expected, tol):
+    return _close(value, expected, tol) or (percent and _close(value / 100, expected, tol))
+
+def answer_spans(text, expected, tol=0):
+    """(start, end) of every number in text within tol of expected (a percentage counts as a fraction)."""
+    return [(s, e) for s, e, value, percent in _numbers(text) if _is_answer(value, percent, expected, tol)]
+
+def render(expected, fmt):
+    """The answer written in one format."""
+    if float(expected).is_integer() and abs(expected) >= 1:
+        plain = str(int(expected))
+        number = f'{int(expected):,}' if fmt == 'thousands' else plain
+    else:
+        plain = f'{expected:g}'
+        number = f'{100 * expected:g}%' if fmt == 'percent' and 0 < expected < 1 else plain
+    if fmt == 'bold':
+        return f'**{number}**'
+    if fmt == 'boxed':
+        return f'\\boxed{{{number}}}'
+    return number
+
+def label(field):
+    return (field or 'answer').replace('_', ' ').capitalize()
+
+class Seed:
+    """One usable real response, split into paragraphs with the answer's spans in each."""
+    __slots__ = ('model', 'tid', 'spec', 'paragraphs', 'spans')
+
+    def __init__(self, model, tid, spec, text):
+        self.model, self.tid, self.spec = model, tid, spec
+        self.paragraphs = PARAGRAPH.split(text.strip())
+        self.spans = [answer_spans(p, spec.expected, spec.tol) for p in self.paragraphs]
+
+def rewrite(seed, fmt, layout, length, padding):
+    """One variant of a seed response; padding is a list of distractor paragraphs for length='long'."""
+    spec = seed.spec
+    parts = list(zip(seed.paragraphs, seed.spans))
+    if length == 'short':
+        parts = [part for i, part in enumerate(parts) if i == 0 or part[1]]
+    elif length == 'long' and padding:
+        # Distractors go before the last answer-bearing paragraph, so the answer still comes last
+        last = max(i for i, (_, spans) in enumerate(parts) if spans)
+        parts = parts[:last] + [(p, ()) for p in padding] + parts[last:]
+
+    answer = render(spec.expected, fmt)
+    out = []
+    for p, spans in parts:
+        pieces, pos = [], 0
+        for start, end in spans:
+            pieces += [p[pos:start], answer]
+            pos = end
+        out.append(''.join(pieces) + p[pos:])
+    body = '\n\n'.join(out)
+    if layout == 'start':
+        return f'**Final answer:** {label(spec.field)} = {answer}\n\n{body}'
+    if layout == 'end':
+        return f'{body}\n\nFinal answer: {label(spec.field)} = {answer}'
+    if layout == 'table':
+        return f'{body}\n\n| Quantity | Value |\n|---|---|\n| {label(spec.field)} | {answer} |'
+    return body
+
+def load_seeds(corpus_dir=CORPUS_DIR, models=None, tasks_file=TASKS_FILE):
+    """(usable Seeds, distractor [(paragraph, its numbers)], skipped count)."""
+    index = load_indexes(tasks_file, ['smart_extract2'])['smart_extract2']
+    seeds, distractors, skipped = [], [], 0
+    for model, source in find_sources(corpus_dir, models).items():
+        responses = load_responses(source)
+        for tid in sorted(responses):
+            text = responses[tid]
+            if tid not in index or index[tid].expected is None or not text.strip():
+                continue
+            seed = Seed(model, tid, index[tid], text)
+            if not any(seed.spans):
+                skipped += 1
+                continue
+            seeds.append(seed)
+            distractors.extend((p, tuple((v, pct) for _, _, v, pct in _numbers(p)))
+                               for p, spans in zip(seed.paragraphs, seed.spans) if 40 <= len(p) <= 1500 and not spans)
+    return seeds, distractors, skipped
+
+def generate(seeds, distractors, count, seed=SEED):
+    """Yield count synthetic records, cycling through the seeds in a shuffled order."""
+    rng = random.Random(seed)
+    order = []
+    for i in range(count):
+        if not order:
+            order = list(range(len(seeds)))
+            rng.shuffle(order)
+        source = seeds[order.pop()]
+        spec = source.spec
+        fmt, layout, length = rng.choice(FORMATS), rng.choice(LAYOUTS), rng.choice(LENGTHS)
+        padding = []
+        if length == 'long':
+            # A distractor stating this task's answer would change the ground truth
+            picked = rng.sample(distractors, min(len(distractors), rng.randint(*PAD_PARAGRAPHS)))
+            padding = [p for p, numbers in picked
+                       if not any(_is_answer(v, pct, spec.expected, spec.tol) for v, pct in numbers)]
+        yield {'id': f'syn-{i:07d}', 'model': f'synthetic-{fmt}-{layout}-{length}', 'task_id': source.tid,
+               'source_model': source.model, 'format': fmt, 'layout': layout, 'length': length,
+               'field': spec.field, 'kind': spec.kind, 'expected': spec.expected, 'tol': spec.tol,
+               'text': rewrite(source, fmt, layout, length, padding)}
+
+def _open(path, mode):
+    return gzip.open(path, mode + 't', encoding='utf-8') if path.endswith('.gz') else open(path, mode, encoding='utf-8')
+
+def write_corpus(records, path):
+    """Stream records to a JSONL file; returns (records, bytes of text) written."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    n = size = 0
+    with _open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            n += 1
+            size += len(record['text'])
+    return n, size
+
+def iter_corpus(path):
+    """Stream the records of a synthetic corpus back."""
+    with _open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--count', type=int, default=100000, help='synthetic responses to write')
+    parser.add_argument('--output', default=OUTPUT_FILE, help='JSONL file (.gz for gzip)')
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--models', help='comma-separated source models (default: all)')
+    parser.add_argument('--corpus', default=CORPUS_DIR)
+    args = parser.parse_args()
+
+    models = set(args.models.split(',')) if args.models else None
+    seeds, distractors, skipped = load_seeds(args.corpus, models)
+    if not seeds:
+        sys.exit('No response states its expected answer; nothing to generate from')
+    start = time.perf_counter()
+    n, size = write_corpus(generate(seeds, distractors, args.count, args.seed), args.output)
+    elapsed = time.perf_counter() - start
+    print(f'{len(seeds)} source responses ({skipped} skipped: answer not stated), {len(distractors)} distractors')
+    print(f'{n} responses ({size / 2 ** 20:.1f} MiB of text) written to {args.output} in {elapsed:.1f}s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""Precomputed task index shared by the extraction scripts.
+
+Every extractor needs the same few facts per task: which ground-truth field
+is the answer, what kind of answer it is (per_group, total, power, effect,
+events, ...), the expected value and the tolerance. Each script keeps its own
+rules for choosing them (its resolve_task function); this module runs those
+rules once per task file and keeps the result as compact TaskSpec records.
+
+Indexes are cached on disk under results/.task_index, keyed by the task
+file's SHA-256, the resolving scheme and the SHA-256 of the module source
+that holds its rules, so a rerun against an unchanged task file with
+unchanged rules skips parsing it. Task files are streamed: a JSON array
+(all_tasks.json), a tier file ({"tier": ..., "tasks": [...]}) or JSONL are
+read one task at a time, never loaded whole.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sys
+
+from manifest import hash_task
+from result_log import write_json
+
+INDEX_CACHE_DIR = 'results/.task_index'
+
+class TaskSpec:
+    """What an extractor needs to know about one task."""
+    __slots__ = ('id', 'tier', 'template', 'field', 'expected', 'kind', 'tol', 'task_hash')
+
+    def __init__(self, id, tier, template, field, expected, kind, tol, task_hash):
+        self.id = id
+        self.tier = tier
+        self.template = template
+        self.field = field
+        self.expected = expected
+        self.kind = kind
+        self.tol = tol
+        self.task_hash = task_hash
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f'TaskSpec({self.id!r}, field={self.field!r}, kind={self.kind!r}, expected={self.expected!r}, tol={self.tol!r})'
+
+class TaskIndex:
+    """TaskSpecs keyed by task id; iterates in sorted id order."""
+
+    def __init__(self, specs):
+        self.specs = {s.id: s for s in specs}
+        self._order = sorted(self.specs)
+
+    def __getitem__(self, tid):
+        return self.specs[tid]
+
+    def __contains__(self, tid):
+        return tid in self.specs
+
+    def __len__(self):
+        return len(self.specs)
+
+    def __iter__(self):
+        return (self.specs[tid] for tid in self._order)
+
+    def ids(self):
+        return list(self._order)
+
+class _Reader:
+    """Incremental JSON reader over a text file."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _more(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos > self.chunk_size:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        """Next non-whitespace character ('' at end of file), without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._more():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f'expected {char!r} at offset {self.pos} of task file')
+        self.pos += 1
+
+    def value(self):
+        """Decode the next JSON value, reading more of the file until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A value ending exactly at the buffer end may be a truncated number
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._more()
+
+    def array(self):
+        """Yield the elements of the array starting at the current position."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect(']')
+            return
+
+def iter_tasks(path, chunk_size=1 << 16):
+    """Yield tasks from a JSON array, a tier file or a JSONL file, one at a time.
+
+    Tasks in a tier file inherit its top-level "tier" if they lack their own.
+    """
+    with open(path) as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        reader = _Reader(f, chunk_size)
+        if reader.peek() == '[':
+            yield from reader.array()
+            return
+        reader.expect('{')
+        defaults = {}
+        while reader.peek() != '}':
+            key = reader.value()
+            reader.expect(':')
+            if key == 'tasks':
+                for task in reader.array():
+                    if 'tier' in defaults:
+                        task.setdefault('tier', defaults['tier'])
+                    yield task
+            else:
+                defaults[key] = reader.value()
+            if reader.peek() == ',':
+                reader.pos += 1
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+_resolver_hashes = {}
+
+def resolver_hash(resolve):
+    """SHA-256 of the source file of resolve's module: covers resolve and every helper it calls there."""
+    path = getattr(sys.modules.get(resolve.__module__), '__file__', None)
+    if path is None:
+        return 'nosource'
+    if path not in _resolver_hashes:
+        _resolver_hashes[path] = file_hash(path)
+    return _resolver_hashes[path]
+
+def build_index(path, resolve):
+    """Stream the task file through resolve(task) -> (field, expected, kind, tol)."""
+    specs = []
+    for task in iter_tasks(path):
+        field, expected, kind, tol = resolve(task)
+        specs.append(TaskSpec(task['id'], task.get('tier'), task.get('template'),
+                              field, expected, kind, tol, hash_task(task)))
+    return TaskIndex(specs)
+
+def load_index(path, scheme, resolve, version=1, cache_dir=INDEX_CACHE_DIR):
+    """TaskIndex for path under one extractor's rules, from the disk cache when possible.
+
+    scheme names the rules (e.g. 'smart_extract2'). Editing the module that
+    defines resolve rebuilds the index; bump version only when TaskSpec or
+    build_index change. The file's SHA-256 is only recomputed when its size
+    or mtime differs from the cached entry.
+    """
+    st = os.stat(path)
+    key = os.path.abspath(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    stamps_file = os.path.join(cache_dir, 'stamps.json')
+    stamps = {}
+    if os.path.exists(stamps_file):
+        with open(stamps_file) as f:
+            stamps = json.load(f)
+    digest = stamps.get(key)
+    if not digest or digest[:2] != [st.st_size, st.st_mtime_ns]:
+        digest = [st.st_size, st.st_mtime_ns, file_hash(path)]
+        stamps[key] = digest
+        write_json(stamps_file, stamps)
+
+    cache_file = os.path.join(cache_dir, f'{scheme}-v{version}-{resolver_hash(resolve)[:16]}-{digest[2][:32]}.pickle')
+    if os.path.exists(cache_file):
+        with open(cache_file, 'rb') as f:
+            return TaskIndex(pickle.load(f))
+    index = build_index(path, resolve)
+    tmp = cache_file + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(list(index.specs.values()), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, cache_file)
+    return index
@@ -0,0 +1,83 @@
+"""HTTPClient connection reuse and its retry-once on a stale keep-alive connection."""
+import http.client
+import socket
+import threading
+import time
+
+import pytest
+
+from llm_client import HTTPClient
+from mock_messages_api import StandinConfig, start_server
+
+PAYLOAD = {'model': 'm', 'max_tokens': 5, 'messages': [{'role': 'user', 'content': 'What is n?'}]}
+
+@pytest.fixture
+def standin():
+    config = StandinConfig(default_reply='42')
+    server, url = start_server(config)
+    yield server, url, config
+    server.shutdown()
+    server.server_close()
+
+def test_keep_alive_connection_is_reused(standin):
+    server, url, config = standin
+    client = HTTPClient(url, size=1)
+    status, _, body = client.post_json('/v1/messages', PAYLOAD)
+    assert status == 200 and b'"42"' in body
+    conn = client.idle.queue[0]
+    assert client.post_json('/v1/messages', PAYLOAD)[0] == 200
+    assert client.idle.queue == [conn]
+    assert [c[1] for c in client.stats.calls] == [None, None]
+    client.close()
+
+def test_stale_connection_is_retried_once_on_a_fresh_one(standin):
+    server, url, config = standin
+    server.RequestHandlerClass.timeout = 0.1  # the stand-in drops keep-alive connections idle this long
+    client = HTTPClient(url, size=1)
+    assert client.post_json('/v1/messages', PAYLOAD)[0] == 200
+    stale = client.idle.queue[0]
+    time.sleep(0.5)
+    status, _, body = client.post_json('/v1/messages', PAYLOAD)
+    assert status == 200 and b'"42"' in body
+    assert client.idle.queue[0] is not stale
+    assert config.counts['requests'] == 2
+    assert [c[1] for c in client.stats.calls] == [None, None]
+    client.close()
+
+
+OK = b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 2\r\n\r\n{}'
+
+def serve_raw(replies):
+    """A server that answers its n-th connection's first request with replies[n] (then closes it);
+    connections past the end of replies are closed unanswered. Returns (base url, connection count)."""
+    listener = socket.create_server(('127.0.0.1', 0))
+    accepted = []
+
+    def run():
+        while True:
+            conn, _ = listener.accept()
+            accepted.append(conn)
+            conn.recv(65536)
+            if len(accepted) <= len(replies):
+                conn.sendall(replies[len(accepted) - 1])
+            conn.close()
+    threading.Thread(target=run, daemon=True).start()
+    return f'http://127.0.0.1:{listener.getsockname()[1]}', accepted
+
+def test_fresh_connection_failure_is_not_retried():
+    url, accepted = serve_raw([])
+    client = HTTPClient(url)
+    with pytest.raises(http.client.RemoteDisconnected):
+        client.post_json('/v1/messages', PAYLOAD)
+    assert len(accepted) == 1
+    assert [c[1] for c in client.stats.calls] == ['connection']
+
+def test_stale_connection_is_retried_only_once():
+    url, accepted = serve_raw([OK])
+    client = HTTPClient(url)
+    assert client.post_json('/v1/messages', PAYLOAD)[0] == 200
+    time.sleep(0.1)
+    with pytest.raises((http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)):
+        client.post_json('/v1/messages', PAYLOAD)
+    assert len(accepted) == 2
+    assert [c[1] for c in client.stats.calls] == [None, 'connection']
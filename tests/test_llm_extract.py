@@ -0,0 +1,95 @@
+"""RateLimiter token-bucket accounting and parse_packed_reply."""
+import pytest
+
+import llm_extract
+from llm_extract import RateLimiter, parse_packed_reply
+
+class Clock:
+    """Stands in for the time module: sleep() only moves monotonic() forward."""
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_extract, 'time', clock)
+    return clock
+
+def test_requests_bucket_starts_full_then_paces(clock):
+    limiter = RateLimiter(requests_per_min=60)
+    for _ in range(60):
+        limiter.acquire()
+    assert clock.slept == []
+    limiter.acquire()
+    assert clock.slept == [pytest.approx(1.0)]
+    assert limiter.requests == pytest.approx(0.0)
+
+def test_refill_is_capped_at_the_limit(clock):
+    limiter = RateLimiter(requests_per_min=60)
+    limiter.acquire()
+    clock.now += 600
+    for _ in range(60):
+        limiter.acquire()
+    assert clock.slept == []
+    limiter.acquire()
+    assert clock.slept == [pytest.approx(1.0)]
+
+def test_tokens_bucket_waits_for_the_shortfall(clock):
+    limiter = RateLimiter(tokens_per_min=6000)
+    limiter.acquire(5000)
+    limiter.acquire(2000)
+    assert clock.slept == [pytest.approx(10.0)]  # 1000 tokens short at 100 tokens/s
+    assert limiter.tokens == pytest.approx(0.0)
+
+def test_oversized_call_waits_for_a_full_bucket_only(clock):
+    limiter = RateLimiter(tokens_per_min=6000)
+    limiter.acquire(3000)
+    limiter.acquire(50000)
+    assert sum(clock.slept) == pytest.approx(30.0)
+    assert limiter.tokens == pytest.approx(0.0)
+
+def test_both_buckets_must_cover_the_call(clock):
+    limiter = RateLimiter(requests_per_min=600, tokens_per_min=600)
+    limiter.acquire(600)
+    limiter.acquire(10)
+    assert clock.slept == [pytest.approx(1.0)]  # the token bucket, not the request bucket, sets the wait
+    assert limiter.requests == pytest.approx(599)  # refilled to its cap of 600 over the wait, then one taken
+    assert limiter.tokens == pytest.approx(0.0)
+
+def test_pause_holds_every_caller(clock):
+    limiter = RateLimiter(requests_per_min=60)
+    limiter.pause(5)
+    limiter.pause(2)
+    limiter.acquire()
+    assert sum(clock.slept) == pytest.approx(5.0)
+
+def test_unlimited_never_waits(clock):
+    limiter = RateLimiter()
+    for _ in range(1000):
+        limiter.acquire(10 ** 6)
+    assert clock.slept == []
+
+
+IDS = ['t1', 't2', 't3']
+
+@pytest.mark.parametrize('reply,expected', [
+    ('{"t1": 64, "t2": 0.8, "t3": null}', {'t1': 64.0, 't2': 0.8}),
+    ('Here you go:\n```json\n{"t1": 64, "t2": 86, "t3": 139}\n```', {'t1': 64.0, 't2': 86.0, 't3': 139.0}),
+    ('{"t1": "1,280", "t2": "about 85%", "t3": ""}', {'t1': 1280.0, 't2': 85.0}),
+    ('{"t1": true, "t2": [64], "t3": {"n": 1}}', {}),
+    ('{"t1": 64, "other": 5}', {'t1': 64.0}),
+    ('{"t1": 64, "t2": }', {}),
+    ('[64, 86, 139]', {}),
+    ('64', {}),
+    ('', {}),
+])
+def test_parse_packed_reply(reply, expected):
+    assert parse_packed_reply(reply, IDS) == expected
@@ -0,0 +1,111 @@
+"""Manifest reuse and invalidation, alone and through batch_extract.run_batch."""
+import json
+import os
+
+import pytest
+
+import batch_extract
+from manifest import Manifest, hash_task, hash_text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_lookup_reuses_only_unchanged_entries(tmp_path):
+    manifest = Manifest(str(tmp_path / 'm.json'), 'v1')
+    manifest.store('m/t1', 'r', 't', {'value': 1})
+    assert manifest.lookup('m/t1', 'r', 't') == {'value': 1}
+    assert manifest.lookup('m/t1', 'r2', 't') is None
+    assert manifest.lookup('m/t1', 'r', 't2') is None
+    assert manifest.lookup('m/t2', 'r', 't') is None
+    manifest.save()
+    assert Manifest(str(tmp_path / 'm.json'), 'v2').lookup('m/t1', 'r', 't') is None
+    assert Manifest(str(tmp_path / 'm.json'), 'v1', reset=True).lookup('m/t1', 'r', 't') is None
+    reloaded = Manifest(str(tmp_path / 'm.json'), 'v1')
+    assert reloaded.lookup('m/t1', 'r', 't') == {'value': 1}
+    assert (reloaded.reused, reloaded.extracted) == (1, 0)
+
+def test_hash_task_covers_ground_truth_and_tolerance_only():
+    task = {'id': 't1', 'question': 'q', 'ground_truth': {'power': 0.8}, 'tolerance': {'power': 0.03}}
+    assert hash_task(dict(task, question='other')) == hash_task(task)
+    assert hash_task(dict(task, ground_truth={'power': 0.9})) != hash_task(task)
+    assert hash_task(dict(task, tolerance={'power': 0.05})) != hash_task(task)
+
+def test_save_replaces_atomically(tmp_path, monkeypatch):
+    path = str(tmp_path / 'm.json')
+    manifest = Manifest(path, 'v1')
+    manifest.store('m/t1', 'r', 't', {'value': 1})
+    manifest.save()
+    assert os.listdir(tmp_path) == ['m.json']
+    before = open(path).read()
+
+    def torn_dump(obj, f, **kwargs):
+        f.write('{"entries": {"m/t2"')
+        raise OSError('disk full')
+    manifest.store('m/t2', 'r', 't', {'value': 2})
+    monkeypatch.setattr(json, 'dump', torn_dump)
+    with pytest.raises(OSError):
+        manifest.save()
+    assert open(path).read() == before
+
+
+TEXTS = {'t1-ttest-001': 'You need **64** participants per group.',
+         't1-ttest-002': 'You need **86** participants per group.'}
+
+@pytest.fixture
+def batch(tmp_path, monkeypatch):
+    """A two-response corpus and a three-task file in tmp_path; returns run(), which
+    calls run_batch serially and gives (rows, manifest, task ids extracted)."""
+    monkeypatch.chdir(tmp_path)  # the task index cache is under results/
+    with open(os.path.join(ROOT, batch_extract.TASKS_FILE)) as f:
+        tasks = json.load(f)[:3]
+    with open('tasks.json', 'w') as f:
+        json.dump(tasks, f)
+    os.mkdir('m')
+    for tid, text in TEXTS.items():
+        with open(f'm/{tid}.txt', 'w') as f:
+            f.write(text)
+
+    names = list(batch_extract.EXTRACTORS)
+    seen = []
+    first = batch_extract.EXTRACTORS[names[0]]
+    def counted(text, spec):
+        seen.append(spec.id)
+        return first(text, spec)
+    monkeypatch.setitem(batch_extract.EXTRACTORS, names[0], counted)
+
+    def run():
+        seen.clear()
+        manifest = Manifest('manifest.json', batch_extract.extractor_version(names))
+        rows = batch_extract.run_batch({'m': 'm'}, workers=1, extractor_names=names,
+                                       tasks_file='tasks.json', manifest=manifest)
+        manifest.save()
+        return rows, manifest, sorted(seen)
+    run.tasks = tasks
+    return run
+
+def test_unchanged_responses_are_not_extracted_again(batch):
+    rows, manifest, seen = batch()
+    assert seen == sorted(TEXTS) and manifest.extracted == 2
+    again, manifest, seen = batch()
+    assert seen == [] and (manifest.reused, manifest.extracted) == (2, 0)
+    assert again == rows
+
+def test_changed_response_is_extracted_again(batch):
+    batch()
+    with open('m/t1-ttest-002.txt', 'w') as f:
+        f.write('You need **90** participants per group.')
+    rows, manifest, seen = batch()
+    assert seen == ['t1-ttest-002'] and (manifest.reused, manifest.extracted) == (1, 1)
+    row = next(r for r in rows if r['task_id'] == 't1-ttest-002')
+    assert row['extract_values']['value'] == 90
+    assert manifest.entries['m/t1-ttest-002']['response'] == hash_text('You need **90** participants per group.')
+
+def test_changed_task_spec_is_extracted_again(batch):
+    batch()
+    tasks = batch.tasks
+    tasks[0]['tolerance']['sample_size'] = 10
+    with open('tasks.json', 'w') as f:
+        json.dump(tasks, f)
+    rows, manifest, seen = batch()
+    assert seen == ['t1-ttest-001'] and (manifest.reused, manifest.extracted) == (1, 1)
+    row = next(r for r in rows if r['task_id'] == 't1-ttest-001')
+    assert row['extract_values']['tol'] == 10
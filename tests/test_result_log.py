@@ -0,0 +1,97 @@
+"""ResultLog torn tails, compact(), and what llm_extract --resume skips."""
+import json
+import os
+import sys
+
+import pytest
+
+import llm_extract
+from result_log import ResultLog, compact, read_log
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def write_log(path, entries, tail=''):
+    with open(path, 'w') as f:
+        for key, value in entries:
+            f.write(json.dumps({'key': key, 'value': value}) + '\n')
+        f.write(tail)
+
+def test_read_log_ignores_torn_tail(tmp_path):
+    path = str(tmp_path / 'log.jsonl')
+    write_log(path, [('a', 1), ('b', 2), ('a', 3)], tail='{"key": "c", "val')
+    entries = read_log(path)
+    assert {k: e['value'] for k, e in entries.items()} == {'a': 3, 'b': 2}
+    assert read_log(str(tmp_path / 'missing.jsonl')) == {}
+
+def test_resume_trims_torn_tail_before_appending(tmp_path):
+    path = str(tmp_path / 'log.jsonl')
+    write_log(path, [('a', 1)], tail='{"key": "b", "val')
+    with ResultLog(path, resume=True) as log:
+        assert 'a' in log and 'b' not in log
+        log.append('b', 2)
+    with open(path) as f:
+        assert [json.loads(line)['key'] for line in f] == ['a', 'b']
+    assert log.summary().startswith('Result log: 1 new, 1 resumed')
+
+def test_fresh_log_keeps_old_one_as_backup(tmp_path):
+    path = str(tmp_path / 'log.jsonl')
+    write_log(path, [('a', 1)])
+    with ResultLog(path) as log:
+        assert 'a' not in log
+        log.append('b', 2)
+    assert list(read_log(path)) == ['b']
+    assert list(read_log(log.rotated)) == ['a']
+
+def test_compact_skip_none(tmp_path):
+    path = str(tmp_path / 'log.jsonl')
+    write_log(path, [('b', None), ('a', 1), ('c', 2), ('c', None)])
+    out = str(tmp_path / 'out' / 'results.json')
+    assert compact(path, out) == {'a': 1, 'b': None, 'c': None}
+    assert compact(path, out, skip_none=True) == {'a': 1}
+    with open(out) as f:
+        assert json.load(f) == {'a': 1}
+    assert os.listdir(tmp_path / 'out') == ['results.json']
+
+
+@pytest.fixture
+def extract_run(tmp_path, monkeypatch):
+    """run(failing, resume) calls llm_extract.main on three tasks with extract_task
+    replaced: ids in `failing` raise APIError. Returns the task ids it was called for."""
+    monkeypatch.chdir(tmp_path)
+    with open(os.path.join(ROOT, llm_extract.TASKS_FILE)) as f:
+        tasks = json.load(f)[:3]
+    with open('tasks.json', 'w') as f:
+        json.dump(tasks, f)
+    monkeypatch.setattr(llm_extract, 'TASKS_FILE', 'tasks.json')
+    # configure() sets these from the command line
+    for name in ('API_KEY', 'BASE_URL', 'PROMPT_TOKENS'):
+        monkeypatch.setattr(llm_extract, name, getattr(llm_extract, name))
+    monkeypatch.setattr(llm_extract, 'CLIENT_OPTIONS', dict(llm_extract.CLIENT_OPTIONS))
+    calls = []
+
+    def run(failing=(), resume=False):
+        calls.clear()
+        def extract_task(spec, limiter=None, max_retries=5, cache=None):
+            calls.append(spec.id)
+            if spec.id in failing:
+                raise llm_extract.APIError('HTTP 529: overloaded')
+            return spec.expected, llm_extract.judge(spec.expected, spec)
+        monkeypatch.setattr(llm_extract, 'extract_task', extract_task)
+        argv = ['llm_extract.py', '--base-url', 'http://127.0.0.1:9', '--no-cache', '--concurrency', '1']
+        monkeypatch.setattr(sys, 'argv', argv + ['--resume'] * resume)
+        llm_extract.main()
+        return sorted(calls)
+    run.ids = sorted(t['id'] for t in tasks)
+    return run
+
+def test_resume_skips_only_logged_successes(extract_run, capsys):
+    ids = extract_run.ids
+    assert extract_run(failing={ids[1]}) == ids
+    assert sorted(read_log(llm_extract.LOG_FILE)) == [ids[0], ids[2]]
+    with open(llm_extract.OUTPUT_FILE) as f:
+        assert sorted(json.load(f)) == [ids[0], ids[2]]
+
+    assert extract_run(resume=True) == [ids[1]]
+    assert sorted(read_log(llm_extract.LOG_FILE)) == ids
+    assert extract_run(resume=True) == []
+    assert 'Result log: 0 new, 3 resumed' in capsys.readouterr().out
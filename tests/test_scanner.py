@@ -0,0 +1,85 @@
+"""Scan against the plain per-call patterns, and Lexed.near() window edges."""
+import os
+import re
+
+import pytest
+
+from batch_extract import CORPUS_DIR, find_sources, load_responses
+from lexer import Lexed
+from scanner import PATTERNS, Scan
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PER_MODEL = 20
+
+def sample():
+    """The first PER_MODEL responses (by task id) of every model in the stored corpus."""
+    texts = []
+    for model, source in find_sources(os.path.join(ROOT, CORPUS_DIR)).items():
+        responses = load_responses(source)
+        texts += [(f'{model}/{tid}', responses[tid]) for tid in sorted(responses)[:PER_MODEL]]
+    return texts
+
+SAMPLE = sample()
+
+def spans(matches):
+    return [(m.span(), m.groups()) for m in matches]
+
+@pytest.mark.parametrize('key,text', SAMPLE, ids=[key for key, _ in SAMPLE])
+def test_scan_matches_per_call_patterns(key, text):
+    scan = Scan(text)
+    assert not scan.degraded
+    for name, pat in PATTERNS.items():
+        plain = re.compile(pat.regex.pattern, pat.regex.flags)
+        expected = spans(plain.finditer(text.lower() if pat.lower else text))
+        assert spans(Scan(text).all(name)) == expected, name
+        first = Scan(text).first(name)
+        assert (spans([first]) if first else []) == expected[:1], name
+        assert spans(scan.all(name)) == expected, name
+    assert not scan.degraded
+
+def test_sample_is_not_empty():
+    assert len(SAMPLE) >= PER_MODEL
+
+def test_long_numbers_keep_offsets():
+    text = 'We need ' + '9' * 40 + ' participants; power = 0.8'
+    scan = Scan(text)
+    assert len(scan.text) == len(text)
+    m = scan.first('ev_power_eq')
+    assert m.group(1) == '0.8' and text[m.start(1):m.end(1)] == '0.8'
+
+def test_lower_keeps_offsets():
+    text = 'İstanbul: power = 0.9'
+    scan = Scan(text)
+    assert len(scan.lower) == len(text)
+    m = scan.first('ev_power_eq')
+    assert text[m.start(1):m.end(1)] == '0.9'
+
+
+# near(start, end, keywords, radius): the keyword must lie wholly inside
+# [start - radius, end + radius]. The number below spans [10, 12).
+
+def keyword_at(offset, keyword='power'):
+    text = list('x' * 10 + '42' + 'x' * 20)
+    text[offset:offset + len(keyword)] = keyword
+    return Lexed(''.join(text))
+
+def test_near_keyword_starting_at_window_start():
+    assert keyword_at(5).near(10, 12, ['power'], radius=5)
+
+def test_near_keyword_starting_before_window():
+    assert not keyword_at(4).near(10, 12, ['power'], radius=5)
+
+def test_near_keyword_ending_at_window_end():
+    assert keyword_at(15).near(10, 12, ['power'], radius=8)
+
+def test_near_keyword_ending_past_window():
+    assert not keyword_at(16).near(10, 12, ['power'], radius=8)
+
+def test_near_keyword_at_text_start():
+    assert Lexed('power 42').near(6, 8, ['power'], radius=6)
+    assert not Lexed('power 42').near(6, 8, ['power'], radius=5)
+
+def test_near_any_keyword():
+    lex = Lexed('n = 42 total')
+    assert lex.near(4, 6, ['power', 'total'], radius=6)
+    assert not lex.near(4, 6, ['power'], radius=6)